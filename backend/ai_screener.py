@@ -0,0 +1,461 @@
+"""
+Local first-pass screen for AI-generated images.
+
+Every /check_ai upload used to go to a remote vision model. This module
+computes cheap signals from the original bytes in a few milliseconds and
+combines them into a probability that the image is generated:
+
+* metadata: generator markers (Stable Diffusion/ComfyUI PNG text chunks,
+  the IPTC "trainedAlgorithmicMedia" source type, C2PA or vendor tags) and
+  camera EXIF (Make/Model), read from the JPEG/PNG/WebP container
+* JPEG quantization tables: standard IJG tables, as written by software
+  encoders, vs the custom tables of camera firmware
+* spectral peaks: periodic peaks in the high-frequency spectrum, which
+  upsampling layers leave behind
+* noise residual: camera sensors leave noise even in flat areas, while
+  generated images are often unnaturally clean
+* resampling traces: periodic second-derivative energy left by resizing
+
+The signals are combined by a logistic model, so the score is a
+probability. The default weights are conservative. Fit your own with
+`python ai_screener.py fit --real DIR --ai DIR > weights.json` and point
+AI_SCREEN_WEIGHTS_PATH at the result. Camera EXIF can be copied onto a
+generated image in seconds, so it stays a weak signal: its weight is capped
+at EXIF_WEIGHT_FLOOR (fitted weights too), and a local "authentic" answer
+also needs pixel evidence such as sensor noise. Only images between the
+low and high thresholds go on to the remote model. Confident ones are
+answered locally, and the local score is also the fallback when the remote
+model fails.
+"""
+import json
+import math
+import os
+import struct
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+ANALYSIS_SIZE = 512  # side of the centre crop used for the pixel signals
+GENERATOR_MARKERS = (
+    b"trainedalgorithmicmedia", b"compositewithtrainedalgorithmicmedia", b"c2pa",
+    b"stable diffusion", b"stable-diffusion", b"midjourney", b"dall-e", b"dall\xc2\xb7e",
+    b"firefly", b"novelai", b"comfyui", b"automatic1111", b"imagen", b"ideogram",
+)
+# PNG text chunk keywords written by generation front ends
+GENERATOR_PNG_KEYS = {"parameters", "prompt", "workflow", "negative_prompt", "sd-metadata",
+                      "invokeai_metadata", "dream"}
+
+# Standard (IJG / Annex K) luminance quantization table at quality 50, in zigzag order
+IJG_LUMA_ZIGZAG = (
+    16, 11, 12, 14, 12, 10, 16, 14, 13, 14, 18, 17, 16, 19, 24, 40, 26, 24, 22, 22, 24, 49, 35,
+    37, 29, 40, 58, 51, 61, 60, 57, 51, 56, 55, 64, 72, 92, 78, 64, 68, 87, 69, 55, 56, 80, 109,
+    81, 87, 95, 98, 103, 104, 103, 62, 77, 113, 121, 112, 100, 120, 92, 101, 103, 99,
+)
+
+FEATURES = ("bias", "generator_metadata", "camera_exif", "no_metadata", "standard_qtable",
+            "spectral_peaks", "low_noise", "sensor_noise", "resampling")
+DEFAULT_WEIGHTS = {
+    "bias": -0.4,
+    "generator_metadata": 6.0,
+    "camera_exif": -1.0,
+    "no_metadata": 0.4,
+    "standard_qtable": 0.3,
+    "spectral_peaks": 1.6,
+    "low_noise": 1.2,
+    "sensor_noise": -1.6,
+    "resampling": 0.6,
+}
+# Most negative camera_exif weight allowed: with the default bias, EXIF alone stays above
+# the default low threshold, so it never makes an image "authentic" by itself
+EXIF_WEIGHT_FLOOR = -1.0
+
+
+def _ijg_table(quality: int) -> Tuple[int, ...]:
+    scale = 5000 // quality if quality < 50 else 200 - 2 * quality
+    return tuple(min(255, max(1, (q * scale + 50) // 100)) for q in IJG_LUMA_ZIGZAG)
+
+
+IJG_TABLES = {_ijg_table(q): q for q in range(1, 101)}
+
+
+# --- Metadata ---
+def _exif_fields(tiff: bytes) -> Dict[str, str]:
+    """Make, Model and Software from the first IFD of a TIFF/EXIF block."""
+    if len(tiff) < 8 or tiff[:2] not in (b"II", b"MM"):
+        return {}
+    endian = "<" if tiff[:2] == b"II" else ">"
+    fields: Dict[str, str] = {}
+    try:
+        offset = struct.unpack(endian + "I", tiff[4:8])[0]
+        count = struct.unpack(endian + "H", tiff[offset:offset + 2])[0]
+        for i in range(min(count, 256)):
+            entry = tiff[offset + 2 + 12 * i: offset + 14 + 12 * i]
+            tag, kind, length = struct.unpack(endian + "HHI", entry[:8])
+            name = {0x010F: "make", 0x0110: "model", 0x0131: "software"}.get(tag)
+            if name is None or kind != 2:
+                continue
+            if length <= 4:
+                value = entry[8:8 + length]
+            else:
+                start = struct.unpack(endian + "I", entry[8:12])[0]
+                value = tiff[start:start + length]
+            fields[name] = value.split(b"\0", 1)[0].decode("latin-1").strip()
+    except (struct.error, IndexError):
+        pass  # truncated IFD: keep what was read
+    return fields
+
+
+def _jpeg_segments(raw: bytes):
+    """(marker, payload) for the header segments of a JPEG, up to start of scan."""
+    pos = 2
+    while pos + 4 <= len(raw):
+        if raw[pos] != 0xFF:
+            return
+        marker = raw[pos + 1]
+        if marker == 0xFF:  # fill byte
+            pos += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            pos += 2
+            continue
+        length = struct.unpack(">H", raw[pos + 2:pos + 4])[0]
+        yield marker, raw[pos + 4:pos + 2 + length]
+        if marker == 0xDA:  # start of scan: entropy-coded data follows
+            return
+        pos += 2 + length
+
+
+def _jpeg_qtables(payload: bytes) -> List[Tuple[int, Tuple[int, ...]]]:
+    tables, pos = [], 0
+    while pos < len(payload):
+        precision, table_id = payload[pos] >> 4, payload[pos] & 0x0F
+        size = 128 if precision else 64
+        values = payload[pos + 1:pos + 1 + size]
+        if precision:
+            values = struct.unpack(">64H", values) if len(values) == 128 else ()
+        tables.append((table_id, tuple(values)))
+        pos += 1 + size
+    return tables
+
+
+def _png_chunks(raw: bytes):
+    pos = 8
+    while pos + 8 <= len(raw):
+        length, kind = struct.unpack(">I4s", raw[pos:pos + 8])
+        yield kind, raw[pos + 8:pos + 8 + length]
+        if kind == b"IEND":
+            return
+        pos += 12 + length
+
+
+def read_metadata(raw: bytes) -> Dict[str, Any]:
+    """Container format, camera EXIF, generator markers and JPEG quantization info."""
+    info: Dict[str, Any] = {"format": "unknown", "exif": {}, "generator": None,
+                            "qtable": None, "jpeg_quality": None}
+    blocks: List[bytes] = []  # metadata blocks searched for generator markers
+    if raw[:2] == b"\xff\xd8":
+        info["format"] = "jpeg"
+        for marker, payload in _jpeg_segments(raw):
+            if marker == 0xE1 and payload[:6] == b"Exif\0\0":
+                info["exif"] = _exif_fields(payload[6:])
+                blocks.append(payload)
+            elif 0xE0 <= marker <= 0xEF or marker == 0xFE:  # APPn and comments (XMP, C2PA, ...)
+                blocks.append(payload)
+            elif marker == 0xDB:
+                for table_id, values in _jpeg_qtables(payload):
+                    if table_id == 0 and len(values) == 64:
+                        quality = IJG_TABLES.get(tuple(values))
+                        info["qtable"] = "standard" if quality else "custom"
+                        info["jpeg_quality"] = quality
+    elif raw[:8] == b"\x89PNG\r\n\x1a\n":
+        info["format"] = "png"
+        for kind, payload in _png_chunks(raw):
+            if kind == b"eXIf":
+                info["exif"] = _exif_fields(payload)
+            elif kind in (b"tEXt", b"iTXt", b"zTXt"):
+                keyword = payload.split(b"\0", 1)[0].decode("latin-1").lower()
+                if keyword in GENERATOR_PNG_KEYS:
+                    info["generator"] = f"png:{keyword}"
+                blocks.append(payload)
+            elif kind in (b"caBX", b"c2pa"):
+                info["generator"] = info["generator"] or "c2pa"
+    elif raw[:4] == b"RIFF" and raw[8:12] == b"WEBP":
+        info["format"] = "webp"
+        pos = 12
+        while pos + 8 <= len(raw):
+            kind, length = raw[pos:pos + 4], struct.unpack("<I", raw[pos + 4:pos + 8])[0]
+            payload = raw[pos + 8:pos + 8 + length]
+            if kind == b"EXIF":
+                info["exif"] = _exif_fields(payload[6:] if payload[:6] == b"Exif\0\0" else payload)
+            if kind in (b"EXIF", b"XMP "):
+                blocks.append(payload)
+            pos += 8 + length + (length & 1)
+
+    software = info["exif"].get("software", "").encode("latin-1", "ignore")
+    for block in blocks + [software]:
+        lowered = block.lower()
+        for marker in GENERATOR_MARKERS:
+            if marker in lowered:
+                info["generator"] = info["generator"] or marker.decode("utf-8", "ignore")
+                break
+    return info
+
+
+# --- Pixel signals ---
+def _centre_crop(gray: np.ndarray, size: int) -> np.ndarray:
+    height, width = gray.shape
+    side = min(size, height, width) & ~1
+    y0, x0 = (height - side) // 2, (width - side) // 2
+    return gray[y0:y0 + side, x0:x0 + side]
+
+
+def spectral_peak_score(gray: np.ndarray) -> float:
+    """
+    Strongest isolated peak of the high-frequency spectrum, in robust
+    standard deviations above the radial median. Upsampling layers leave
+    periodic peaks that natural photos rarely have.
+    """
+    side = gray.shape[0]
+    if side < 64:
+        return 0.0
+    window = np.outer(np.hanning(side), np.hanning(side)).astype(np.float32)
+    spectrum = np.fft.fftshift(np.abs(np.fft.fft2((gray - gray.mean()) * window)))
+    log_mag = np.log1p(spectrum)
+    yy, xx = np.indices(log_mag.shape)
+    radius = np.hypot(yy - side // 2, xx - side // 2).astype(np.int32)
+    high = radius >= side // 8  # ignore image content at low frequencies
+    radius_high, values = radius[high], log_mag[high]
+    sums = np.bincount(radius_high, weights=values)
+    counts = np.maximum(np.bincount(radius_high), 1)
+    radial_mean = sums / counts
+    residual = values - radial_mean[radius_high]
+    spread = 1.4826 * np.median(np.abs(residual)) + 1e-6
+    return float(residual.max() / spread)
+
+
+def noise_residual(gray: np.ndarray) -> Dict[str, float]:
+    """Noise left after a 3x3 median filter, overall and in the flattest blocks."""
+    image = gray.astype(np.uint8)
+    residual = gray - cv2.medianBlur(image, 3).astype(np.float32)
+    block = 32
+    height, width = (residual.shape[0] // block) * block, (residual.shape[1] // block) * block
+    if height == 0 or width == 0:
+        return {"sigma": float(residual.std()), "flat_sigma": float(residual.std())}
+    tiles = residual[:height, :width].reshape(height // block, block, width // block, block)
+    texture = gray[:height, :width].reshape(height // block, block, width // block, block)
+    tile_noise = tiles.std(axis=(1, 3)).ravel()
+    tile_texture = texture.std(axis=(1, 3)).ravel()
+    flat = tile_noise[tile_texture <= np.percentile(tile_texture, 25)]
+    # Saturated flat tiles (pure white/black) carry no sensor noise in any image
+    flat = flat[flat > 0.05] if np.any(flat > 0.05) else flat
+    return {"sigma": float(residual.std()), "flat_sigma": float(np.median(flat))}
+
+
+def resampling_score(gray: np.ndarray) -> float:
+    """Periodicity of second-derivative energy along rows and columns (resizing traces)."""
+    best = 0.0
+    for axis in (0, 1):
+        d2 = np.abs(np.diff(gray, n=2, axis=axis))
+        profile = d2.mean(axis=1 - axis)
+        if profile.size < 32:
+            continue
+        spectrum = np.abs(np.fft.rfft(profile - profile.mean()))[2:]
+        if spectrum.size:
+            best = max(best, float(spectrum.max() / (np.median(spectrum) + 1e-6)))
+    return best
+
+
+# --- Scoring ---
+def feature_vector(metadata: Dict[str, Any], signals: Dict[str, float]) -> Dict[str, float]:
+    """Signals mapped to roughly [0, 1] features for the logistic model."""
+    exif = metadata["exif"]
+    return {
+        "bias": 1.0,
+        "generator_metadata": 1.0 if metadata["generator"] else 0.0,
+        "camera_exif": 1.0 if exif.get("make") and exif.get("model") else 0.0,
+        "no_metadata": 0.0 if exif or metadata["generator"] else 1.0,
+        "standard_qtable": 1.0 if metadata["qtable"] == "standard" else 0.0,
+        # ~8 robust sd is common in photos; clear upsampling peaks go far beyond
+        "spectral_peaks": float(np.clip((signals["spectral_peak"] - 8.0) / 8.0, 0.0, 1.0)),
+        # Sensor noise in flat areas is rarely below ~0.8 grey levels
+        "low_noise": float(np.clip((1.2 - signals["flat_noise_sigma"]) / 1.0, 0.0, 1.0)),
+        # ...and is usually several grey levels; generated images sit near zero
+        "sensor_noise": float(np.clip((signals["flat_noise_sigma"] - 2.0) / 3.0, 0.0, 1.0)),
+        "resampling": float(np.clip((signals["resampling"] - 20.0) / 30.0, 0.0, 1.0)),
+    }
+
+
+def probability(features: Dict[str, float], weights: Dict[str, float]) -> float:
+    logit = sum(weights.get(name, 0.0) * value for name, value in features.items())
+    return 1.0 / (1.0 + math.exp(-max(-40.0, min(40.0, logit))))
+
+
+def load_weights(path: Optional[str]) -> Dict[str, float]:
+    weights = dict(DEFAULT_WEIGHTS)
+    if path:
+        with open(path) as f:
+            weights.update({k: float(v) for k, v in json.load(f).items() if k in FEATURES})
+    return weights
+
+
+class AIScreener:
+    """Scores images locally and decides which need the remote model."""
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None, low: float = 0.1,
+                 high: float = 0.9):
+        self.weights = dict(weights or DEFAULT_WEIGHTS)
+        self.weights["camera_exif"] = max(self.weights.get("camera_exif", 0.0), EXIF_WEIGHT_FLOOR)
+        self.low = low
+        self.high = high
+        self.screened = 0
+        self.decided = {"authentic": 0, "ai_generated": 0, "escalate": 0, "undecodable": 0}
+        self.total_ms = 0.0
+
+    @classmethod
+    def from_env(cls) -> "AIScreener":
+        """Build a screener from AI_SCREEN_* environment variables."""
+        return cls(load_weights(os.getenv("AI_SCREEN_WEIGHTS_PATH") or None),
+                   low=float(os.getenv("AI_SCREEN_LOW", "0.1")),
+                   high=float(os.getenv("AI_SCREEN_HIGH", "0.9")))
+
+    def features(self, raw: bytes) -> Tuple[Optional[Dict[str, float]], Dict[str, Any],
+                                            Dict[str, float], Dict[str, float]]:
+        """(features or None if undecodable, metadata, signals, timings in ms)."""
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+        metadata = read_metadata(raw)
+        timings["metadata"] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        gray = cv2.imdecode(np.frombuffer(raw, np.uint8), cv2.IMREAD_GRAYSCALE)
+        timings["decode"] = (time.perf_counter() - start) * 1000
+        if gray is None:
+            return None, metadata, {}, timings
+        crop = _centre_crop(gray, ANALYSIS_SIZE).astype(np.float32)
+
+        signals: Dict[str, float] = {}
+        for name, fn in (("spectral", spectral_peak_score), ("noise", noise_residual),
+                         ("resampling", resampling_score)):
+            start = time.perf_counter()
+            value = fn(crop)
+            timings[name] = (time.perf_counter() - start) * 1000
+            if name == "noise":
+                signals["noise_sigma"] = value["sigma"]
+                signals["flat_noise_sigma"] = value["flat_sigma"]
+            elif name == "spectral":
+                signals["spectral_peak"] = value
+            else:
+                signals["resampling"] = value
+        return feature_vector(metadata, signals), metadata, signals, timings
+
+    def screen(self, raw: bytes) -> Dict[str, Any]:
+        """
+        Score one image. decision is "authentic" or "ai_generated" when the
+        score is outside the thresholds, else "escalate" (ask the remote model).
+        """
+        start = time.perf_counter()
+        features, metadata, signals, timings = self.features(raw)
+        self.screened += 1
+        if features is None:
+            decision, score, path = "escalate", None, ["undecodable"]
+            self.decided["undecodable"] += 1
+        else:
+            score = probability(features, self.weights)
+            path = [f"{name}={value:.2f}" for name, value in features.items()
+                    if name != "bias" and value]
+            if score <= self.low:
+                decision = "authentic"
+            elif score >= self.high:
+                decision = "ai_generated"
+            else:
+                decision = "escalate"
+            self.decided[decision] += 1
+        elapsed = (time.perf_counter() - start) * 1000
+        self.total_ms += elapsed
+        return {
+            "decision": decision,
+            "score": None if score is None else round(score, 4),
+            "thresholds": [self.low, self.high],
+            "path": path,
+            "metadata": {"format": metadata["format"], "camera": " ".join(
+                v for v in (metadata["exif"].get("make"), metadata["exif"].get("model")) if v) or None,
+                "software": metadata["exif"].get("software"), "generator": metadata["generator"],
+                "qtable": metadata["qtable"], "jpeg_quality": metadata["jpeg_quality"]},
+            "signals": {name: round(value, 3) for name, value in signals.items()},
+            "timings_ms": {name: round(value, 3) for name, value in timings.items()},
+            "total_ms": round(elapsed, 3),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        answered = self.decided["authentic"] + self.decided["ai_generated"]
+        return {
+            "screened": self.screened,
+            "decisions": dict(self.decided),
+            "local_answer_ratio": round(answered / self.screened, 4) if self.screened else 0.0,
+            "mean_ms": round(self.total_ms / self.screened, 3) if self.screened else 0.0,
+            "thresholds": [self.low, self.high],
+        }
+
+
+def local_verdict(screening: Dict[str, Any], reason: str) -> str:
+    """A check_ai answer (the same JSON keys the remote model returns) from a screening."""
+    score = screening["score"] if screening["score"] is not None else 0.5
+    signals = ", ".join(screening["path"]) or "no distinctive signals"
+    return json.dumps({
+        "is_ai_generated": score > 0.5,
+        "confidence_score": score,
+        "reasoning": f"{reason} Local screening score {score:.2f} from: {signals}.",
+    })
+
+
+# --- Weight fitting ---
+def fit_weights(rows: List[Dict[str, float]], labels: List[int], iterations: int = 2000,
+                l2: float = 0.01) -> Dict[str, float]:
+    """Logistic regression (gradient descent, L2) of labels (1 = generated) on feature rows."""
+    x = np.array([[row[name] for name in FEATURES] for row in rows], dtype=np.float64)
+    y = np.array(labels, dtype=np.float64)
+    w = np.zeros(len(FEATURES))
+    for _ in range(iterations):
+        p = 1.0 / (1.0 + np.exp(-np.clip(x @ w, -40, 40)))
+        gradient = x.T @ (p - y) / len(y) + l2 * np.r_[0.0, w[1:]]
+        w -= 0.5 * gradient
+    return {name: round(float(value), 4) for name, value in zip(FEATURES, w)}
+
+
+def _directory_features(screener: AIScreener, directory: str) -> List[Dict[str, float]]:
+    rows = []
+    for name in sorted(os.listdir(directory)):
+        with open(os.path.join(directory, name), "rb") as f:
+            features = screener.features(f.read())[0]
+        if features is not None:
+            rows.append(features)
+    return rows
+
+
+def main(argv: List[str]) -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Screen images, or fit screening weights")
+    sub = parser.add_subparsers(dest="command", required=True)
+    screen_cmd = sub.add_parser("screen", help="print the screening of each image")
+    screen_cmd.add_argument("paths", nargs="+")
+    fit_cmd = sub.add_parser("fit", help="fit weights from labelled folders")
+    fit_cmd.add_argument("--real", required=True, help="folder of camera photos")
+    fit_cmd.add_argument("--ai", required=True, help="folder of generated images")
+    args = parser.parse_args(argv)
+
+    screener = AIScreener.from_env()
+    if args.command == "screen":
+        for path in args.paths:
+            with open(path, "rb") as f:
+                print(json.dumps({"path": path, **screener.screen(f.read())}))
+        return
+    real, generated = _directory_features(screener, args.real), _directory_features(screener, args.ai)
+    print(json.dumps(fit_weights(real + generated, [0] * len(real) + [1] * len(generated)), indent=2))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,133 @@
+"""
+Read-only cache of the base car views in imgsss/.
+
+Every view (front, rear, side, top) is loaded once in both its plain and
+filled variant, together with a mirrored copy and the outline mask that the
+render endpoints used to recompute per request. Arrays are read-only, so a
+render starts from view.image.copy(). When a file's mtime changes, that view
+is reloaded on the next lookup.
+"""
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+VIEWS = ("front", "rear", "side", "top")
+VARIANTS = ("plain", "filled")
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+# How often (seconds) lookups re-check file mtimes
+RELOAD_CHECK_INTERVAL = 2.0
+
+_SHARPENING_KERNEL = np.array([[-1, -1, -1], [-1, 9, -1], [-1, -1, -1]])
+
+
+def outline_mask(image: np.ndarray) -> np.ndarray:
+    """Binary (inverted) car outline: sharpen -> grayscale -> threshold."""
+    sharpened_image = cv2.filter2D(image, -1, _SHARPENING_KERNEL)
+    gray_image = cv2.cvtColor(sharpened_image, cv2.COLOR_BGR2GRAY)
+    _, binary_image = cv2.threshold(gray_image, 127, 255, cv2.THRESH_BINARY_INV)
+    return binary_image
+
+
+def _readonly(array: np.ndarray) -> np.ndarray:
+    array.setflags(write=False)
+    return array
+
+
+class BaseView:
+    """One decoded base image with its precomputed derivatives."""
+
+    __slots__ = ("view", "variant", "path", "mtime", "image", "mirrored", "outline",
+                 "mirrored_outline", "has_outline")
+
+    def __init__(self, view: str, variant: str, path: str, mtime: float, image: np.ndarray):
+        self.view = view
+        self.variant = variant
+        self.path = path
+        self.mtime = mtime
+        self.image = _readonly(image)
+        self.mirrored = _readonly(cv2.flip(image, 1))
+        self.outline = _readonly(outline_mask(image))
+        self.mirrored_outline = _readonly(cv2.flip(self.outline, 1))
+        # findContours finds at least one contour exactly when the mask has a set pixel
+        self.has_outline = bool(cv2.countNonZero(self.outline))
+
+    def pixels(self, mirrored: bool = False) -> np.ndarray:
+        return self.mirrored if mirrored else self.image
+
+    @property
+    def width(self) -> int:
+        return self.image.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self.image.shape[0]
+
+
+def _classify(filename: str) -> Optional[Tuple[str, str]]:
+    stem, ext = os.path.splitext(filename.lower())
+    if ext not in IMAGE_EXTENSIONS:
+        return None
+    variant = "plain"
+    if stem.endswith("_filled"):
+        stem, variant = stem[:-len("_filled")], "filled"
+    return (stem, variant) if stem in VIEWS else None
+
+
+class BaseViewCache:
+    """Startup-loaded, mtime-refreshed cache of every base view."""
+
+    def __init__(self, images_dir: str):
+        self.images_dir = images_dir
+        self._views: Dict[Tuple[str, str], BaseView] = {}
+        self._lock = threading.Lock()
+        self._last_check = 0.0
+        self.loads = 0
+
+    def _scan(self) -> Dict[Tuple[str, str], Tuple[str, float]]:
+        found = {}
+        try:
+            names = sorted(os.listdir(self.images_dir))
+        except OSError:
+            return found
+        for name in names:
+            key = _classify(name)
+            if key is None or key in found:
+                continue
+            path = os.path.join(self.images_dir, name)
+            found[key] = (path, os.path.getmtime(path))
+        return found
+
+    def reload(self, force: bool = False) -> None:
+        """Load new or changed files and drop ones that disappeared."""
+        with self._lock:
+            found = self._scan()
+            views = {}
+            for key, (path, mtime) in found.items():
+                current = self._views.get(key)
+                if not force and current and current.path == path and current.mtime == mtime:
+                    views[key] = current
+                    continue
+                image = cv2.imread(path)
+                if image is None:
+                    continue
+                views[key] = BaseView(key[0], key[1], path, mtime, image)
+                self.loads += 1
+            self._views = views
+            self._last_check = time.monotonic()
+
+    def get(self, view: str, variant: str = "plain") -> BaseView:
+        """Return the cached view, raising KeyError if no such base image exists."""
+        if time.monotonic() - self._last_check > RELOAD_CHECK_INTERVAL:
+            self.reload()
+        return self._views[(view, variant)]
+
+    def available(self) -> Dict[str, list]:
+        views: Dict[str, list] = {}
+        for view, variant in sorted(self._views):
+            views.setdefault(view, []).append(variant)
+        return views
@@ -0,0 +1,175 @@
+"""
+Multi-view, multi-claim batch rendering on a process pool.
+
+A batch is a list of render tasks, each one (assessment components, view,
+side, style, variant). Rendering and encoding are CPU-bound NumPy/OpenCV
+work, so they run in a ProcessPoolExecutor sized to the core count instead
+of the request thread. Throughput then scales with cores rather than the
+GIL. Each worker process loads its own BaseViewCache once, and only the
+components and the encoded bytes cross the process boundary.
+
+Styles reproduce the single-image endpoints: "overlay" is
+/admin/render-damage and "impact" is /render-damage-impact.
+"""
+import io
+import json
+import multiprocessing
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+
+from base_views import VARIANTS, VIEWS, BaseViewCache
+from cost_estimator import assessment_components, validated_components
+from damage_renderer import MARKER_COLOR, composite_markers, damage_markers
+from render_output import OutputSpec, encode_image
+
+# style -> (min ring radius, damage scaling factor, endpoint name used in render keys)
+STYLES = {
+    "overlay": (100, 10.0, "admin-render-damage"),
+    "impact": (24, 100.0, "render-damage-impact"),
+}
+SIDES = ("left", "right")
+
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "0")) or os.cpu_count() or 1
+
+_worker_views: Optional[BaseViewCache] = None
+
+
+def marker_side(view: str, side: str) -> str:
+    """Only the side view shows one side of the car; other views keep every component."""
+    return side if view == "side" else "both"
+
+
+def _init_worker(images_dir: str) -> None:
+    global _worker_views
+    # One process per core already; OpenCV's own thread pool would oversubscribe
+    cv2.setNumThreads(1)
+    _worker_views = BaseViewCache(images_dir)
+    _worker_views.reload()
+
+
+def render_task(task: Dict[str, Any], spec: OutputSpec) -> bytes:
+    """Render and encode one task. Runs inside a worker process."""
+    base_view = _worker_views.get(task["view"], task["variant"])
+    if task["style"] == "impact" and not base_view.has_outline:
+        raise ValueError("No car outline found in image")
+
+    side = marker_side(task["view"], task["side"])
+    image = base_view.pixels(mirrored=(side == "right")).copy()
+    min_radius, scaling_factor, _ = STYLES[task["style"]]
+    markers = damage_markers(task["components"], image.shape[1], side, min_radius,
+                             scaling_factor, MARKER_COLOR)
+    composite_markers(image, markers)
+    return encode_image(image, spec)
+
+
+class BatchRenderer:
+    """Lazily started process pool shared by every batch request."""
+
+    def __init__(self, images_dir: str, workers: int = RENDER_WORKERS):
+        self.images_dir = images_dir
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.batches = 0
+        self.rendered = 0
+        self.failed = 0
+
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a server process that already runs threads is not safe for OpenCV
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.images_dir,),
+            )
+        return self._pool
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "started": self._pool is not None,
+            "batches": self.batches,
+            "rendered": self.rendered,
+            "failed": self.failed,
+        }
+
+
+def expand_items(items: List[Dict]) -> List[Dict[str, Any]]:
+    """
+    Expand request items into one task per (view, side). Each item is
+    {"id", "damage_data" | "components", "views", "sides", "style", "variant"};
+    everything but the assessment is optional. ids (as zip directory names)
+    and each item's views and sides must be unique, so no zip entry repeats.
+    """
+    tasks = []
+    item_ids: Dict[str, int] = {}
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise ValueError(f"items[{index}] must be an object")
+        # Used as a directory name inside the zip
+        item_id = re.sub(r"[^A-Za-z0-9._-]", "_", str(item.get("id", index))).strip(".") or str(index)
+        if item_id in item_ids:
+            raise ValueError(f"items[{index}]: id '{item_id}' is already used by items[{item_ids[item_id]}]")
+        item_ids[item_id] = index
+        names = set()
+        try:
+            if "components" in item:
+                components = validated_components(item["components"])
+            else:
+                damage_data = item.get("damage_data")
+                if not isinstance(damage_data, dict):
+                    raise ValueError("damage_data (or components) must be an object")
+                if "components" not in damage_data and "car_side_damage_assessment" not in damage_data:
+                    raise ValueError("damage_data needs components or car_side_damage_assessment")
+                components = validated_components(assessment_components(damage_data))
+        except (AttributeError, TypeError, ValueError) as e:
+            raise ValueError(f"items[{index}]: invalid damage assessment: {e}")
+        views = item.get("views") or [item.get("view", "side")]
+        style = item.get("style", "impact")
+        variant = item.get("variant", "plain")
+        if style not in STYLES:
+            raise ValueError(f"items[{index}]: unknown style '{style}' (use {', '.join(STYLES)})")
+        if variant not in VARIANTS:
+            raise ValueError(f"items[{index}]: unknown variant '{variant}'")
+
+        for view in views:
+            if view not in VIEWS:
+                raise ValueError(f"items[{index}]: unknown view '{view}' (use {', '.join(VIEWS)})")
+            sides = (item.get("sides") or [item.get("side", "left")]) if view == "side" else ["left"]
+            for side in sides:
+                if side not in SIDES:
+                    raise ValueError(f"items[{index}]: unknown side '{side}'")
+                name = f"{view}_{side}" if view == "side" else view
+                if name in names:
+                    raise ValueError(f"items[{index}]: '{name}' is listed twice")
+                names.add(name)
+                tasks.append({
+                    "id": item_id,
+                    "name": f"{item_id}/{name}",
+                    "components": components,
+                    "view": view,
+                    "side": side,
+                    "style": style,
+                    "variant": variant,
+                })
+    return tasks
+
+
+def build_zip(files: List[Tuple[str, bytes]], manifest: List[Dict]) -> bytes:
+    """Zip the rendered images plus a manifest.json. Images are already compressed, so store them."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+        for name, data in files:
+            archive.writestr(name, data)
+        archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+    return buffer.getvalue()
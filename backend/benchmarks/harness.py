@@ -0,0 +1,148 @@
+"""
+Shared helpers for the benchmark scripts: latency summaries, peak RSS,
+in-process servers and baseline files.
+
+A baseline is the JSON report of an earlier run. compare_to_baseline()
+flags every latency percentile that grew, and every throughput figure that
+shrank, by more than the tolerance. The scripts exit non-zero when anything
+is flagged, so a regression fails loudly (e.g. in CI).
+"""
+import json
+import math
+import os
+import resource
+import sys
+import threading
+import time
+from typing import Dict, List, Sequence
+
+import uvicorn
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_ROOT = os.path.dirname(BACKEND_DIR)
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+# Report keys compared against a baseline: larger is worse / smaller is worse
+LOWER_IS_BETTER = ("p50_ms", "p95_ms", "p99_ms", "peak_rss_mb")
+HIGHER_IS_BETTER = ("rps",)
+
+
+def percentile(sorted_samples: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted samples."""
+    if not sorted_samples:
+        return 0.0
+    rank = max(0, min(len(sorted_samples) - 1, math.ceil(q * len(sorted_samples)) - 1))
+    return sorted_samples[rank]
+
+
+def summarize(samples_ms: List[float]) -> Dict[str, float]:
+    samples = sorted(samples_ms)
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 0.50), 3),
+        "p95_ms": round(percentile(samples, 0.95), 3),
+        "p99_ms": round(percentile(samples, 0.99), 3),
+        "max_ms": round(samples[-1], 3) if samples else 0.0,
+    }
+
+
+def time_calls(fn, repeat: int, warmup: int = 1) -> Dict[str, float]:
+    """Call fn() repeat times (after warm-up) and summarize the latencies."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def start_server(app, port: int) -> uvicorn.Server:
+    """Serve an ASGI app on 127.0.0.1:port from a daemon thread."""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def baseline_path(name: str) -> str:
+    return os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def save_baseline(report: Dict, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
+def _flatten(report: Dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in report.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = float(value)
+    return flat
+
+
+def compare_to_baseline(report: Dict, path: str, tolerance: float,
+                        min_delta_ms: float = 1.0) -> List[str]:
+    """
+    Regressions of report against the baseline at path. Latencies must also
+    grow by min_delta_ms, so sub-millisecond noise does not count.
+    """
+    with open(path) as f:
+        baseline = _flatten(json.load(f))
+    regressions = []
+    for name, value in _flatten(report).items():
+        old = baseline.get(name)
+        if old is None or old <= 0:
+            continue
+        metric = name.rsplit(".", 1)[-1]
+        if metric.endswith("_ms") and value - old < min_delta_ms:
+            continue
+        if metric in LOWER_IS_BETTER and value > old * (1 + tolerance):
+            regressions.append(f"{name}: {old:g} -> {value:g} (+{(value / old - 1) * 100:.0f}%)")
+        elif metric in HIGHER_IS_BETTER and value < old * (1 - tolerance):
+            regressions.append(f"{name}: {old:g} -> {value:g} ({(value / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def add_baseline_arguments(parser, name: str) -> None:
+    parser.add_argument("--baseline", default=baseline_path(name),
+                        help="baseline JSON to compare against (default: %(default)s)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="write this run's report as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative slowdown before a metric counts as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="ignore latency increases smaller than this")
+
+
+def finish(report: Dict, args) -> None:
+    """Print the report, then save it as the baseline or fail on regressions."""
+    print(json.dumps(report, indent=2))
+    if args.save_baseline:
+        save_baseline(report, args.baseline)
+        print(f"baseline written to {args.baseline}", file=sys.stderr)
+        return
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; run with --save-baseline to record one",
+              file=sys.stderr)
+        return
+    regressions = compare_to_baseline(report, args.baseline, args.tolerance, args.min_delta_ms)
+    if regressions:
+        print("REGRESSIONS against " + args.baseline, file=sys.stderr)
+        for line in regressions:
+            print("  " + line, file=sys.stderr)
+        raise SystemExit(1)
@@ -0,0 +1,109 @@
+"""
+Heat-field benchmark: incremental updates against a full redraw per edit.
+
+For every view, builds the heat field of the side.json components over the
+filled base image, then edits one component's percentage_damage at a time
+(as an assessor dragging a slider would) and times
+- full: a new HeatField of the edited assessment
+- incremental: HeatField.update() on the existing field
+After every edit both fields and images must be identical. Randomised
+assessments with overlapping and border-crossing kernels are checked too.
+
+Run from backend/:  python -m benchmarks.heatfield_bench [--save-baseline]
+"""
+import argparse
+import json
+import os
+import random
+
+import cv2
+import numpy as np
+
+from base_views import VIEWS
+from benchmarks.harness import (BACKEND_DIR, PROJECT_ROOT, add_baseline_arguments, finish,
+                                peak_rss_mb, time_calls)
+from heatfield import HeatField
+
+IMAGES_DIR = os.path.join(PROJECT_ROOT, "imgsss")
+
+
+def filled_base(view: str) -> np.ndarray:
+    image = cv2.imread(os.path.join(IMAGES_DIR, f"{view}_filled.JPG"))
+    if image is None:
+        raise SystemExit(f"missing base image {view}_filled.JPG in {IMAGES_DIR}")
+    return image
+
+
+def check_identical(field: HeatField, base: np.ndarray, side: str, label: str) -> None:
+    fresh = HeatField(base, field.assessment(), side)
+    if not (np.array_equal(fresh.field, field.field) and np.array_equal(fresh.image, field.image)):
+        raise SystemExit(f"{label}: incremental update differs from a full redraw")
+
+
+def random_components(rng: random.Random, width: int, height: int, count: int) -> list:
+    return [{"component": f"part_{i}", "percentage_damage": rng.uniform(0, 40),
+             "bbox": [rng.randint(-50, width), rng.randint(-50, height),
+                      rng.randint(10, 300), rng.randint(10, 300)]} for i in range(count)]
+
+
+def bench_view(view: str, components: list, repeat: int) -> dict:
+    base = filled_base(view)
+    side = "left" if view == "side" else "both"
+    field = HeatField(base, components, side)
+    names = [c["component"] for c in components if field.kernels.get(c["component"]) is not None]
+    edits = iter(range(10 ** 9))
+
+    def edit():
+        step = next(edits)
+        return {"component": names[step % len(names)], "percentage_damage": 1.0 + step % 40}
+
+    def full():
+        change = edit()
+        assessment = [{**c, **change} if c["component"] == change["component"] else c
+                      for c in field.assessment()]
+        return HeatField(base, assessment, side)
+
+    results = {
+        "full": time_calls(full, repeat),
+        "incremental": time_calls(lambda: field.update([edit()]), repeat),
+    }
+    check_identical(field, base, side, view)
+    stats = field.stats()
+    results["pixels_per_update"] = round(stats["pixels_updated"] / stats["updates"])
+    results["pixels"] = field.width * field.height
+    return results
+
+
+def check_random(seed: int, rounds: int) -> None:
+    rng = random.Random(seed)
+    for view in VIEWS:
+        base = filled_base(view)
+        height, width = base.shape[:2]
+        field = HeatField(base, random_components(rng, width, height, 12))
+        for _ in range(rounds):
+            change = {"component": f"part_{rng.randrange(14)}"}
+            if rng.random() < 0.7:
+                change["percentage_damage"] = rng.choice([0.0, rng.uniform(0, 100)])
+            if rng.random() < 0.5:
+                change["bbox"] = random_components(rng, width, height, 1)[0]["bbox"]
+            field.update([change])
+        check_identical(field, base, "both", f"{view} (random)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    add_baseline_arguments(parser, "heatfield")
+    args = parser.parse_args()
+
+    with open(os.path.join(BACKEND_DIR, "side.json")) as f:
+        components = json.load(f)["car_side_damage_assessment"]["sections_of_interest"]
+    report = {view: bench_view(view, components, args.repeat) for view in VIEWS}
+    check_random(args.seed, 40)
+    report["peak_rss_mb"] = peak_rss_mb()
+    finish(report, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Load driver: replays a weighted mix of /explain, /check_ai,
+/render-damage-impact and /admin/render-damage at a target concurrency.
+
+By default it starts the backend in-process, with OpenRouter replaced by
+benchmarks.openrouter_stub (latency distribution, error rate and rate limit
+set with the --stub-* options), so runs are reproducible and free. With
+--url it drives an already running backend instead. Each request is a new
+claim by default: uploads get a random trailer and assessments a tiny
+change, so the result and render caches do not hide the real cost.
+--reuse-payloads measures the cached path instead.
+
+Reports p50/p95/p99 latency, RPS and status counts per endpoint, overall
+RPS and peak RSS (in-process mode: backend and driver together), and
+compares against the stored baseline (see benchmarks.harness). Exits 1
+when an endpoint answers 404 or 405, i.e. the app does not route it.
+
+Run from backend/:  python -m benchmarks.load_driver --concurrency 16 --duration 20
+"""
+import argparse
+import asyncio
+import copy
+import json
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import httpx
+
+from benchmarks.harness import (BACKEND_DIR, PROJECT_ROOT, add_baseline_arguments, finish,
+                                peak_rss_mb, start_server, summarize)
+from benchmarks.openrouter_stub import DISTRIBUTIONS, StubLimits, create_app
+
+UPLOAD_EXTENSIONS = (".jpg", ".jpeg", ".png")
+DEFAULT_MIX = "explain=1,check_ai=1,render_impact=2,render_overlay=2"
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """'explain=1,render_impact=2' -> {endpoint: weight}."""
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in REQUESTS:
+            raise SystemExit(f"unknown endpoint '{name}' (choose from {', '.join(REQUESTS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class Payloads:
+    """Sample uploads and assessments, optionally made unique per request."""
+
+    def __init__(self, unique: bool):
+        self.unique = unique
+        self.uploads: List[Tuple[str, bytes, str]] = []
+        upload_dir = os.path.join(PROJECT_ROOT, "uploads")
+        for name in sorted(os.listdir(upload_dir)):
+            if name.lower().endswith(UPLOAD_EXTENSIONS):
+                with open(os.path.join(upload_dir, name), "rb") as f:
+                    mime = "image/png" if name.lower().endswith(".png") else "image/jpeg"
+                    self.uploads.append((name, f.read(), mime))
+        if not self.uploads:
+            raise SystemExit(f"no sample images in {upload_dir}")
+        with open(os.path.join(BACKEND_DIR, "side.json")) as f:
+            self.assessment = json.load(f)
+        self._seq = 0
+
+    def upload(self) -> Dict:
+        name, data, mime = random.choice(self.uploads)
+        if self.unique:
+            # Decoders ignore bytes after the end-of-image marker; the content hash does not
+            data += os.urandom(16)
+        return {"files": {"file": (name, data, mime)}}
+
+    def assessment_body(self) -> Dict:
+        if not self.unique:
+            return {"json": self.assessment}
+        self._seq += 1
+        claim = copy.deepcopy(self.assessment)
+        claim["car_side_damage_assessment"]["sections_of_interest"][0]["percentage_damage"] += \
+            self._seq * 1e-9
+        return {"json": claim}
+
+
+REQUESTS = {
+    "explain": ("/explain", Payloads.upload),
+    "check_ai": ("/check_ai", Payloads.upload),
+    "render_impact": ("/render-damage-impact", Payloads.assessment_body),
+    "render_overlay": ("/admin/render-damage", Payloads.assessment_body),
+}
+
+
+async def drive(url: str, mix: Dict[str, float], concurrency: int, duration: float,
+                max_requests: int, payloads: Payloads, timeout: float) -> Dict:
+    names, weights = list(mix), list(mix.values())
+    latencies: Dict[str, List[float]] = {name: [] for name in names}
+    statuses: Dict[str, Counter] = {name: Counter() for name in names}
+    sent = 0
+    deadline = time.monotonic() + duration
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal sent
+        while time.monotonic() < deadline and (not max_requests or sent < max_requests):
+            sent += 1
+            name = random.choices(names, weights)[0]
+            path, make_body = REQUESTS[name]
+            start = time.perf_counter()
+            try:
+                response = await client.post(path, **make_body(payloads))
+                status = str(response.status_code)
+            except httpx.HTTPError as exc:
+                status = type(exc).__name__
+            latencies[name].append((time.perf_counter() - start) * 1000)
+            statuses[name][status] += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=timeout) as client:
+        started = time.monotonic()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.monotonic() - started
+
+    endpoints = {}
+    for name in names:
+        summary = summarize(latencies[name])
+        summary["rps"] = round(len(latencies[name]) / elapsed, 2)
+        summary["status"] = dict(statuses[name])
+        endpoints[name] = summary
+    total = sum(len(samples) for samples in latencies.values())
+    failed = sum(count for counter in statuses.values()
+                 for status, count in counter.items() if not status.startswith(("2", "3")))
+    return {"elapsed_s": round(elapsed, 2), "requests": total, "failed": failed,
+            "rps": round(total / elapsed, 2), "endpoints": endpoints}
+
+
+def start_backend(args) -> str:
+    """Start the stub and the backend in this process; returns the backend URL."""
+    limits = StubLimits(args.stub_rate, args.stub_burst, 0, args.stub_latency, args.stub_jitter,
+                        args.stub_error_rate, args.stub_distribution)
+    start_server(create_app(limits), args.stub_port)
+    os.environ["OPENROUTER_BASE_URL"] = f"http://127.0.0.1:{args.stub_port}/api/v1"
+    os.environ.setdefault("RENDER_CACHE_DIR", tempfile.mkdtemp(prefix="render-load-"))
+    os.environ.setdefault("JOB_DATA_DIR", tempfile.mkdtemp(prefix="jobs-load-"))
+    import api  # reads the environment above at import time
+
+    start_server(api.app, args.port)
+    return f"http://127.0.0.1:{args.port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="drive a running backend instead of starting one")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint=weight list")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--requests", type=int, default=0, help="stop after this many (0 = no cap)")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--reuse-payloads", action="store_true",
+                        help="send identical payloads (exercises the caches)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--stub-port", type=int, default=8791)
+    parser.add_argument("--stub-latency", type=float, default=0.5)
+    parser.add_argument("--stub-jitter", type=float, default=0.5)
+    parser.add_argument("--stub-distribution", choices=DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--stub-error-rate", type=float, default=0.0)
+    parser.add_argument("--stub-rate", type=float, default=0.0, help="requests/s per model (0 = no limit)")
+    parser.add_argument("--stub-burst", type=float, default=1.0)
+    add_baseline_arguments(parser, "load")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    url = args.url or start_backend(args)
+    report = asyncio.run(drive(url, parse_mix(args.mix), args.concurrency, args.duration,
+                               args.requests, Payloads(unique=not args.reuse_payloads),
+                               args.timeout))
+    report["config"] = {"url": url, "mix": args.mix, "concurrency": args.concurrency,
+                        "stub": None if args.url else f"{args.stub_distribution} "
+                                f"{args.stub_latency}s, errors {args.stub_error_rate}"}
+    if not args.url:
+        report["peak_rss_mb"] = peak_rss_mb()
+    unrouted = [name for name, summary in report["endpoints"].items()
+                if {"404", "405"} & set(summary["status"])]
+    if unrouted:
+        raise SystemExit(f"not routed by the app: {', '.join(unrouted)}")
+    finish(report, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Microbenchmarks for the hot paths of a claim: marker drawing, the two
+render endpoints and base64 encoding of uploads.
+
+- draw_gradient_damage: one marker at the sizes the endpoints use
+- composite_markers: every marker of side.json, as the impact endpoint draws them
+- the render endpoints, through the ASGI app: cold (a new claim each call,
+  so nothing is cached), warm (served from the render cache) and
+  revalidated (If-None-Match, a 304)
+- encode_image_to_base64 on each sample image in uploads/ and imgsss/
+- the local cost estimate of side.json
+- the local AI screen of each sample image
+- perceptual hashing of a sample upload, and near-duplicate queries against
+  an index of --phash-size random hashes
+
+Reports p50/p95/p99 per case plus peak RSS, and compares against the
+stored baseline (see benchmarks.harness).
+
+Run from backend/:  python -m benchmarks.micro_bench [--save-baseline]
+"""
+import argparse
+import copy
+import json
+import os
+import tempfile
+
+# The render cache must not touch the real one, so point it elsewhere before api is imported
+os.environ.setdefault("RENDER_CACHE_DIR", tempfile.mkdtemp(prefix="render-bench-"))
+
+import cv2
+import numpy as np
+from fastapi.testclient import TestClient
+
+import api
+from benchmarks.harness import (BACKEND_DIR, PROJECT_ROOT, add_baseline_arguments, finish,
+                                peak_rss_mb, time_calls)
+from damage_renderer import composite_markers, damage_markers, draw_gradient_damage
+from phash_index import PHashIndex, image_hashes
+from services import get_ai_screener, get_cost_estimator
+import vision
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+RENDER_ENDPOINTS = {
+    "render_impact": "/render-damage-impact",
+    "render_overlay_left": "/admin/render-damage?side=left",
+    "render_overlay_right": "/admin/render-damage?side=right",
+}
+
+
+def sample_images():
+    for folder in ("uploads", "imgsss"):
+        directory = os.path.join(PROJECT_ROOT, folder)
+        if not os.path.isdir(directory):
+            continue
+        for name in sorted(os.listdir(directory)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield f"{folder}/{name}", os.path.join(directory, name)
+
+
+def bench_drawing(repeat: int, assessment: dict) -> dict:
+    base = cv2.imread(os.path.join(PROJECT_ROOT, "imgsss", "side.PNG"))
+    height, width = base.shape[:2]
+    components = assessment["car_side_damage_assessment"]["sections_of_interest"]
+    markers = damage_markers(components, width, "left", 24, 100.0)
+    results = {}
+    for radius in (24, 100, 400):
+        results[f"draw_gradient_damage_r{radius}"] = time_calls(
+            lambda: draw_gradient_damage(base.copy(), width // 2, height // 2, radius, (0, 0, 255)),
+            repeat)
+    results["composite_markers_side"] = time_calls(
+        lambda: composite_markers(base.copy(), markers), repeat)
+    results["composite_markers_side"]["markers"] = len(markers)
+    return results
+
+
+def bench_endpoints(repeat: int, assessment: dict) -> dict:
+    results = {}
+    counter = iter(range(10 ** 9))
+
+    def new_claim():
+        # A tiny change to one component gives a new render key, i.e. a cache miss
+        claim = copy.deepcopy(assessment)
+        claim["car_side_damage_assessment"]["sections_of_interest"][0]["percentage_damage"] += \
+            next(counter) * 1e-9
+        return claim
+
+    with TestClient(api.app) as client:
+        for name, path in RENDER_ENDPOINTS.items():
+            def post(body, headers=None, expect=200):
+                response = client.post(path, json=body, headers=headers)
+                if response.status_code != expect:
+                    raise SystemExit(f"{path}: HTTP {response.status_code} {response.text[:200]}")
+                return response
+
+            results[f"{name}_cold"] = time_calls(lambda: post(new_claim()), repeat)
+            etag = post(assessment).headers["etag"]
+            results[f"{name}_warm"] = time_calls(lambda: post(assessment), repeat)
+            results[f"{name}_304"] = time_calls(
+                lambda: post(assessment, {"If-None-Match": etag}, 304), repeat)
+    return results
+
+
+def bench_base64(repeat: int) -> dict:
+    results = {}
+    for label, path in sample_images():
+        results[label] = time_calls(lambda: vision.encode_image_to_base64(path), repeat)
+        results[label]["bytes"] = os.path.getsize(path)
+    return results
+
+
+def bench_cost(repeat: int, assessment: dict) -> dict:
+    components = assessment["car_side_damage_assessment"]["sections_of_interest"]
+    return {"estimate_side": time_calls(lambda: get_cost_estimator().estimate(components), repeat)}
+
+
+def bench_ai_screen(repeat: int) -> dict:
+    results = {}
+    for label, path in sample_images():
+        with open(path, "rb") as f:
+            raw = f.read()
+        results[label] = time_calls(lambda: get_ai_screener().screen(raw), repeat)
+    return results
+
+
+def bench_phash(repeat: int, size: int) -> dict:
+    with open(os.path.join(PROJECT_ROOT, "uploads", "1024px-Car_crash_1.jpg"), "rb") as f:
+        raw = f.read()
+    results = {"image_hashes": time_calls(lambda: image_hashes(raw), repeat)}
+    index = PHashIndex(os.path.join(tempfile.mkdtemp(prefix="phash-bench-"), "phash.sqlite3"),
+                       reuse_distance=-1)
+    index.load()
+    rng = np.random.default_rng(0)
+    hashes = [int(h) for h in rng.integers(0, 2 ** 63, size, dtype=np.uint64)]
+    index.add_many((f"{i:x}", h, h, None) for i, h in enumerate(hashes))
+    queries = iter(hashes * (4 * repeat // size + 2))
+    for k in (4, 8):
+        results[f"search_k{k}"] = time_calls(lambda: index.search(next(queries) ^ 0b1011, k), repeat)
+        results[f"search_k{k}"]["indexed"] = size
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--phash-size", type=int, default=200000, help="hashes in the search benchmark")
+    add_baseline_arguments(parser, "micro")
+    args = parser.parse_args()
+
+    with open(os.path.join(BACKEND_DIR, "side.json")) as f:
+        assessment = json.load(f)
+    report = {
+        "drawing": bench_drawing(args.repeat, assessment),
+        "render_endpoints": bench_endpoints(args.repeat, assessment),
+        "encode_image_to_base64": bench_base64(args.repeat),
+        "cost_estimator": bench_cost(args.repeat, assessment),
+        "ai_screen": bench_ai_screen(args.repeat),
+        "phash": bench_phash(args.repeat, args.phash_size),
+    }
+    report["peak_rss_mb"] = peak_rss_mb()
+    finish(report, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Local stand-in for the OpenRouter chat-completions API.
+
+It answers like OpenRouter after a configurable latency, and simulates
+free-tier rate limiting: each model gets a token bucket (--rate requests/s,
+--burst) and a concurrency cap. Requests over either limit get a 429 with a
+Retry-After header. Latency follows --distribution: normal (mean --latency,
+sd --jitter), lognormal (median --latency, shape --jitter; heavy-tailed
+like the free models), exponential (mean --latency) or fixed. A fraction
+--error-rate of replies are 502s. Requests with stream: true get the reply
+as server-sent events: the first token after a tenth of the latency, the
+rest spread over the remainder. Point the backend at it with
+OPENROUTER_BASE_URL=http://127.0.0.1:8765/api/v1.
+
+Run from backend/:  python -m benchmarks.openrouter_stub --rate 2 --burst 2
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from typing import Dict
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+REPLY = ('```json\n{"description": "A silver sedan with a dented driver-side door.", '
+         '"ai_generated_likelihood": 0.1, "is_ai_generated": false, "confidence_score": 0.1, '
+         '"reasoning": "Consistent lighting and sensor noise."}\n```')
+
+
+DISTRIBUTIONS = ("normal", "lognormal", "exponential", "fixed")
+
+
+class StubLimits:
+    def __init__(self, rate: float, burst: float, max_concurrency: int,
+                 latency: float, jitter: float, error_rate: float, distribution: str = "normal"):
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"distribution must be one of {', '.join(DISTRIBUTIONS)}")
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.distribution = distribution
+        self.buckets: Dict[str, list] = {}
+        self.active: Dict[str, int] = {}
+        self.counts = {"requests": 0, "ok": 0, "rate_limited": 0, "errors": 0, "max_active": 0}
+
+    def admit(self, model: str) -> float:
+        """0 if the request may proceed, else the Retry-After seconds."""
+        now = time.monotonic()
+        bucket = self.buckets.setdefault(model, [self.burst, now])
+        if self.rate > 0:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                return (1 - bucket[0]) / self.rate
+        if self.max_concurrency and self.active.get(model, 0) >= self.max_concurrency:
+            return max(self.latency, 0.1)
+        if self.rate > 0:
+            bucket[0] -= 1
+        return 0.0
+
+    def sample_latency(self) -> float:
+        if self.distribution == "lognormal":
+            return random.lognormvariate(math.log(max(self.latency, 1e-6)), self.jitter)
+        if self.distribution == "exponential":
+            return random.expovariate(1 / self.latency) if self.latency > 0 else 0.0
+        if self.distribution == "fixed":
+            return self.latency
+        return max(0.0, random.gauss(self.latency, self.jitter))
+
+
+def create_app(limits: StubLimits) -> FastAPI:
+    app = FastAPI()
+    app.state.limits = limits
+
+    @app.post("/api/v1/chat/completions")
+    async def chat(request: Request):
+        body = await request.json()
+        model = body.get("model", "")
+        limits.counts["requests"] += 1
+        retry_after = limits.admit(model)
+        if retry_after:
+            limits.counts["rate_limited"] += 1
+            return JSONResponse({"error": {"code": 429, "message": "Rate limit exceeded"}},
+                                status_code=429,
+                                headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+        if body.get("stream"):
+            return StreamingResponse(stream_reply(model), media_type="text/event-stream")
+        limits.active[model] = limits.active.get(model, 0) + 1
+        limits.counts["max_active"] = max(limits.counts["max_active"], limits.active[model])
+        try:
+            await asyncio.sleep(limits.sample_latency())
+        finally:
+            limits.active[model] -= 1
+        if random.random() < limits.error_rate:
+            limits.counts["errors"] += 1
+            return JSONResponse({"error": {"code": 502, "message": "Upstream error"}}, status_code=502)
+        limits.counts["ok"] += 1
+        return {"model": model, "choices": [{"message": {"role": "assistant", "content": REPLY}}]}
+
+    async def stream_reply(model: str):
+        limits.active[model] = limits.active.get(model, 0) + 1
+        limits.counts["max_active"] = max(limits.counts["max_active"], limits.active[model])
+        try:
+            latency = limits.sample_latency()
+            tokens = [REPLY[i:i + 4] for i in range(0, len(REPLY), 4)]
+            yield ": OPENROUTER PROCESSING\n\n"
+            await asyncio.sleep(latency * 0.1)
+            if random.random() < limits.error_rate:  # streams fail with an error event
+                limits.counts["errors"] += 1
+                yield f"data: {json.dumps({'error': {'code': 502, 'message': 'Upstream error'}})}\n\n"
+                return
+            for token in tokens:
+                chunk = {"model": model, "choices": [{"delta": {"content": token}}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(latency * 0.9 / len(tokens))
+            yield "data: [DONE]\n\n"
+            limits.counts["ok"] += 1
+        finally:
+            limits.active[model] -= 1
+
+    @app.get("/stats")
+    def stats():
+        return limits.counts
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rate", type=float, default=2.0, help="requests/s per model (0 = no limit)")
+    parser.add_argument("--burst", type=float, default=2.0)
+    parser.add_argument("--max-concurrency", type=int, default=0, help="per model (0 = no limit)")
+    parser.add_argument("--latency", type=float, default=0.3, help="mean response time (s)")
+    parser.add_argument("--jitter", type=float, default=0.05,
+                        help="sd (normal) or shape (lognormal) of the latency")
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="normal")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 502 replies")
+    args = parser.parse_args()
+    limits = StubLimits(args.rate, args.burst, args.max_concurrency, args.latency, args.jitter,
+                        args.error_rate, args.distribution)
+    uvicorn.run(create_app(limits), host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
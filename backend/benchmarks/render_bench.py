@@ -0,0 +1,116 @@
+"""
+Damage marker compositor benchmark.
+
+Compares the vectorized compositor in damage_renderer against the original
+per-ring cv2.circle loop on the side view with the side.json components.
+It checks that both produce identical pixels, including randomised markers
+that overlap each other and the image border.
+
+Run from backend/:  python -m benchmarks.render_bench
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+import cv2
+import numpy as np
+
+from damage_renderer import composite_markers, damage_markers
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMAGES_DIR = os.path.join(os.path.dirname(BACKEND_DIR), "imgsss")
+
+
+def legacy_draw_gradient_damage(image, center_x, center_y, max_radius, start_color_bgr,
+                                final_alpha=0.8):
+    """The original full-frame, 50-ring implementation, kept as the reference."""
+    overlay = image.copy()
+    NUM_STEPS = 50
+    start_b, start_g, start_r = start_color_bgr
+    radius_step = max_radius / NUM_STEPS
+
+    for i in range(NUM_STEPS, 0, -1):
+        radius = int(i * radius_step)
+        t = i / NUM_STEPS
+        current_color = (int(start_b * t), int(start_g * t), int(start_r * t))
+        cv2.circle(overlay, (center_x, center_y), radius, current_color, -1)
+
+    cv2.addWeighted(overlay, final_alpha, image, 1 - final_alpha, 0, image)
+
+
+def legacy_render(base, markers):
+    image = base.copy()
+    for center_x, center_y, radius, color in markers:
+        legacy_draw_gradient_damage(image, center_x, center_y, radius, color)
+    return image
+
+
+def vectorized_render(base, markers):
+    return composite_markers(base.copy(), markers)
+
+
+def time_it(fn, repeat):
+    fn()  # warm-up (also builds the coverage table)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {"median_ms": round(samples[len(samples) // 2], 3), "min_ms": round(samples[0], 3)}
+
+
+def random_markers(rng, width, height, count):
+    colors = [(0, 0, 255), (0, 128, 255), (255, 0, 0), (37, 201, 90)]
+    return [(rng.randint(-50, width + 50), rng.randint(-50, height + 50),
+             rng.randint(0, 400), rng.choice(colors)) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--random-cases", type=int, default=50)
+    args = parser.parse_args()
+
+    base = cv2.imread(os.path.join(IMAGES_DIR, "side.PNG"))
+    with open(os.path.join(BACKEND_DIR, "side.json")) as f:
+        components = json.load(f)["car_side_damage_assessment"]["sections_of_interest"]
+    height, width = base.shape[:2]
+
+    # Parameters used by /admin/render-damage and /render-damage-impact respectively
+    scenarios = {
+        "admin_overlay_left": damage_markers(components, width, "left", 100, 10.0),
+        "admin_overlay_right": damage_markers(components, width, "right", 100, 10.0),
+        "impact": damage_markers(components, width, "left", 24, 100.0),
+        "all_components_x10": damage_markers(components, width, "both", 24, 100.0) * 10,
+    }
+
+    rng = random.Random(1234)
+    mismatches = 0
+    for _ in range(args.random_cases):
+        markers = random_markers(rng, width, height, rng.randint(1, 8))
+        if not np.array_equal(legacy_render(base, markers), vectorized_render(base, markers)):
+            mismatches += 1
+
+    results = {"image": f"{width}x{height}", "random_case_mismatches": mismatches, "scenarios": {}}
+    for name, markers in scenarios.items():
+        identical = np.array_equal(legacy_render(base, markers), vectorized_render(base, markers))
+        legacy = time_it(lambda: legacy_render(base, markers), args.repeat)
+        vectorized = time_it(lambda: vectorized_render(base, markers), args.repeat)
+        results["scenarios"][name] = {
+            "markers": len(markers),
+            "pixel_identical": identical,
+            "legacy": legacy,
+            "vectorized": vectorized,
+            "speedup": round(legacy["median_ms"] / max(vectorized["median_ms"], 1e-6), 2),
+        }
+
+    print(json.dumps(results, indent=2))
+    if mismatches or not all(s["pixel_identical"] for s in results["scenarios"].values()):
+        raise SystemExit("vectorized output differs from the legacy renderer")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Upstream scheduler benchmark against the rate-limiting stub.
+
+Starts benchmarks.openrouter_stub in-process, then sends a burst of bulk
+calls followed by a few interactive ones through OpenRouterClient. It does
+this twice: with the scheduler's rate limit set just under the stub's (so
+arrival jitter does not trip it), and with no client-side rate limit (AIMD
+alone). It reports the 429s seen, latency per priority class, and the
+adapted concurrency limit. Interactive calls should be admitted ahead of
+the queued bulk calls.
+
+Run from backend/:  python -m benchmarks.scheduler_bench
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.harness import start_server
+from benchmarks.openrouter_stub import StubLimits, create_app
+from openrouter_client import OpenRouterClient, UpstreamError
+from scheduler import UpstreamScheduler
+
+MODEL = "mistralai/mistral-small-3.2-24b-instruct:free"
+
+
+async def run_scenario(port: int, rate: float, burst: float, bulk: int, interactive: int,
+                       retries: int) -> dict:
+    scheduler = UpstreamScheduler(default_rate=rate, default_burst=burst, default_limit=8,
+                                  default_backoff=1.0)
+    client = OpenRouterClient("stub-key", base_url=f"http://127.0.0.1:{port}/api/v1",
+                              scheduler=scheduler)
+    completed = {"bulk": [], "interactive": []}
+    throttled = 0
+    payload = {"model": MODEL, "messages": [{"role": "user", "content": "hi"}]}
+
+    async def call(priority: str):
+        nonlocal throttled
+        start = time.monotonic()
+        for _ in range(retries + 1):
+            try:
+                await client.chat(payload, priority=priority)
+                completed[priority].append(time.monotonic() - start)
+                return
+            except UpstreamError:
+                throttled += 1
+
+    started = time.monotonic()
+    tasks = [asyncio.create_task(call("bulk")) for _ in range(bulk)]
+    await asyncio.sleep(0.2)  # interactive requests arrive while the bulk backlog is queued
+    tasks += [asyncio.create_task(call("interactive")) for _ in range(interactive)]
+    await asyncio.gather(*tasks)
+    elapsed = time.monotonic() - started
+    lane = scheduler.lane(MODEL).stats()
+    await client.aclose()
+
+    def summary(samples):
+        return {"completed": len(samples),
+                "mean_latency_s": round(sum(samples) / len(samples), 3) if samples else None,
+                "max_latency_s": round(max(samples), 3) if samples else None}
+
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "client_429s": throttled,
+        "bulk": summary(completed["bulk"]),
+        "interactive": summary(completed["interactive"]),
+        "final_limit": lane["limit"],
+        "mean_admission_wait_s": lane["mean_wait_seconds"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--stub-rate", type=float, default=5.0)
+    parser.add_argument("--stub-burst", type=float, default=5.0)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--bulk", type=int, default=40)
+    parser.add_argument("--interactive", type=int, default=5)
+    parser.add_argument("--retries", type=int, default=5)
+    args = parser.parse_args()
+
+    limits = StubLimits(args.stub_rate, args.stub_burst, 0, args.latency, 0.02, 0.0)
+    server = start_server(create_app(limits), args.port)
+    results = {}
+    try:
+        for name, rate in (("rate_limited", args.stub_rate * 0.9), ("aimd_only", 0.0)):
+            limits.counts.update(requests=0, ok=0, rate_limited=0)
+            results[name] = asyncio.run(run_scenario(args.port, rate, args.stub_burst, args.bulk,
+                                                     args.interactive, args.retries))
+            results[name]["stub"] = dict(limits.counts)
+            time.sleep(args.stub_burst / args.stub_rate)  # let the stub's bucket refill
+    finally:
+        server.should_exit = True
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Cold start and memory of each API profile (see api.py).
+
+For every profile, --runs times: start `uvicorn api:app` in a fresh
+process with API_PROFILE set, and time it until /health answers. Then
+read its resident memory from /proc and check its memory map for the
+OpenCV and NumPy extension modules (the gateway must load neither).
+
+Reports p50/p95/p99 of the time to ready per profile, plus the RSS of the
+last run, and compares against the stored baseline (see benchmarks.harness).
+Linux only (/proc).
+
+Run from backend/:  python -m benchmarks.startup_bench [--save-baseline]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.harness import BACKEND_DIR, add_baseline_arguments, finish, summarize
+
+PROFILES = ("gateway", "renderer", "all")
+# Extension modules whose presence in a process's memory map means the library was imported
+LIBRARIES = {"opencv": "cv2", "numpy": "_multiarray_umath"}
+
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return round(int(line.split()[1]) / 1024, 1)
+    return 0.0
+
+
+def loaded_libraries(pid: int) -> dict:
+    with open(f"/proc/{pid}/maps") as f:
+        maps = f.read()
+    return {name: marker in maps for name, marker in LIBRARIES.items()}
+
+
+def start_profile(profile: str, port: int, data_dir: str, timeout: float = 60.0):
+    """Start the API with this profile; returns (process, seconds until /health answered)."""
+    env = {**os.environ, "API_PROFILE": profile, "JOB_DATA_DIR": data_dir,
+           "RENDER_CACHE_DIR": os.path.join(data_dir, "renders")}
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env)
+    deadline = start + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"{profile}: server exited with code {process.returncode}")
+        try:
+            response = httpx.get(f"http://127.0.0.1:{port}/health", timeout=0.5)
+            if response.status_code == 200:
+                return process, time.perf_counter() - start
+        except httpx.TransportError:
+            pass
+        time.sleep(0.01)
+    process.kill()
+    raise SystemExit(f"{profile}: /health did not answer within {timeout:g}s")
+
+
+def stop(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def bench_profile(profile: str, runs: int, port: int) -> dict:
+    samples, rss, libraries = [], 0.0, {}
+    for _ in range(runs):
+        # A fresh data directory per run, so no run starts on another's job or claim database
+        with tempfile.TemporaryDirectory(prefix="startup-bench-") as data_dir:
+            process, seconds = start_profile(profile, port, data_dir)
+            samples.append(seconds * 1000)
+            rss, libraries = rss_mb(process.pid), loaded_libraries(process.pid)
+            stop(process)
+    return {"ready": summarize(samples), "peak_rss_mb": rss, **libraries}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=18931)
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES), choices=PROFILES)
+    add_baseline_arguments(parser, "startup")
+    args = parser.parse_args()
+
+    report = {profile: bench_profile(profile, args.runs, args.port) for profile in args.profiles}
+    if report.get("gateway", {}).get("opencv"):
+        raise SystemExit("the gateway profile imported OpenCV")
+    finish(report, args)
+
+
+if __name__ == "__main__":
+    main()
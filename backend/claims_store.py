@@ -0,0 +1,598 @@
+"""
+Claims and their analysis results, stored in SQLite for the assessor portal.
+
+A claim is one row. The fields the portal filters and sorts on (status,
+damage severity, AI-generated likelihood, created_at) are columns with
+their own indexes, and everything else the claim form collects is kept as
+JSON. Listing uses keyset pagination: a page ends with a cursor holding
+the last row's (sort value, id), and the next page starts after it with a
+row-value comparison on the index. So every page costs the same however
+deep it is, unlike OFFSET, which reads and discards every earlier row.
+
+Analyses (explain, check_ai, damage) are rows of their own. Their model
+description and reasoning are indexed with FTS5, so assessors can search
+what the models said. AnalysisWriter buffers results as they complete and
+writes them in one transaction per batch. Each write also refreshes the
+claim's severity and AI likelihood (the highest over its analyses).
+
+Seed a store with synthetic claims:  python claims_store.py seed 100000
+"""
+import asyncio
+import base64
+import json
+import os
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+STATUSES = ("Pending Review", "Under Assessment", "AI Review", "Approved", "Flagged", "Rejected")
+FRAUD_RISKS = ("Low", "Medium", "High")
+SORT_KEYS = ("created_at", "severity", "ai_likelihood")
+ANALYSIS_KINDS = ("explain", "check_ai", "damage")
+MAX_PAGE_SIZE = 200
+
+# Claim columns set from the request body; anything else goes into the JSON data column
+CLAIM_FIELDS = ("reference", "status", "severity", "ai_likelihood", "fraud_risk", "holder_name",
+                "holder_email", "policy_number", "vehicle", "license_plate", "description",
+                "estimated_cost", "assessor")
+SUMMARY_COLUMNS = "id, " + ", ".join(CLAIM_FIELDS) + ", created_at, updated_at"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS claims (
+    id TEXT PRIMARY KEY,
+    reference TEXT,
+    status TEXT NOT NULL,
+    severity REAL,
+    ai_likelihood REAL,
+    fraud_risk TEXT,
+    holder_name TEXT,
+    holder_email TEXT,
+    policy_number TEXT,
+    vehicle TEXT,
+    license_plate TEXT,
+    description TEXT,
+    estimated_cost REAL,
+    assessor TEXT,
+    data TEXT NOT NULL DEFAULT '{}',
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS claims_created ON claims (created_at, id);
+CREATE INDEX IF NOT EXISTS claims_severity ON claims (severity, id);
+CREATE INDEX IF NOT EXISTS claims_ai ON claims (ai_likelihood, id);
+CREATE INDEX IF NOT EXISTS claims_status_created ON claims (status, created_at, id);
+CREATE INDEX IF NOT EXISTS claims_status_severity ON claims (status, severity, id);
+CREATE INDEX IF NOT EXISTS claims_status_ai ON claims (status, ai_likelihood, id);
+CREATE INDEX IF NOT EXISTS claims_email ON claims (holder_email, created_at);
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY,
+    claim_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    image_digest TEXT,
+    filename TEXT,
+    model TEXT,
+    description TEXT,
+    reasoning TEXT,
+    severity REAL,
+    ai_likelihood REAL,
+    result TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS analyses_claim ON analyses (claim_id, id);
+CREATE VIRTUAL TABLE IF NOT EXISTS analyses_fts USING fts5(
+    description, reasoning, content='analyses', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS analyses_fts_insert AFTER INSERT ON analyses BEGIN
+    INSERT INTO analyses_fts (rowid, description, reasoning)
+    VALUES (new.id, new.description, new.reasoning);
+END;
+CREATE TRIGGER IF NOT EXISTS analyses_fts_delete AFTER DELETE ON analyses BEGIN
+    INSERT INTO analyses_fts (analyses_fts, rowid, description, reasoning)
+    VALUES ('delete', old.id, old.description, old.reasoning);
+END;
+"""
+
+
+def new_claim_id() -> str:
+    """CLM-<ms>-<6 chars>, as the frontend's claims database generates them."""
+    return f"CLM-{int(time.time() * 1000)}-{uuid.uuid4().hex[:6].upper()}"
+
+
+def new_reference() -> str:
+    return f"CHB-{time.gmtime().tm_year}-{random.randint(0, 999999):06d}"
+
+
+def encode_cursor(value: Any, claim_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([value, claim_id]).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, Any]:
+    """(sort value, id) from a cursor; ValueError if it was not made by encode_cursor."""
+    try:
+        value, last_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (TypeError, ValueError):  # binascii.Error and JSONDecodeError are ValueErrors
+        raise ValueError("invalid cursor")
+    return value, last_id
+
+
+def match_expression(query: str) -> str:
+    """
+    An FTS5 MATCH expression for free text: every word must appear (porter
+    stemmed), and a trailing * makes a word a prefix. Words are quoted, so
+    FTS syntax characters in the query cannot cause a syntax error.
+    """
+    terms = []
+    for word, star in re.findall(r"(\w+)(\*?)", query):
+        terms.append(f'"{word}"' + ("*" if star else ""))
+    if not terms:
+        raise ValueError("search query has no words")
+    return " ".join(terms)
+
+
+class ClaimsStore:
+    """SQLite persistence for claims and their analyses (safe to share between processes)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False,
+                                     timeout=10.0)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+        self.pages = 0
+        self.searches = 0
+        self.analyses_written = 0
+        self.batches_written = 0
+
+    @classmethod
+    def from_env(cls, data_dir: str) -> "ClaimsStore":
+        """Store at CLAIMS_DB_PATH (default <data_dir>/claims.sqlite3)."""
+        return cls(os.getenv("CLAIMS_DB_PATH", os.path.join(data_dir, "claims.sqlite3")))
+
+    def _claim(self, row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        claim = dict(row)
+        if "data" in claim:
+            claim["data"] = json.loads(claim["data"])
+        return claim
+
+    # --- Claims ---
+    def add_claims(self, claims: Iterable[Dict[str, Any]]) -> List[str]:
+        """
+        Insert claims in one transaction and return their ids. Known fields
+        become columns, the rest is kept as data; id, reference, status and
+        created_at are filled in when missing. Raises ValueError on a bad
+        status or fraud risk.
+        """
+        now = time.time()
+        rows = []
+        for claim in claims:
+            claim = dict(claim)
+            status = claim.setdefault("status", "Pending Review")
+            if status not in STATUSES:
+                raise ValueError(f"status must be one of {', '.join(STATUSES)}")
+            if claim.get("fraud_risk") not in (None, *FRAUD_RISKS):
+                raise ValueError(f"fraud_risk must be one of {', '.join(FRAUD_RISKS)}")
+            claim_id = claim.pop("id", None) or new_claim_id()
+            claim.setdefault("reference", new_reference())
+            created_at = float(claim.pop("created_at", None) or now)
+            claim.pop("updated_at", None)
+            data = claim.pop("data", None) or {}
+            data.update({key: value for key, value in claim.items() if key not in CLAIM_FIELDS})
+            rows.append((claim_id, *(claim.get(field) for field in CLAIM_FIELDS),
+                         json.dumps(data), created_at, now))
+        placeholders = ", ".join("?" * (len(CLAIM_FIELDS) + 4))
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    f"INSERT INTO claims (id, {', '.join(CLAIM_FIELDS)}, data, created_at, updated_at) "
+                    f"VALUES ({placeholders})", rows)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [row[0] for row in rows]
+
+    def get(self, claim_id: str, analyses: bool = True) -> Optional[Dict[str, Any]]:
+        """The claim with its analyses (oldest first), or None if unknown."""
+        with self._lock:
+            claim = self._claim(self._conn.execute("SELECT * FROM claims WHERE id = ?",
+                                                   (claim_id,)).fetchone())
+            if claim is not None and analyses:
+                claim["analyses"] = [self._analysis(row) for row in self._conn.execute(
+                    "SELECT * FROM analyses WHERE claim_id = ? ORDER BY id", (claim_id,))]
+        return claim
+
+    def update(self, claim_id: str, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Set claim columns (data keys are merged); returns the claim, None if unknown."""
+        if "status" in changes and changes["status"] not in STATUSES:
+            raise ValueError(f"status must be one of {', '.join(STATUSES)}")
+        if changes.get("fraud_risk") not in (None, *FRAUD_RISKS):
+            raise ValueError(f"fraud_risk must be one of {', '.join(FRAUD_RISKS)}")
+        columns = {key: value for key, value in changes.items() if key in CLAIM_FIELDS}
+        extra = {key: value for key, value in changes.items()
+                 if key not in CLAIM_FIELDS and key not in ("id", "data", "created_at", "updated_at")}
+        extra.update(changes.get("data") or {})
+        assignments = "".join(f"{column} = ?, " for column in columns)
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE claims SET {assignments}data = json_patch(data, ?), updated_at = ? WHERE id = ?",
+                (*columns.values(), json.dumps(extra), time.time(), claim_id))
+        return self.get(claim_id, analyses=False) if cursor.rowcount else None
+
+    def page(self, sort: str = "created_at", descending: bool = True, limit: int = 50,
+             cursor: Optional[str] = None, status: Optional[str] = None,
+             fraud_risk: Optional[str] = None, holder_email: Optional[str] = None,
+             min_severity: Optional[float] = None, max_severity: Optional[float] = None,
+             min_ai_likelihood: Optional[float] = None, max_ai_likelihood: Optional[float] = None,
+             created_after: Optional[float] = None,
+             created_before: Optional[float] = None) -> Dict[str, Any]:
+        """
+        One page of claims ordered by sort (then id), starting after cursor.
+        Claims without a value for the sort key (not yet analysed) are left
+        out when sorting by severity or ai_likelihood. Returns {"claims",
+        "next_cursor"}; next_cursor is None on the last page.
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"sort must be one of {', '.join(SORT_KEYS)}")
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        where, params = [], []
+        for clause, value in (("status = ?", status), ("fraud_risk = ?", fraud_risk),
+                              ("holder_email = ?", holder_email),
+                              ("severity >= ?", min_severity), ("severity <= ?", max_severity),
+                              ("ai_likelihood >= ?", min_ai_likelihood),
+                              ("ai_likelihood <= ?", max_ai_likelihood),
+                              ("created_at >= ?", created_after), ("created_at < ?", created_before)):
+            if value is not None:
+                where.append(clause)
+                params.append(value)
+        if sort != "created_at":
+            where.append(f"{sort} IS NOT NULL")
+        if cursor is not None:
+            value, last_id = decode_cursor(cursor)
+            # Row-value comparison: a range scan on the (sort, id) index
+            where.append(f"({sort}, id) {'<' if descending else '>'} (?, ?)")
+            params.extend((value, last_id))
+        direction = "DESC" if descending else "ASC"
+        sql = (f"SELECT {SUMMARY_COLUMNS} FROM claims"
+               + (" WHERE " + " AND ".join(where) if where else "")
+               + f" ORDER BY {sort} {direction}, id {direction} LIMIT ?")
+        with self._lock:
+            rows = self._conn.execute(sql, (*params, limit + 1)).fetchall()
+            self.pages += 1
+        claims = [dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = claims[-1]
+            next_cursor = encode_cursor(last[sort], last["id"])
+        return {"claims": claims, "next_cursor": next_cursor}
+
+    def counts(self) -> Dict[str, Any]:
+        """Claims by status and by fraud risk (for the dashboard)."""
+        with self._lock:
+            by_status = self._conn.execute(
+                "SELECT status, COUNT(*) FROM claims GROUP BY status").fetchall()
+            by_risk = self._conn.execute(
+                "SELECT fraud_risk, COUNT(*) FROM claims WHERE fraud_risk IS NOT NULL "
+                "GROUP BY fraud_risk").fetchall()
+        statuses = {status: count for status, count in by_status}
+        return {"total": sum(statuses.values()), "status": statuses,
+                "fraud_risk": {risk: count for risk, count in by_risk}}
+
+    # --- Analyses ---
+    def _analysis(self, row: sqlite3.Row) -> Dict[str, Any]:
+        analysis = dict(row)
+        analysis["result"] = json.loads(analysis["result"])
+        return analysis
+
+    def add_analyses(self, analyses: List[Dict[str, Any]]) -> int:
+        """
+        Insert analysis results in one transaction and refresh the severity
+        and AI likelihood of their claims. A claim that was Pending Review
+        moves to AI Review, as when the frontend attaches an analysis.
+        """
+        if not analyses:
+            return 0
+        now = time.time()
+        rows = [(a["claim_id"], a["kind"], a.get("image_digest"), a.get("filename"), a.get("model"),
+                 a.get("description"), a.get("reasoning"), a.get("severity"), a.get("ai_likelihood"),
+                 json.dumps(a.get("result") or {}), a.get("created_at") or now) for a in analyses]
+        claim_ids = sorted({a["claim_id"] for a in analyses})
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO analyses (claim_id, kind, image_digest, filename, model, description, "
+                    "reasoning, severity, ai_likelihood, result, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                self._conn.executemany(
+                    "UPDATE claims SET "
+                    "severity = COALESCE((SELECT MAX(severity) FROM analyses WHERE claim_id = claims.id), "
+                    "severity), "
+                    "ai_likelihood = COALESCE((SELECT MAX(ai_likelihood) FROM analyses "
+                    "WHERE claim_id = claims.id), ai_likelihood), "
+                    "status = CASE status WHEN 'Pending Review' THEN 'AI Review' ELSE status END, "
+                    "updated_at = ? WHERE id = ?", [(now, claim_id) for claim_id in claim_ids])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self.analyses_written += len(rows)
+            self.batches_written += 1
+        return len(rows)
+
+    def search(self, query: str, limit: int = 20, cursor: Optional[str] = None,
+               claim_id: Optional[str] = None, kind: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Analyses whose description or reasoning matches query, best match
+        first (BM25), with a highlighted snippet and their claim's status.
+        Raises ValueError on an empty query or a bad cursor.
+
+        BM25 scores depend on the whole corpus, so they shift as analyses are
+        written and cannot serve as a keyset. Instead the first page pins a
+        snapshot (the highest analysis id at the time) and the cursor carries
+        that and an offset: later pages skip analyses written since and keep
+        the first page's order. Scores of existing rows still drift a little
+        with the corpus, so a row near a page boundary can rarely move across it.
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        where, params = ["analyses_fts MATCH ?"], [match_expression(query)]
+        if claim_id is not None:
+            where.append("analyses.claim_id = ?")
+            params.append(claim_id)
+        if kind is not None:
+            where.append("analyses.kind = ?")
+            params.append(kind)
+        offset = 0
+        if cursor is not None:
+            offset, snapshot = decode_cursor(cursor)
+            if (not isinstance(offset, int) or offset < 0
+                    or not isinstance(snapshot, int) or isinstance(snapshot, bool)):
+                raise ValueError("invalid cursor")
+        else:
+            with self._lock:
+                snapshot = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM analyses").fetchone()[0]
+        where.append("analyses_fts.rowid <= ?")
+        params.append(snapshot)
+        sql = ("SELECT analyses.id, analyses.claim_id, analyses.kind, analyses.filename, "
+               "analyses.model, analyses.severity, analyses.ai_likelihood, analyses.created_at, "
+               "snippet(analyses_fts, -1, '[', ']', '…', 16) AS snippet, analyses_fts.rank AS rank, "
+               "claims.status, claims.holder_name "
+               "FROM analyses_fts JOIN analyses ON analyses.id = analyses_fts.rowid "
+               "LEFT JOIN claims ON claims.id = analyses.claim_id "
+               f"WHERE {' AND '.join(where)} ORDER BY analyses_fts.rank, analyses_fts.rowid LIMIT ? OFFSET ?")
+        with self._lock:
+            try:
+                rows = self._conn.execute(sql, (*params, limit + 1, offset)).fetchall()
+            except sqlite3.OperationalError as e:  # e.g. a prefix too short for FTS5
+                raise ValueError(f"invalid search query: {e}")
+            self.searches += 1
+        results = [dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = encode_cursor(offset + limit, snapshot)
+        return {"results": results, "next_cursor": next_cursor}
+
+    def stats(self) -> Dict[str, Any]:
+        return {"pages": self.pages, "searches": self.searches,
+                "analyses_written": self.analyses_written, "batches_written": self.batches_written}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class AnalysisWriter:
+    """
+    Buffers analysis results as they complete and writes them to the store
+    in batches: when max_batch are waiting or flush_interval seconds after
+    the first, whichever comes first. stop() writes whatever is left.
+
+    A batch whose transaction fails (e.g. "database is locked") goes back to
+    the front of the queue and is retried with exponential backoff, up to
+    max_retries times; after that its rows are written one by one, so only
+    rows that fail on their own are dropped (counted in failed).
+    """
+
+    def __init__(self, store: ClaimsStore, max_batch: int = 256, flush_interval: float = 0.5,
+                 max_retries: int = 5, max_backoff: float = 10.0):
+        self.store = store
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+        self._pending: List[Dict[str, Any]] = []
+        self._task: Optional[asyncio.Task] = None
+        # Created lazily so it binds to the running event loop
+        self._wake: Optional[asyncio.Event] = None
+        self.retries = 0
+        self.failed = 0
+        self.last_error: Optional[str] = None
+
+    @classmethod
+    def from_env(cls, store: ClaimsStore) -> "AnalysisWriter":
+        return cls(store, max_batch=int(os.getenv("CLAIMS_WRITE_BATCH", "256")),
+                   flush_interval=float(os.getenv("CLAIMS_WRITE_INTERVAL", "0.5")),
+                   max_retries=int(os.getenv("CLAIMS_WRITE_RETRIES", "5")))
+
+    def _event(self) -> asyncio.Event:
+        if self._wake is None:
+            self._wake = asyncio.Event()
+        return self._wake
+
+    def record(self, analysis: Dict[str, Any]) -> None:
+        """Queue one analysis row for the next batch (never blocks)."""
+        self._pending.append(analysis)
+        if len(self._pending) == 1 or len(self._pending) >= self.max_batch:
+            self._event().set()
+
+    async def flush(self) -> int:
+        """Write everything pending in one transaction; on failure it is put back and re-raised."""
+        batch, self._pending = self._pending, []
+        if not batch:
+            return 0
+        try:
+            return await asyncio.to_thread(self.store.add_analyses, batch)
+        except Exception as e:
+            self._pending[:0] = batch
+            self.last_error = str(e) or type(e).__name__
+            raise
+
+    async def flush_each(self) -> int:
+        """Write pending rows one transaction each, dropping only the rows that fail."""
+        batch, self._pending = self._pending, []
+        written = 0
+        for analysis in batch:
+            try:
+                written += await asyncio.to_thread(self.store.add_analyses, [analysis])
+            except Exception as e:
+                self.failed += 1
+                self.last_error = str(e) or type(e).__name__
+        return written
+
+    async def _run(self) -> None:
+        wake = self._event()
+        attempts = 0
+        while True:
+            if attempts:
+                await asyncio.sleep(min(self.flush_interval * 2 ** attempts, self.max_backoff))
+            else:
+                await wake.wait()
+                wake.clear()
+                if len(self._pending) < self.max_batch:
+                    # Let more results arrive so they share the transaction
+                    try:
+                        await asyncio.wait_for(wake.wait(), self.flush_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    wake.clear()
+            try:
+                await self.flush()
+                attempts = 0
+            except Exception:
+                attempts += 1
+                self.retries += 1
+                if attempts > self.max_retries:
+                    await self.flush_each()
+                    attempts = 0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._pending:
+            try:
+                await self.flush()
+            except Exception:
+                await self.flush_each()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"pending": len(self._pending), "retries": self.retries, "failed": self.failed,
+                "last_error": self.last_error, **self.store.stats()}
+
+
+# --- Synthetic data (benchmarks and the demo portal) ---
+_VEHICLES = ("Toyota Camry", "Honda Civic", "Ford Focus", "BMW 320i", "Tesla Model 3", "VW Golf")
+_DAMAGE = ("dented driver-side door", "cracked front bumper", "scratched rear quarter panel",
+           "shattered windscreen", "crumpled bonnet", "broken tail light")
+_CUES = ("consistent sensor noise", "natural reflections", "plausible shadows",
+         "smeared licence plate text", "over-smooth paint texture", "warped wheel spokes")
+
+
+def synthetic_claims(count: int, seed: int = 0) -> Iterable[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """(claim, check_ai analysis) pairs spread over the last year."""
+    rng = random.Random(seed)
+    now = time.time()
+    for i in range(count):
+        claim_id = f"CLM-SEED-{i:07d}"
+        likelihood = round(rng.betavariate(1.2, 6), 3)
+        damage = rng.choice(_DAMAGE)
+        claim = {"id": claim_id, "status": rng.choice(STATUSES),
+                 "severity": round(rng.uniform(5, 95), 1), "ai_likelihood": likelihood,
+                 "fraud_risk": "High" if likelihood > 0.6 else "Medium" if likelihood > 0.3 else "Low",
+                 "holder_name": f"Holder {i}", "holder_email": f"holder{i % 5000}@example.com",
+                 "policy_number": f"POL-{rng.randint(0, 10**8):08d}",
+                 "vehicle": rng.choice(_VEHICLES), "license_plate": f"AB{rng.randint(0, 9999):04d}",
+                 "description": f"Collision leaving a {damage}",
+                 "created_at": now - rng.uniform(0, 365 * 86400)}
+        cues = ", ".join(rng.sample(_CUES, 2))
+        analysis = {"claim_id": claim_id, "kind": "check_ai", "model": "seed",
+                    "description": f"A {claim['vehicle']} with a {damage}.",
+                    "reasoning": f"Judged on {cues}.", "ai_likelihood": likelihood,
+                    "result": {"is_ai_generated": likelihood > 0.5, "confidence_score": likelihood}}
+        yield claim, analysis
+
+
+def seed(store: ClaimsStore, count: int, batch: int = 5000) -> None:
+    claims, analyses = [], []
+    for claim, analysis in synthetic_claims(count):
+        claims.append(claim)
+        analyses.append(analysis)
+        if len(claims) >= batch:
+            store.add_claims(claims)
+            store.add_analyses(analyses)
+            claims, analyses = [], []
+    store.add_claims(claims)
+    store.add_analyses(analyses)
+
+
+def main(argv: List[str]) -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Seed or query the claims store")
+    parser.add_argument("--db", default=os.getenv("CLAIMS_DB_PATH", os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "job_data", "claims.sqlite3")))
+    sub = parser.add_subparsers(dest="command", required=True)
+    seed_parser = sub.add_parser("seed", help="insert synthetic claims with one analysis each")
+    seed_parser.add_argument("count", type=int)
+    page_parser = sub.add_parser("page", help="time paging through claims")
+    page_parser.add_argument("--sort", choices=SORT_KEYS, default="created_at")
+    page_parser.add_argument("--status", choices=STATUSES)
+    page_parser.add_argument("--limit", type=int, default=50)
+    page_parser.add_argument("--pages", type=int, default=20)
+    search_parser = sub.add_parser("search", help="full-text search over analyses")
+    search_parser.add_argument("query")
+    args = parser.parse_args(argv)
+
+    store = ClaimsStore(args.db)
+    if args.command == "seed":
+        started = time.perf_counter()
+        seed(store, args.count)
+        print(f"seeded {args.count} claims in {time.perf_counter() - started:.1f}s")
+    elif args.command == "page":
+        cursor, timings = None, []
+        for _ in range(args.pages):
+            started = time.perf_counter()
+            result = store.page(sort=args.sort, status=args.status, limit=args.limit, cursor=cursor)
+            timings.append((time.perf_counter() - started) * 1000)
+            cursor = result["next_cursor"]
+            if cursor is None:
+                break
+        timings.sort()
+        print(f"{len(timings)} pages: p50 {timings[len(timings) // 2]:.2f} ms, max {timings[-1]:.2f} ms")
+    else:
+        started = time.perf_counter()
+        result = store.search(args.query)
+        print(json.dumps(result, indent=2))
+        print(f"{(time.perf_counter() - started) * 1000:.2f} ms", file=sys.stderr)
+    store.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,241 @@
+"""
+Deterministic repair-cost estimate from a component-level damage assessment.
+
+Input is the component list the render endpoints already take
+(car_side_damage_assessment.sections_of_interest: component,
+percentage_damage, bbox). Each component name is mapped to a part type in
+the price table (front_left_door -> door, rear_wheel -> wheel), and the
+repair-vs-replace rule is evaluated for all components at once with NumPy:
+
+* repair: repair_hours + repair_hours_per_pct * damage of labour, and a
+  refinish share of paint_hours that grows with the damage
+* replace: the part, replace_hours of labour and a full refinish
+* a component is replaced when its damage reaches the part's replace_at
+  percentage, or when repairing would cost at least as much as replacing
+
+The price table is a JSON document (COST_TABLE_PATH) merged over the
+defaults below, so shops can set their own rates without code changes. The
+same assessment and table always give the same estimate, in microseconds,
+so no model call is needed. A language model is only used, optionally, to
+write a narrative around the finished figures.
+"""
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_PRICE_TABLE: Dict[str, Any] = {
+    "currency": "USD",
+    "labour_rate": 95.0,  # per hour
+    "paint_rate": 60.0,  # per refinish hour, materials included
+    "parts": {
+        # part: part price, hours to replace, base + per-percent hours to repair,
+        # full refinish hours, and the damage percentage from which it is replaced
+        "door": {"part_price": 1150.0, "replace_hours": 3.0, "repair_hours": 1.0,
+                 "repair_hours_per_pct": 0.15, "paint_hours": 2.5, "replace_at": 45.0},
+        "window": {"part_price": 320.0, "replace_hours": 1.5, "repair_hours": 0.5,
+                   "repair_hours_per_pct": 0.1, "paint_hours": 0.0, "replace_at": 5.0},
+        "windshield": {"part_price": 650.0, "replace_hours": 2.0, "repair_hours": 0.5,
+                       "repair_hours_per_pct": 0.1, "paint_hours": 0.0, "replace_at": 3.0},
+        "wheel": {"part_price": 420.0, "replace_hours": 0.8, "repair_hours": 1.0,
+                  "repair_hours_per_pct": 0.05, "paint_hours": 0.5, "replace_at": 30.0},
+        "bumper": {"part_price": 650.0, "replace_hours": 2.0, "repair_hours": 1.0,
+                   "repair_hours_per_pct": 0.1, "paint_hours": 2.0, "replace_at": 40.0},
+        "fender": {"part_price": 480.0, "replace_hours": 2.2, "repair_hours": 1.0,
+                   "repair_hours_per_pct": 0.12, "paint_hours": 2.0, "replace_at": 45.0},
+        "quarter_panel": {"part_price": 900.0, "replace_hours": 8.0, "repair_hours": 1.5,
+                          "repair_hours_per_pct": 0.18, "paint_hours": 2.5, "replace_at": 60.0},
+        "hood": {"part_price": 780.0, "replace_hours": 1.5, "repair_hours": 1.0,
+                 "repair_hours_per_pct": 0.12, "paint_hours": 3.0, "replace_at": 45.0},
+        "trunk": {"part_price": 820.0, "replace_hours": 1.8, "repair_hours": 1.0,
+                  "repair_hours_per_pct": 0.12, "paint_hours": 2.8, "replace_at": 45.0},
+        "roof": {"part_price": 1400.0, "replace_hours": 12.0, "repair_hours": 2.0,
+                 "repair_hours_per_pct": 0.2, "paint_hours": 3.5, "replace_at": 70.0},
+        "mirror": {"part_price": 260.0, "replace_hours": 0.6, "repair_hours": 0.3,
+                   "repair_hours_per_pct": 0.02, "paint_hours": 0.5, "replace_at": 20.0},
+        "headlight": {"part_price": 540.0, "replace_hours": 1.0, "repair_hours": 0.5,
+                      "repair_hours_per_pct": 0.05, "paint_hours": 0.0, "replace_at": 10.0},
+        "taillight": {"part_price": 310.0, "replace_hours": 0.6, "repair_hours": 0.5,
+                      "repair_hours_per_pct": 0.05, "paint_hours": 0.0, "replace_at": 10.0},
+        "grille": {"part_price": 280.0, "replace_hours": 0.8, "repair_hours": 0.5,
+                   "repair_hours_per_pct": 0.05, "paint_hours": 0.0, "replace_at": 20.0},
+        # Anything the table does not know
+        "default": {"part_price": 600.0, "replace_hours": 2.0, "repair_hours": 1.0,
+                    "repair_hours_per_pct": 0.12, "paint_hours": 1.5, "replace_at": 50.0},
+    },
+}
+
+PART_FIELDS = ("part_price", "replace_hours", "repair_hours", "repair_hours_per_pct",
+               "paint_hours", "replace_at")
+# Position words dropped from component names to find the part type
+POSITION_WORDS = {"front", "rear", "left", "right", "driver", "passenger", "side", "upper",
+                  "lower", "center", "centre"}
+
+
+def load_price_table(path: Optional[str] = None) -> Dict[str, Any]:
+    """The default table, with the JSON file at path (if any) merged over it."""
+    table = json.loads(json.dumps(DEFAULT_PRICE_TABLE))
+    if not path:
+        return table
+    with open(path) as f:
+        overrides = json.load(f)
+    for part, fields in overrides.pop("parts", {}).items():
+        table["parts"].setdefault(part, dict(table["parts"]["default"])).update(fields)
+    table.update(overrides)
+    return table
+
+
+def assessment_components(damage_data: Dict) -> List[Dict]:
+    """Component list from either request shape the render endpoints accept."""
+    if "components" in damage_data:
+        return damage_data.get("components", [])
+    if "car_side_damage_assessment" in damage_data:
+        return damage_data["car_side_damage_assessment"].get("sections_of_interest", [])
+    return []
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def validated_components(components: Any) -> List[Dict]:
+    """
+    components, if it is a list of component objects the renderers can draw:
+    percentage_damage a number (or absent) and bbox four numbers (or absent).
+    Raises ValueError otherwise.
+    """
+    if not isinstance(components, list):
+        raise ValueError("components must be a list")
+    for index, item in enumerate(components):
+        if not isinstance(item, dict):
+            raise ValueError(f"components[{index}] must be an object")
+        if item.get("percentage_damage") is not None and not _is_number(item["percentage_damage"]):
+            raise ValueError(f"components[{index}].percentage_damage must be a number")
+        bbox = item.get("bbox")
+        if bbox is not None and not (isinstance(bbox, list) and len(bbox) == 4
+                                     and all(_is_number(v) for v in bbox)):
+            raise ValueError(f"components[{index}].bbox must be four numbers [x, y, w, h]")
+    return components
+
+
+def part_type(component: str, parts: Dict[str, Any]) -> str:
+    """Price-table part for a component name, e.g. front_left_door -> door."""
+    name = component.lower().strip()
+    if name in parts:
+        return name
+    tokens = [token for token in name.replace("-", "_").split("_") if token]
+    stripped = "_".join(token for token in tokens if token not in POSITION_WORDS)
+    if stripped in parts:
+        return stripped
+    for token in reversed(tokens):  # front_bumper_cover -> bumper
+        if token in parts:
+            return token
+    return "default"
+
+
+class CostEstimator:
+    """Itemized repair estimates from one price table."""
+
+    def __init__(self, table: Optional[Dict[str, Any]] = None):
+        self.table = table or load_price_table()
+        parts = self.table["parts"]
+        self.part_names: List[str] = list(parts)
+        self._rows = {name: i for i, name in enumerate(self.part_names)}
+        # One row per part type, one column per PART_FIELDS entry
+        self._matrix = np.array([[float(parts[name].get(field, parts["default"][field]))
+                                  for field in PART_FIELDS] for name in self.part_names])
+        self._types: Dict[str, str] = {}
+        canonical = json.dumps(self.table, sort_keys=True, separators=(",", ":"))
+        self.version = hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:12]
+        self.estimates = 0
+
+    @classmethod
+    def from_env(cls) -> "CostEstimator":
+        """Build an estimator from COST_TABLE_PATH (defaults only when unset)."""
+        return cls(load_price_table(os.getenv("COST_TABLE_PATH") or None))
+
+    def _part_type(self, component: str) -> str:
+        cached = self._types.get(component)
+        if cached is None:
+            cached = part_type(component, self.table["parts"])
+            if len(self._types) < 4096:  # names come from requests; keep the memo bounded
+                self._types[component] = cached
+        return cached
+
+    def estimate(self, components: List[Dict]) -> Dict[str, Any]:
+        """
+        Itemized estimate for the damaged components (percentage_damage > 0 and
+        not is_damaged: false). Money is rounded to cents, hours to 0.01.
+        """
+        self.estimates += 1
+        damaged = [item for item in components
+                   if item.get("is_damaged", True) and float(item.get("percentage_damage") or 0) > 0]
+        names = [str(item.get("component", "unknown")) for item in damaged]
+        types = [self._part_type(name) for name in names]
+
+        rows = self._matrix[[self._rows[t] for t in types]] if types else self._matrix[:0]
+        price, replace_hours, repair_hours, per_pct, paint_hours, replace_at = rows.T
+        pct = np.clip(np.array([float(item["percentage_damage"]) for item in damaged]), 0, 100)
+        labour_rate, paint_rate = float(self.table["labour_rate"]), float(self.table["paint_rate"])
+
+        repair_labour = repair_hours + per_pct * pct
+        repair_paint = paint_hours * np.minimum(1.0, pct / np.maximum(replace_at, 1e-9))
+        repair_cost = repair_labour * labour_rate + repair_paint * paint_rate
+        replace_cost = price + replace_hours * labour_rate + paint_hours * paint_rate
+        replace = (pct >= replace_at) | (repair_cost >= replace_cost)
+
+        labour_hours = np.where(replace, replace_hours, repair_labour)
+        refinish_hours = np.where(replace, paint_hours, repair_paint)
+        parts_cost = np.where(replace, price, 0.0)
+        labour_cost = np.round(labour_hours * labour_rate, 2)
+        paint_cost = np.round(refinish_hours * paint_rate, 2)
+        totals = parts_cost + labour_cost + paint_cost
+
+        items = [{
+            "component": names[i],
+            "part_type": types[i],
+            "percentage_damage": float(pct[i]),
+            "action": "replace" if replace[i] else "repair",
+            "labour_hours": round(float(labour_hours[i]), 2),
+            "paint_hours": round(float(refinish_hours[i]), 2),
+            "parts": round(float(parts_cost[i]), 2),
+            "labour": float(labour_cost[i]),
+            "paint": float(paint_cost[i]),
+            "total": round(float(totals[i]), 2),
+        } for i in range(len(names))]
+        return {
+            "currency": self.table["currency"],
+            "items": items,
+            "totals": {
+                "parts": round(float(parts_cost.sum()), 2),
+                "labour": round(float(labour_cost.sum()), 2),
+                "paint": round(float(paint_cost.sum()), 2),
+                "total": round(float(totals.sum()), 2),
+                "labour_hours": round(float(labour_hours.sum()), 2),
+                "replaced": int(replace.sum()),
+                "repaired": int(len(items) - replace.sum()),
+            },
+            "rates": {"labour": labour_rate, "paint": paint_rate},
+            "price_table": self.version,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {"price_table": self.version, "part_types": len(self.part_names),
+                "estimates": self.estimates}
+
+
+def format_estimate(estimate: Dict[str, Any]) -> str:
+    """Plain-text summary of an estimate, one line per component."""
+    currency = estimate["currency"]
+    totals = estimate["totals"]
+    if not estimate["items"]:
+        return f"No damaged components: estimated repair cost {currency} 0.00"
+    lines = [f"Estimated repair cost: {currency} {totals['total']:,.2f}"]
+    for item in estimate["items"]:
+        lines.append(f"- {item['component']} ({item['percentage_damage']:g}% damage): "
+                     f"{item['action']} {currency} {item['total']:,.2f}")
+    lines.append(f"Parts {currency} {totals['parts']:,.2f}, labour {currency} {totals['labour']:,.2f} "
+                 f"({totals['labour_hours']:g} h), paint {currency} {totals['paint']:,.2f}")
+    return "\n".join(lines)
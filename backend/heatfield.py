@@ -0,0 +1,290 @@
+"""
+Damage heat fields over the base car views (front, rear, side, top).
+
+Each damaged component adds a kernel to a float32 field the size of the
+view: an anisotropic Gaussian centred on its bbox, with sigmas from the
+bbox size and a peak of percentage_damage / 100. The field is coloured
+with an OpenCV colormap and blended over the filled base image, more
+opaque where the heat is higher, so undamaged areas show the car.
+
+Kernels are separable (the outer product of two 1-D profiles) and cut off
+at KERNEL_EXTENT sigmas, so each one covers a small ROI of the view.
+HeatField.update() changes one or more components without a full redraw:
+the union of each edited kernel's old and new ROI is zeroed, every kernel
+that overlaps it is added back (in the same order as a full build, so the
+pixels are identical), and only that rectangle is recoloured and blended.
+The colour scale is fixed (full_scale), not normalised to the hottest
+pixel, so an edit never changes pixels outside its ROI.
+
+HeatFieldStore keeps recent fields in memory (per process) for assessor
+edits: create one, then update it and fetch the image after each change.
+
+    python heatfield.py side.json   # regenerate heatmap/<view>_heatmap.png
+"""
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# Bump when kernel shape, colouring or blending changes so cached images are invalidated
+HEATFIELD_VERSION = "1"
+
+KERNEL_EXTENT = 3.0  # kernels are cut off this many sigmas from their centre
+SIGMA_SCALE = 0.5  # sigma = this * bbox side, so the bbox edge is one sigma out
+MIN_SIGMA = 4.0
+DEFAULT_ALPHA = 0.8  # overlay opacity at full heat, as the marker renderer uses
+# Field value drawn at the top of the colormap (a component at 25% damage saturates)
+FULL_SCALE = float(os.getenv("HEATMAP_FULL_SCALE", "0.25"))
+COLORMAP = os.getenv("HEATMAP_COLORMAP", "jet")
+
+Rect = Tuple[int, int, int, int]  # x0, y0, x1, y1 (exclusive)
+
+
+def colormap_id(name: str) -> int:
+    """cv2.COLORMAP_* constant for a name such as "jet", "turbo" or "inferno"."""
+    value = getattr(cv2, f"COLORMAP_{name.upper()}", None)
+    if not isinstance(value, int):
+        raise ValueError(f"Unknown colormap '{name}'")
+    return value
+
+
+def _union(a: Optional[Rect], b: Optional[Rect]) -> Optional[Rect]:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+
+def _intersect(a: Rect, b: Rect) -> Optional[Rect]:
+    x0, y0, x1, y1 = max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3])
+    return (x0, y0, x1, y1) if x0 < x1 and y0 < y1 else None
+
+
+class Kernel:
+    """One component's Gaussian, stored as its two 1-D profiles over its ROI."""
+
+    __slots__ = ("rect", "column", "row")
+
+    def __init__(self, center_x: float, center_y: float, sigma_x: float, sigma_y: float,
+                 peak: float, width: int, height: int):
+        x0 = max(int(np.floor(center_x - KERNEL_EXTENT * sigma_x)), 0)
+        x1 = min(int(np.ceil(center_x + KERNEL_EXTENT * sigma_x)) + 1, width)
+        y0 = max(int(np.floor(center_y - KERNEL_EXTENT * sigma_y)), 0)
+        y1 = min(int(np.ceil(center_y + KERNEL_EXTENT * sigma_y)) + 1, height)
+        self.rect: Optional[Rect] = (x0, y0, x1, y1) if x0 < x1 and y0 < y1 else None
+        dx = (np.arange(x0, x1, dtype=np.float32) - np.float32(center_x)) / np.float32(sigma_x)
+        dy = (np.arange(y0, y1, dtype=np.float32) - np.float32(center_y)) / np.float32(sigma_y)
+        self.row = np.exp(np.float32(-0.5) * dx * dx)
+        # The peak rides on the vertical profile, so a slice is one outer product
+        self.column = np.float32(peak) * np.exp(np.float32(-0.5) * dy * dy)
+
+    def add_to(self, field: np.ndarray, rect: Rect) -> None:
+        """Add the part of this kernel inside rect to field."""
+        part = _intersect(self.rect, rect) if self.rect is not None else None
+        if part is None:
+            return
+        x0, y0, x1, y1 = part
+        kx, ky = self.rect[0], self.rect[1]
+        field[y0:y1, x0:x1] += np.multiply.outer(self.column[y0 - ky:y1 - ky], self.row[x0 - kx:x1 - kx])
+
+
+def component_kernel(component: Dict, side: str, width: int, height: int) -> Optional[Kernel]:
+    """
+    The kernel of one assessment component on a view, or None when it draws
+    nothing there: no valid bbox, no damage, or (on a side view) a component
+    of the other side. bboxes are mirrored for the right side, as the marker
+    renderer does.
+    """
+    name = component.get("component", "")
+    if (side == "right" and "_left_" in name) or (side == "left" and "_right_" in name):
+        return None
+    bbox = component.get("bbox")
+    if not isinstance(bbox, list) or len(bbox) != 4:
+        return None
+    percentage_damage = float(component.get("percentage_damage", 0.0) or 0.0)
+    if percentage_damage <= 0:
+        return None
+    comp_x, comp_y, comp_w, comp_h = bbox
+    if side == "right":
+        comp_x = width - comp_x - comp_w
+    return Kernel(comp_x + comp_w / 2, comp_y + comp_h / 2, max(MIN_SIGMA, SIGMA_SCALE * comp_w),
+                  max(MIN_SIGMA, SIGMA_SCALE * comp_h), min(percentage_damage, 100.0) / 100, width, height)
+
+
+class HeatField:
+    """The heat field of one assessment on one view, and its blended image."""
+
+    def __init__(self, base: np.ndarray, components: Sequence[Dict], side: str = "both",
+                 colormap: str = COLORMAP, full_scale: float = FULL_SCALE, alpha: float = DEFAULT_ALPHA):
+        """base is the (already mirrored, for the right side) filled view, BGR uint8."""
+        self.base = base
+        self.side = side
+        self.colormap = colormap_id(colormap)
+        self.height, self.width = base.shape[:2]
+        self.full_scale = full_scale
+        self.alpha = alpha
+        # component name -> component dict and its kernel (a repeated name replaces the
+        # earlier entry); insertion order is the summation order
+        self.components: Dict[str, Dict] = {}
+        self.kernels: Dict[str, Optional[Kernel]] = {}
+        for component in components:
+            self._set(component)
+        self.field = np.zeros((self.height, self.width), dtype=np.float32)
+        self.image = base.copy()
+        self.lock = threading.Lock()  # held while updating or reading image
+        self.revision = 0
+        self.updates = 0
+        self.pixels_updated = 0
+        self.update_ms = 0.0
+        self._redraw((0, 0, self.width, self.height))
+
+    def _set(self, component: Dict) -> Optional[Rect]:
+        """Store a component and its kernel; returns the ROI its old kernel covered."""
+        key = component.get("component", "")
+        old = self.kernels.get(key)
+        self.components[key] = component
+        self.kernels[key] = component_kernel(component, self.side, self.width, self.height)
+        return old.rect if old is not None else None
+
+    def _redraw(self, rect: Rect) -> None:
+        """Recompute the field and the blended image inside rect."""
+        x0, y0, x1, y1 = rect
+        self.field[y0:y1, x0:x1] = 0
+        for kernel in self.kernels.values():
+            if kernel is not None:
+                kernel.add_to(self.field, rect)
+
+        # Colour index 0..255 of the field; opacity follows the same index
+        index = cv2.convertScaleAbs(self.field[y0:y1, x0:x1], alpha=255.0 / self.full_scale)
+        colors = cv2.applyColorMap(index, self.colormap).astype(np.float32)
+        opacity = index.astype(np.float32) * np.float32(self.alpha / 255.0)
+        base = self.base[y0:y1, x0:x1].astype(np.float32)
+        blended = base + (colors - base) * opacity[:, :, None]
+        self.image[y0:y1, x0:x1] = np.rint(blended).astype(np.uint8)
+
+    def update(self, changes: Sequence[Dict]) -> List[Rect]:
+        """
+        Apply component edits ({"component": name, plus any of
+        "percentage_damage", "bbox"}; an unknown name adds a component) and
+        redraw only what they touched. Returns the redrawn rectangles.
+        """
+        start = time.perf_counter()
+        with self.lock:
+            dirty: Optional[Rect] = None
+            for change in changes:
+                key = change.get("component", "")
+                old_rect = self._set({**self.components.get(key, {}), **change})
+                new = self.kernels[key]
+                dirty = _union(dirty, _union(old_rect, new.rect if new is not None else None))
+            rects = [dirty] if dirty is not None else []
+            for rect in rects:
+                self._redraw(rect)
+                self.pixels_updated += (rect[2] - rect[0]) * (rect[3] - rect[1])
+            self.revision += 1
+            self.updates += 1
+            self.update_ms += (time.perf_counter() - start) * 1000
+        return rects
+
+    def assessment(self) -> List[Dict]:
+        """The current components, in order (e.g. to store the edited assessment)."""
+        return list(self.components.values())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "revision": self.revision,
+            "components": len(self.components),
+            "kernels": sum(1 for kernel in self.kernels.values() if kernel is not None),
+            "updates": self.updates,
+            "pixels_updated": self.pixels_updated,
+            "avg_update_ms": round(self.update_ms / self.updates, 3) if self.updates else 0.0,
+        }
+
+
+class HeatFieldStore:
+    """Recently used heat fields by id, least recently used evicted first."""
+
+    def __init__(self, max_fields: int = 32):
+        self.max_fields = max_fields
+        self._fields: "OrderedDict[str, HeatField]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.evicted = 0
+
+    @classmethod
+    def from_env(cls) -> "HeatFieldStore":
+        return cls(int(os.getenv("HEATMAP_MAX_FIELDS", "32")))
+
+    def add(self, field: HeatField) -> str:
+        field_id = uuid.uuid4().hex
+        with self._lock:
+            self._fields[field_id] = field
+            self.created += 1
+            while len(self._fields) > self.max_fields:
+                self._fields.popitem(last=False)
+                self.evicted += 1
+        return field_id
+
+    def get(self, field_id: str) -> Optional[HeatField]:
+        with self._lock:
+            field = self._fields.get(field_id)
+            if field is not None:
+                self._fields.move_to_end(field_id)
+            return field
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            fields = list(self._fields.values())
+        return {
+            "fields": len(fields),
+            "max_fields": self.max_fields,
+            "created": self.created,
+            "evicted": self.evicted,
+            "updates": sum(field.updates for field in fields),
+        }
+
+
+def main(argv: List[str]) -> None:
+    import argparse
+
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Render the heat map of an assessment on every view")
+    parser.add_argument("assessment", help="assessment JSON (the render endpoints' body)")
+    parser.add_argument("--images", default=os.path.join(project_root, "imgsss"))
+    parser.add_argument("--out", default=os.path.join(project_root, "heatmap"))
+    parser.add_argument("--side", choices=("left", "right"), default="left")
+    args = parser.parse_args(argv)
+
+    # Imported here so the module itself does not depend on the base view and assessment helpers
+    from base_views import VIEWS, BaseViewCache
+    from cost_estimator import assessment_components
+
+    with open(args.assessment) as f:
+        components = assessment_components(json.load(f))
+    views = BaseViewCache(args.images)
+    views.reload()
+    for view in VIEWS:
+        try:
+            base_view = views.get(view, "filled")
+        except KeyError:
+            print(f"{view}: no filled base image in {args.images}", file=sys.stderr)
+            continue
+        side = args.side if view == "side" else "both"
+        started = time.perf_counter()
+        field = HeatField(base_view.pixels(mirrored=(side == "right")), components, side)
+        elapsed = (time.perf_counter() - started) * 1000
+        path = os.path.join(args.out, f"{view}_heatmap.png")
+        if not cv2.imwrite(path, field.image):
+            raise SystemExit(f"could not write {path}")
+        print(f"{path}: {field.stats()['kernels']} kernels, {elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,197 @@
+"""
+Hedged requests over a model fallback chain.
+
+Latency from free models is heavy-tailed, so a task does not wait on one
+model indefinitely. The primary model in the chain is called first. If it
+has not answered within its hedge delay, the next model is called as well,
+and the first valid answer wins; the other calls are cancelled. An error or
+an answer that fails validation moves on to the next model at once.
+
+The hedge delay of each model is a percentile (p90 by default) of its own
+recent latencies. These are kept as a sliding-window histogram with log-
+spaced buckets, so the threshold follows each model's actual behaviour.
+Only completed calls are sampled: a cancelled loser's elapsed time is just
+a lower bound on its latency, so those are counted apart (as censored).
+"""
+import asyncio
+import bisect
+import json
+import re
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Bucket upper bounds in seconds, log-spaced from 50 ms to ~10 minutes
+BUCKET_BOUNDS = [0.05 * 1.25 ** i for i in range(43)]
+
+
+class LatencyHistogram:
+    """Bucketed latencies of the last `window` completed calls to one model."""
+
+    def __init__(self, window: int = 500):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self._samples: deque = deque(maxlen=window)
+        self.censored = 0  # calls cancelled before they finished; not in the quantiles
+
+    def record(self, seconds: float) -> None:
+        if len(self._samples) == self._samples.maxlen:
+            self.counts[self._samples[0]] -= 1
+        bucket = bisect.bisect_left(BUCKET_BOUNDS, seconds)
+        self._samples.append(bucket)
+        self.counts[bucket] += 1
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (None with no samples)."""
+        total = len(self._samples)
+        if not total:
+            return None
+        rank, seen = q * total, 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return BUCKET_BOUNDS[min(bucket, len(BUCKET_BOUNDS) - 1)]
+        return BUCKET_BOUNDS[-1]
+
+
+class Hedger:
+    """Runs a task over a model chain with percentile-driven hedging."""
+
+    def __init__(self, percentile: float = 0.9, min_samples: int = 20,
+                 default_delay: float = 20.0, min_delay: float = 2.0, max_delay: float = 60.0):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.latency: Dict[str, LatencyHistogram] = {}
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.fallbacks = 0
+
+    def _histogram(self, model: str) -> LatencyHistogram:
+        if model not in self.latency:
+            self.latency[model] = LatencyHistogram()
+        return self.latency[model]
+
+    def hedge_delay(self, model: str) -> float:
+        """How long to wait on model before hedging to the next one."""
+        histogram = self._histogram(model)
+        if len(histogram) < self.min_samples:
+            return self.default_delay
+        return min(self.max_delay, max(self.min_delay, histogram.percentile(self.percentile)))
+
+    async def run(self, chain: List[str], call: Callable[[str], Awaitable[Any]],
+                  validate: Callable[[Any], bool]) -> Dict[str, Any]:
+        """
+        Await call(model) along the chain until one answer passes validate().
+        Returns {"value", "model", "hedged", "valid"}. If no answer validates,
+        the first answer received is returned with valid=False. If every
+        model fails, the last error is raised.
+        """
+        self.calls += 1
+        loop = asyncio.get_running_loop()
+        tasks: Dict[asyncio.Task, tuple] = {}
+        next_index, hedged, fallback_answer, last_error = 0, False, None, None
+
+        def launch():
+            nonlocal next_index
+            model = chain[next_index]
+            next_index += 1
+            tasks[asyncio.ensure_future(call(model))] = (model, loop.time())
+            return model
+
+        launch_deadline = loop.time() + self.hedge_delay(launch())
+        try:
+            while tasks:
+                timeout = None
+                if next_index < len(chain):
+                    timeout = max(0.0, launch_deadline - loop.time())
+                done, _ = await asyncio.wait(tasks, timeout=timeout,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Nothing back within the hedge delay: race the next model too
+                    self.hedges += 1
+                    hedged = True
+                    launch_deadline = loop.time() + self.hedge_delay(launch())
+                    continue
+
+                for task in done:
+                    model, started = tasks.pop(task)
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                        continue
+                    self._histogram(model).record(loop.time() - started)
+                    value = task.result()
+                    if validate(value):
+                        if hedged and model != chain[0]:
+                            self.hedge_wins += 1
+                        return {"value": value, "model": model, "hedged": hedged, "valid": True}
+                    if fallback_answer is None:
+                        fallback_answer = {"value": value, "model": model, "hedged": hedged,
+                                           "valid": False}
+
+                if not tasks and next_index < len(chain):
+                    # Failed or invalid with nothing else in flight: fall back right away
+                    self.fallbacks += 1
+                    launch_deadline = loop.time() + self.hedge_delay(launch())
+        finally:
+            for task, (model, _) in tasks.items():
+                task.cancel()
+                task.add_done_callback(_retrieve_exception)
+                self._histogram(model).censored += 1
+
+        if fallback_answer is not None:
+            return fallback_answer
+        raise last_error or RuntimeError("Empty model chain")
+
+    def stats(self) -> Dict[str, Any]:
+        models = {}
+        for model, histogram in self.latency.items():
+            models[model] = {
+                "samples": len(histogram),
+                "censored": histogram.censored,
+                "p50_seconds": histogram.percentile(0.5),
+                "p90_seconds": histogram.percentile(0.9),
+                "p99_seconds": histogram.percentile(0.99),
+                "hedge_delay_seconds": round(self.hedge_delay(model), 3),
+            }
+        return {"calls": self.calls, "hedges_fired": self.hedges, "hedge_wins": self.hedge_wins,
+                "fallbacks": self.fallbacks, "models": models}
+
+
+def _retrieve_exception(task: asyncio.Task) -> None:
+    if not task.cancelled():
+        task.exception()
+
+
+def parse_json_object(text: str) -> Optional[Dict]:
+    """The JSON object in a model reply (code fences and surrounding prose allowed)."""
+    try:
+        value = json.loads(text)
+        return value if isinstance(value, dict) else None
+    except ValueError:
+        pass
+    match = re.search(r"\{.*\}", text, flags=re.DOTALL)
+    if match is None:
+        return None
+    try:
+        value = json.loads(match.group(0))
+    except ValueError:
+        return None
+    return value if isinstance(value, dict) else None
+
+
+def _matches(value: Any, types: tuple) -> bool:
+    # bool is an int subclass; only accept it where the schema asks for bool
+    if isinstance(value, bool):
+        return bool in types
+    return isinstance(value, types)
+
+
+def conforms(text: str, schema: Dict[str, tuple]) -> bool:
+    """True if text holds a JSON object with every schema key of the expected type(s)."""
+    value = parse_json_object(text)
+    return value is not None and all(_matches(value.get(key), types) for key, types in schema.items())
@@ -0,0 +1,143 @@
+"""
+Memory-bounded upload ingest.
+
+The upload is read in chunks and each chunk is hashed and base64-encoded
+straight into a buffer preallocated for the final data URL. There is no disk
+write and read-back, and the raw bytes are not kept unless a caller asks for
+them; then they are copied into one more buffer preallocated for the upload
+size, so no chunk list or joined copy is held alongside it. The size limit is
+checked before reading and again while streaming, so an oversized upload is
+rejected without buffering it. Uploads are only written to UPLOAD_DIR when
+PERSIST_UPLOADS is enabled.
+"""
+import binascii
+import hashlib
+import os
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile
+
+# Multiple of 3 so every full chunk base64-encodes without padding
+CHUNK_SIZE = 3 * 64 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+PERSIST_UPLOADS = os.getenv("PERSIST_UPLOADS", "0").lower() in ("1", "true", "yes")
+
+
+def base64_length(size: int) -> int:
+    return 4 * ((size + 2) // 3)
+
+
+class IngestedUpload:
+    """Result of ingesting one UploadFile."""
+
+    __slots__ = ("filename", "content_type", "size", "sha256", "saved_path",
+                 "raw", "_data_url", "_prefix_len")
+
+    def __init__(self, filename: str, content_type: Optional[str], size: int, sha256: str,
+                 saved_path: Optional[str], raw: Optional[bytearray], data_url: Optional[bytearray],
+                 prefix_len: int):
+        self.filename = filename
+        self.content_type = content_type
+        self.size = size
+        self.sha256 = sha256
+        self.saved_path = saved_path
+        self.raw = raw
+        self._data_url = data_url
+        self._prefix_len = prefix_len
+
+    def data_url(self) -> str:
+        """The image as a data: URL, ready to embed in a model request."""
+        if self._data_url is None:
+            raise ValueError("upload was ingested without base64 encoding")
+        return self._data_url.decode("ascii")
+
+    def base64(self) -> str:
+        if self._data_url is None:
+            raise ValueError("upload was ingested without base64 encoding")
+        return self._data_url[self._prefix_len:].decode("ascii")
+
+
+def _reject_too_large(max_bytes: int):
+    raise HTTPException(status_code=413,
+                        detail=f"Upload exceeds the {max_bytes // (1024 * 1024)} MB limit")
+
+
+async def ingest_upload(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES,
+                        persist: Optional[bool] = None, upload_dir: Optional[str] = None,
+                        encode_base64: bool = True, keep_raw: bool = False,
+                        mime_type: str = "image/jpeg") -> IngestedUpload:
+    """
+    Stream an UploadFile through SHA-256 and base64 in fixed-size chunks.
+
+    persist defaults to PERSIST_UPLOADS; when set, the bytes are also written to
+    upload_dir under the client's (basename-only) filename. keep_raw also keeps
+    the bytes (as .raw); only ask for them on paths that decode the image.
+    """
+    if persist is None:
+        persist = PERSIST_UPLOADS
+    expected = getattr(file, "size", None)
+    if expected is not None and expected > max_bytes:
+        _reject_too_large(max_bytes)
+
+    prefix = f"data:{mime_type};base64,".encode("ascii")
+    buffer = None
+    if encode_base64:
+        buffer = bytearray(len(prefix) + base64_length(expected or 0))
+        buffer[:len(prefix)] = prefix
+    pos = len(prefix)
+
+    hasher = hashlib.sha256()
+    raw = bytearray(expected or 0) if keep_raw else None
+    filename = os.path.basename(file.filename or "upload")
+    saved_path = os.path.join(upload_dir, filename) if persist and upload_dir else None
+    sink = open(saved_path, "wb") if saved_path else None
+
+    total = 0
+    carry = b""
+    try:
+        while True:
+            chunk = await file.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            total += len(chunk)
+            if total > max_bytes:
+                _reject_too_large(max_bytes)
+            hasher.update(chunk)
+            if sink:
+                sink.write(chunk)
+            if raw is not None:
+                raw[total - len(chunk):total] = chunk
+            if buffer is not None:
+                data = carry + chunk if carry else chunk
+                usable = len(data) - len(data) % 3
+                encoded = binascii.b2a_base64(data[:usable], newline=False)
+                # Slice assignment grows the buffer if the size was unknown up front
+                buffer[pos:pos + len(encoded)] = encoded
+                pos += len(encoded)
+                carry = data[usable:]
+        if buffer is not None:
+            if carry:
+                encoded = binascii.b2a_base64(carry, newline=False)
+                buffer[pos:pos + len(encoded)] = encoded
+                pos += len(encoded)
+            del buffer[pos:]
+        if raw is not None:
+            del raw[total:]
+    except BaseException:
+        if sink:
+            sink.close()
+            os.remove(saved_path)
+        raise
+    if sink:
+        sink.close()
+
+    return IngestedUpload(
+        filename=file.filename,
+        content_type=file.content_type,
+        size=total,
+        sha256=hasher.hexdigest(),
+        saved_path=saved_path,
+        raw=raw,
+        data_url=buffer,
+        prefix_len=len(prefix),
+    )
@@ -0,0 +1,415 @@
+"""
+Durable local job queue for long-running model analyses and renders.
+
+Jobs live in a SQLite database, so a dropped client connection or a worker
+restart does not lose work. A pool of asyncio workers claims ready jobs by
+taking a lease. A job whose worker died is picked up again once its lease
+expires. Failures worth retrying (429/5xx from OpenRouter, timeouts,
+connection errors) are rescheduled with exponential backoff and jitter, and
+Retry-After is honoured. Results are stored by input hash, so submitting the
+same work again completes at once. Inputs too large for a row (uploaded
+images, render archives) go into a content-addressed BlobStore.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+from openrouter_client import UpstreamError
+
+TERMINAL_STATES = ("succeeded", "failed")
+
+Handler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    input_hash TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    error TEXT,
+    run_after REAL NOT NULL,
+    lease_until REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, run_after);
+CREATE INDEX IF NOT EXISTS jobs_input ON jobs (input_hash, status);
+CREATE TABLE IF NOT EXISTS results (
+    input_hash TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    result TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+class RetryableError(Exception):
+    """Raised by a handler for a failure that may go away if the job runs again later."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def retry_hint(exc: BaseException) -> Tuple[bool, Optional[float]]:
+    """(worth retrying, server-requested delay in seconds) for a handler exception."""
+    if isinstance(exc, (UpstreamError, RetryableError)):
+        return True, exc.retry_after
+    if isinstance(exc, httpx.TransportError):  # includes connect/read timeouts
+        return True, None
+    return False, None
+
+
+def backoff_delay(attempt: int, base: float, cap: float,
+                  retry_after: Optional[float] = None) -> float:
+    """Exponential backoff with equal jitter; never sooner than Retry-After asks."""
+    delay = min(cap, base * 2 ** max(attempt - 1, 0))
+    delay = delay / 2 + random.uniform(0, delay / 2)
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+class BlobStore:
+    """Content-addressed files (sha256 name, sharded by prefix) for job inputs and outputs."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def put(self, data: bytes, digest: Optional[str] = None) -> str:
+        digest = digest or hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if os.path.exists(path):
+            return digest
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        with open(self._path(digest), "rb") as f:
+            return f.read()
+
+
+class JobStore:
+    """SQLite persistence for jobs and their results (safe to share between processes)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False,
+                                     timeout=10.0)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+
+    def _job(self, row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        return job
+
+    def submit(self, kind: str, payload: Dict, input_hash: str,
+               max_attempts: int) -> Tuple[Dict[str, Any], bool]:
+        """
+        Create a job, unless the same input is already done or in progress.
+        Returns (job, created). A job whose result is already stored is
+        created as succeeded, so it still gets its own id.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                done = self._conn.execute("SELECT 1 FROM results WHERE input_hash = ?",
+                                          (input_hash,)).fetchone()
+                if done is None:
+                    active = self._conn.execute(
+                        "SELECT * FROM jobs WHERE input_hash = ? AND status IN ('queued', 'running') "
+                        "ORDER BY created_at LIMIT 1", (input_hash,)).fetchone()
+                    if active is not None:
+                        self._conn.execute("COMMIT")
+                        return self._job(active), False
+                job_id = uuid.uuid4().hex
+                self._conn.execute(
+                    "INSERT INTO jobs (id, kind, input_hash, payload, status, max_attempts, "
+                    "run_after, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, kind, input_hash, json.dumps(payload),
+                     "succeeded" if done else "queued", max_attempts, now, now, now))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row), True
+
+    def claim(self, lease_seconds: float, kinds: Optional[Sequence[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Lease the next ready job (queued and due, or running with an expired
+        lease), only of the given kinds if set: processes that share the
+        database each take the jobs they have handlers for.
+        """
+        now = time.time()
+        kind_filter, params = "", [now + lease_seconds, now, now, now]
+        if kinds is not None:
+            kind_filter = f" AND kind IN ({', '.join('?' * len(kinds))})"
+            params.extend(kinds)
+        with self._lock:
+            row = self._conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ?, "
+                "updated_at = ? WHERE id = (SELECT id FROM jobs WHERE "
+                "((status = 'queued' AND run_after <= ?) OR (status = 'running' AND lease_until < ?))"
+                f"{kind_filter} ORDER BY run_after LIMIT 1) RETURNING *",
+                params).fetchone()
+        return self._job(row)
+
+    def complete(self, job: Dict[str, Any], result: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (input_hash, kind, result, created_at) "
+                "VALUES (?, ?, ?, ?)", (job["input_hash"], job["kind"], json.dumps(result), now))
+            self._conn.execute(
+                "UPDATE jobs SET status = 'succeeded', error = NULL, lease_until = NULL, "
+                "updated_at = ? WHERE id = ?", (now, job["id"]))
+            self._conn.execute("COMMIT")
+
+    def reschedule(self, job_id: str, error: Optional[str], run_after: float,
+                   refund_attempt: bool = False) -> None:
+        """Put a job back in the queue, due at run_after."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'queued', error = ?, run_after = ?, lease_until = NULL, "
+                "attempts = attempts - ?, updated_at = ? WHERE id = ?",
+                (error, run_after, 1 if refund_attempt else 0, time.time(), job_id))
+
+    def fail(self, job_id: str, error: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, lease_until = NULL, updated_at = ? "
+                "WHERE id = ?", (error, time.time(), job_id))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """The job with its result (None until it succeeds), or None if unknown."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT jobs.*, results.result FROM jobs LEFT JOIN results "
+                "ON results.input_hash = jobs.input_hash WHERE jobs.id = ?", (job_id,)).fetchone()
+        job = self._job(row)
+        if job is not None:
+            job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def public_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """The fields of a job that clients see."""
+    return {
+        "id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "max_attempts": job["max_attempts"],
+        "error": job.get("error"),
+        "result": job.get("result"),
+        "next_attempt_at": job["run_after"] if job["status"] == "queued" else None,
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+
+
+class JobQueue:
+    """Async worker pool over a JobStore. Handlers are registered per job kind."""
+
+    def __init__(self, store: JobStore, workers: int = 4, max_attempts: int = 5,
+                 lease_seconds: float = 900.0, backoff_base: float = 2.0,
+                 backoff_cap: float = 120.0, poll_interval: float = 1.0):
+        self.store = store
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.poll_interval = poll_interval
+        self.handlers: Dict[str, Handler] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._running: Dict[str, Dict[str, Any]] = {}
+        # Created lazily so they bind to the running event loop
+        self._wake: Optional[asyncio.Event] = None
+        self._changed: Optional[asyncio.Event] = None
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+
+    @classmethod
+    def from_env(cls, data_dir: str) -> "JobQueue":
+        """Build a queue from JOB_* environment variables."""
+        return cls(
+            JobStore(os.path.join(data_dir, "jobs.sqlite3")),
+            workers=int(os.getenv("JOB_WORKERS", "4")),
+            max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "5")),
+            lease_seconds=float(os.getenv("JOB_LEASE_SECONDS", "900")),
+            backoff_base=float(os.getenv("JOB_BACKOFF_BASE", "2")),
+            backoff_cap=float(os.getenv("JOB_BACKOFF_CAP", "120")),
+        )
+
+    def handler(self, kind: str) -> Callable[[Handler], Handler]:
+        """Decorator registering the coroutine that runs jobs of this kind."""
+        def register(fn: Handler) -> Handler:
+            self.handlers[kind] = fn
+            return fn
+        return register
+
+    def _events(self) -> Tuple[asyncio.Event, asyncio.Event]:
+        if self._wake is None:
+            self._wake = asyncio.Event()
+            self._changed = asyncio.Event()
+        return self._wake, self._changed
+
+    def _notify(self) -> None:
+        _, changed = self._events()
+        changed.set()
+        self._changed = asyncio.Event()
+
+    async def submit(self, kind: str, payload: Dict, input_hash: str) -> Tuple[Dict[str, Any], bool]:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind '{kind}'")
+        job, created = await asyncio.to_thread(self.store.submit, kind, payload, input_hash,
+                                               self.max_attempts)
+        if created:
+            self._events()[0].set()
+            self._notify()
+        return job, created
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def watch(self, job_id: str, timeout: float = 1.0):
+        """Yield the job each time its status or attempt count changes, until it finishes."""
+        last = None
+        while True:
+            changed = self._events()[1]
+            job = await self.get(job_id)
+            if job is None:
+                return
+            state = (job["status"], job["attempts"])
+            if state != last:
+                last = state
+                yield job
+            if job["status"] in TERMINAL_STATES:
+                return
+            # Woken by this process's workers; the timeout covers jobs run by other processes
+            try:
+                await asyncio.wait_for(changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        self._events()
+        for _ in range(self.workers - len(self._tasks)):
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    async def stop(self) -> None:
+        """Stop the workers and hand their in-progress jobs straight back to the queue."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self) -> None:
+        wake, _ = self._events()
+        while True:
+            wake.clear()
+            job = await asyncio.to_thread(self.store.claim, self.lease_seconds, list(self.handlers))
+            if job is None:
+                try:
+                    await asyncio.wait_for(wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self._running[job["id"]] = job
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                # Shutting down mid-job: make it claimable again right away
+                self.store.reschedule(job["id"], job.get("error"), time.time(), refund_attempt=True)
+                raise
+            finally:
+                self._running.pop(job["id"], None)
+                self._notify()
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        handler = self.handlers.get(job["kind"])
+        if handler is None:
+            await asyncio.to_thread(self.store.fail, job["id"], f"No handler for '{job['kind']}'")
+            self.failed += 1
+            return
+        if job["attempts"] > job["max_attempts"]:
+            # Its lease ran out on every attempt (e.g. the process kept dying mid-job)
+            await asyncio.to_thread(self.store.fail, job["id"], job["error"] or "Attempts exhausted")
+            self.failed += 1
+            return
+        self._notify()
+        try:
+            result = await handler(job["payload"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            error = str(exc) or type(exc).__name__
+            retryable, retry_after = retry_hint(exc)
+            if retryable and job["attempts"] < job["max_attempts"]:
+                delay = backoff_delay(job["attempts"], self.backoff_base, self.backoff_cap, retry_after)
+                await asyncio.to_thread(self.store.reschedule, job["id"], error, time.time() + delay)
+                self.retried += 1
+            else:
+                await asyncio.to_thread(self.store.fail, job["id"], error)
+                self.failed += 1
+            return
+        await asyncio.to_thread(self.store.complete, job, result)
+        self.completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._tasks),
+            "running": len(self._running),
+            "completed": self.completed,
+            "retried": self.retried,
+            "failed": self.failed,
+            "jobs": self.store.counts(),
+        }
@@ -0,0 +1,245 @@
+"""
+Keyframe selection for walk-around videos and photo bursts.
+
+A claimant's video or burst holds dozens of near-identical frames, and
+sending each to the vision models costs a model call per frame. This module
+looks at the frames one at a time and keeps only a few good, distinct ones
+per view of the vehicle:
+
+* video is decoded in a stream with cv2.VideoCapture at sample_fps (frames
+  in between are grabbed, not converted), so memory does not grow with
+  the length of the video
+* every sampled frame is scored on a small grayscale copy: sharpness
+  (variance of the Laplacian), exposure (mean brightness and clipped
+  pixels) and a colour histogram for scene change
+* a new view starts when the histogram has drifted far enough from the
+  first frame of the current view (a walk-around changes gradually)
+* frames within dedupe_distance (dHash Hamming distance) of a kept frame
+  are near-duplicates: only the better one is kept
+* each view keeps a few candidates (JPEG-encoded), and when there are
+  more than max_views views the smallest is merged into its neighbour,
+  so memory stays bounded
+
+select() then picks up to per_view frames per view, best first, skipping
+near-duplicates of frames already picked.
+"""
+import math
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from phash_index import dhash, hamming
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".m4v", ".avi", ".webm", ".mkv", ".3gp")
+ANALYSIS_WIDTH = 320  # frames are scored on a copy this wide
+OUTPUT_MAX_SIDE = int(os.getenv("KEYFRAME_MAX_SIDE", "1600"))  # kept frames are stored at most this size
+OUTPUT_QUALITY = 90
+
+
+def is_video(filename: Optional[str], content_type: Optional[str]) -> bool:
+    if content_type and content_type.startswith("video/"):
+        return True
+    return bool(filename) and filename.lower().endswith(VIDEO_EXTENSIONS)
+
+
+class Candidate:
+    """A scored frame kept as a possible keyframe."""
+
+    __slots__ = ("source", "frame", "timestamp", "sharpness", "exposure", "quality", "hash", "jpeg")
+
+    def __init__(self, source: str, frame: int, timestamp: Optional[float], sharpness: float,
+                 exposure: float, quality: float, frame_hash: int, jpeg: bytes):
+        self.source = source
+        self.frame = frame
+        self.timestamp = timestamp
+        self.sharpness = sharpness
+        self.exposure = exposure
+        self.quality = quality
+        self.hash = frame_hash
+        self.jpeg = jpeg
+
+    def describe(self) -> Dict[str, Any]:
+        return {"source": self.source, "frame": self.frame,
+                "timestamp": None if self.timestamp is None else round(self.timestamp, 3),
+                "sharpness": round(self.sharpness, 1), "exposure": round(self.exposure, 3),
+                "quality": round(self.quality, 3)}
+
+
+class View:
+    """Consecutive frames of one view of the vehicle."""
+
+    __slots__ = ("reference", "frames", "candidates")
+
+    def __init__(self, reference: np.ndarray):
+        self.reference = reference  # colour histogram of the view's first frame
+        self.frames = 0
+        self.candidates: List[Candidate] = []
+
+
+def exposure_score(gray: np.ndarray) -> float:
+    """1 for a well-exposed frame, towards 0 as it gets dark, bright or clipped."""
+    mean = float(gray.mean())
+    clipped = float(np.count_nonzero((gray <= 5) | (gray >= 250))) / gray.size
+    return math.sqrt(max(0.0, 1.0 - abs(mean - 128.0) / 128.0)) * (1.0 - clipped)
+
+
+def colour_histogram(small: np.ndarray) -> np.ndarray:
+    hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1], None, [16, 8], [0, 180, 0, 256])
+    return cv2.normalize(hist, hist).astype(np.float32)
+
+
+def encode_frame(frame: np.ndarray) -> bytes:
+    height, width = frame.shape[:2]
+    scale = OUTPUT_MAX_SIDE / max(height, width)
+    if scale < 1:
+        frame = cv2.resize(frame, (round(width * scale), round(height * scale)),
+                           interpolation=cv2.INTER_AREA)
+    ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, OUTPUT_QUALITY])
+    if not ok:
+        raise ValueError("could not encode keyframe")
+    return buffer.tobytes()
+
+
+class KeyframeSelector:
+    """Feed frames in order with add(); select() returns the keyframes per view."""
+
+    def __init__(self, per_view: int = 2, max_views: int = 6, scene_threshold: float = 0.45,
+                 dedupe_distance: int = 6, min_exposure: float = 0.15):
+        self.per_view = per_view
+        self.max_views = max_views
+        self.scene_threshold = scene_threshold
+        self.dedupe_distance = dedupe_distance
+        self.min_exposure = min_exposure
+        self.candidates_per_view = max(4, 3 * per_view)
+        self.views: List[View] = []
+        self.scored = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.score_ms = 0.0
+
+    def add(self, frame: np.ndarray, source: str, index: int = 0,
+            timestamp: Optional[float] = None) -> None:
+        """Score one BGR frame and keep it if it may become a keyframe."""
+        start = time.perf_counter()
+        height, width = frame.shape[:2]
+        scale = ANALYSIS_WIDTH / width if width > ANALYSIS_WIDTH else 1.0
+        small = cv2.resize(frame, (round(width * scale), max(1, round(height * scale))),
+                           interpolation=cv2.INTER_AREA) if scale < 1 else frame
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        sharpness = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+        exposure = exposure_score(gray)
+        histogram = colour_histogram(small)
+        frame_hash = dhash(gray)
+        self.scored += 1
+
+        view = self.views[-1] if self.views else None
+        if view is None or cv2.compareHist(view.reference, histogram,
+                                           cv2.HISTCMP_BHATTACHARYYA) > self.scene_threshold:
+            view = View(histogram)
+            self.views.append(view)
+            if len(self.views) > self.max_views:
+                self._merge_smallest_view()
+        view.frames += 1
+
+        if exposure < self.min_exposure:
+            self.rejected += 1
+        else:
+            # Sharpness spans orders of magnitude; exposure scales it down for bad lighting
+            quality = math.log1p(sharpness) * (0.5 + 0.5 * exposure)
+            self._offer(view, source, index, timestamp, sharpness, exposure, quality, frame_hash, frame)
+        self.score_ms += (time.perf_counter() - start) * 1000
+
+    def _offer(self, view: View, source: str, index: int, timestamp: Optional[float],
+               sharpness: float, exposure: float, quality: float, frame_hash: int,
+               frame: np.ndarray) -> None:
+        for i, other in enumerate(view.candidates):
+            if hamming(other.hash, frame_hash) <= self.dedupe_distance:
+                self.duplicates += 1
+                if quality <= other.quality:
+                    return
+                del view.candidates[i]  # the new frame is a better copy of the same shot
+                break
+        if len(view.candidates) >= self.candidates_per_view:
+            worst = min(range(len(view.candidates)), key=lambda i: view.candidates[i].quality)
+            if view.candidates[worst].quality >= quality:
+                return
+            del view.candidates[worst]
+        view.candidates.append(Candidate(source, index, timestamp, sharpness, exposure, quality,
+                                         frame_hash, encode_frame(frame)))
+
+    def _merge_smallest_view(self) -> None:
+        """Fold the view with the fewest frames into a neighbour (the earlier one if it has one)."""
+        smallest = min(range(len(self.views)), key=lambda i: self.views[i].frames)
+        view = self.views.pop(smallest)
+        target = self.views[smallest - 1] if smallest > 0 else self.views[0]
+        target.frames += view.frames
+        merged = sorted(target.candidates + view.candidates, key=lambda c: c.quality, reverse=True)
+        target.candidates = []
+        for candidate in merged:
+            if len(target.candidates) >= self.candidates_per_view:
+                break
+            if all(hamming(candidate.hash, kept.hash) > self.dedupe_distance
+                   for kept in target.candidates):
+                target.candidates.append(candidate)
+
+    def select(self) -> List[Tuple[int, Candidate]]:
+        """(view index, candidate) for up to per_view distinct frames per view, best first."""
+        picked: List[Tuple[int, Candidate]] = []
+        for number, view in enumerate(self.views):
+            chosen = 0
+            for candidate in sorted(view.candidates, key=lambda c: c.quality, reverse=True):
+                if chosen >= self.per_view:
+                    break
+                if any(hamming(candidate.hash, other.hash) <= self.dedupe_distance
+                       for _, other in picked):
+                    continue
+                picked.append((number, candidate))
+                chosen += 1
+        return picked
+
+    def report(self) -> Dict[str, Any]:
+        return {"frames_scored": self.scored, "near_duplicates": self.duplicates,
+                "badly_exposed": self.rejected, "views": len(self.views),
+                "score_ms": round(self.score_ms, 1)}
+
+
+def video_frames(path: str, sample_fps: float = 3.0,
+                 max_seconds: float = 300.0) -> Iterator[Tuple[int, float, np.ndarray]]:
+    """(frame index, timestamp, BGR frame) at about sample_fps, decoded one at a time."""
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError("could not open the video")
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+        step = max(1, round(fps / sample_fps)) if sample_fps > 0 else 1
+        index = 0
+        while index / fps <= max_seconds:
+            # grab() skips the colour conversion of frames that are not sampled
+            if not capture.grab():
+                break
+            if index % step == 0:
+                ok, frame = capture.retrieve()
+                if ok:
+                    yield index, index / fps, frame
+            index += 1
+    finally:
+        capture.release()
+
+
+def feed_video(selector: KeyframeSelector, path: str, source: str, sample_fps: float = 3.0,
+               max_seconds: float = 300.0) -> None:
+    for index, timestamp, frame in video_frames(path, sample_fps, max_seconds):
+        selector.add(frame, source, index, timestamp)
+
+
+def feed_image(selector: KeyframeSelector, raw: bytes, source: str) -> bool:
+    """Add one photo of a set; False if the bytes are not a decodable image."""
+    frame = cv2.imdecode(np.frombuffer(raw, np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        return False
+    selector.add(frame, source)
+    return True
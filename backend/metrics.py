@@ -0,0 +1,256 @@
+"""
+In-process metrics and request tracing.
+
+A small Prometheus-compatible registry (counters, gauges, histograms with
+labels), rendered in the text exposition format for GET /metrics. This avoids
+a client-library dependency. Callback gauges read existing stats() counters
+(caches, scheduler lanes, job queue) at scrape time, so they cost nothing per
+request.
+
+Spans time the phases of one request (upload, preprocess, queue wait,
+upstream call, render, encode). Each span feeds a histogram and is appended
+to the request's timing list, which the HTTP middleware returns as a
+Server-Timing header. The list is held in a context variable, so spans
+recorded in tasks started by the request (asyncio.gather) are included.
+"""
+import contextvars
+import math
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+SIZE_BUCKETS = tuple(float(1024 * 4 ** i) for i in range(9))  # 1 KiB .. 64 MiB
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def samples(self) -> Iterable[Tuple[str, str, float]]:
+        """(suffix, formatted labels, value) triples."""
+        return ()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield "", _format_labels(self.label_names, key), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class CallbackGauge(Metric):
+    """Gauge (or counter) whose samples are read from fn() at scrape time."""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str],
+                 fn: Callable[[], Iterable[Tuple[Sequence[str], float]]], kind: str = "gauge"):
+        super().__init__(name, help_text, labels)
+        self.fn = fn
+        self.kind = kind
+
+    def samples(self):
+        try:
+            rows = list(self.fn())
+        except Exception:
+            return
+        for values, value in rows:
+            yield "", _format_labels(self.label_names, values), value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(s[0]), s[1], s[2]) for key, s in self._series.items()]
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_value(bound) + '"'
+                yield "_bucket", _format_labels(self.label_names, key, le), cumulative
+            yield "_sum", _format_labels(self.label_names, key), total
+            yield "_count", _format_labels(self.label_names, key), count
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help_text, labels))
+
+    def gauge(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def callback(self, name: str, help_text: str, labels: Sequence[str],
+                 fn: Callable, kind: str = "gauge") -> CallbackGauge:
+        return self.register(CallbackGauge(name, help_text, labels, fn, kind))
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# --- Core metrics ---
+http_requests = REGISTRY.counter("http_requests_total", "HTTP requests by route and status",
+                                 ("method", "route", "status"))
+http_latency = REGISTRY.histogram("http_request_duration_seconds", "HTTP request latency",
+                                  ("method", "route"))
+http_request_bytes = REGISTRY.histogram("http_request_size_bytes", "Request body size",
+                                        ("route",), SIZE_BUCKETS)
+http_response_bytes = REGISTRY.histogram("http_response_size_bytes", "Response body size",
+                                         ("route",), SIZE_BUCKETS)
+http_in_progress = REGISTRY.gauge("http_requests_in_progress", "Requests being handled")
+span_latency = REGISTRY.histogram("span_duration_seconds", "Time spent per request phase",
+                                  ("span",))
+upstream_requests = REGISTRY.counter("upstream_requests_total", "OpenRouter calls by model and status",
+                                     ("model", "status"))
+upstream_latency = REGISTRY.histogram("upstream_request_duration_seconds",
+                                      "OpenRouter call latency (after admission)", ("model",))
+upstream_first_token = REGISTRY.histogram("upstream_first_token_seconds",
+                                          "Streamed OpenRouter calls: time to the first token",
+                                          ("model",))
+upstream_queue_wait = REGISTRY.histogram("upstream_queue_wait_seconds",
+                                         "Time waiting for scheduler admission", ("model", "priority"))
+render_latency = REGISTRY.histogram("render_duration_seconds",
+                                    "Marker compositing time by marker count", ("markers",))
+
+
+def marker_bucket(count: int) -> str:
+    """Coarse label for a marker/component count, to keep label cardinality low."""
+    for upper, label in ((0, "0"), (2, "1-2"), (5, "3-5"), (10, "6-10"), (25, "11-25")):
+        if count <= upper:
+            return label
+    return "26+"
+
+
+# --- Request tracing ---
+current_timings: contextvars.ContextVar = contextvars.ContextVar("request_timings", default=None)
+
+
+def start_trace() -> List[Tuple[str, float]]:
+    timings: List[Tuple[str, float]] = []
+    current_timings.set(timings)
+    return timings
+
+
+def record_span(name: str, seconds: float) -> None:
+    span_latency.observe(seconds, span=name)
+    timings = current_timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+@contextmanager
+def span(name: str):
+    """Time a block as one request phase."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - start)
+
+
+_TOKEN = re.compile(r"[^A-Za-z0-9_-]")
+
+
+def server_timing_header(timings: List[Tuple[str, float]], total: Optional[float] = None) -> str:
+    """Server-Timing value; repeated spans (e.g. two upstream calls) are summed per name."""
+    merged: Dict[str, List[float]] = {}
+    for name, seconds in timings:
+        entry = merged.setdefault(_TOKEN.sub("_", name), [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+    parts = [f'{name};dur={seconds * 1000:.1f}' + (f';desc="x{count}"' if count > 1 else "")
+             for name, (seconds, count) in merged.items()]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
@@ -0,0 +1,246 @@
+"""
+Shared async client for the OpenRouter chat-completions API.
+
+One keep-alive connection pool is reused by every request, each call has its
+own connect/read timeouts, and concurrency is bounded globally. Per model,
+calls go through an UpstreamScheduler lane: a rate limit, an adaptive
+concurrency limit that backs off on 429s, and priority ordering. Point
+base_url at a local stub server to exercise it without touching OpenRouter.
+chat_stream() is the stream: true variant, yielding tokens as they arrive.
+"""
+import asyncio
+import json
+import os
+import time
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+from metrics import (record_span, upstream_first_token, upstream_latency, upstream_queue_wait,
+                     upstream_requests)
+from scheduler import UpstreamScheduler, current_priority, parse_model_rates
+
+DEFAULT_BASE_URL = "https://openrouter.ai/api/v1"
+
+
+class UpstreamError(Exception):
+    """OpenRouter answered 429 or 5xx; the call may succeed if retried later."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: Optional[float] = None):
+        super().__init__(f"OpenRouter returned {status_code}: {detail}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header (the HTTP-date form is ignored)."""
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
+
+
+def parse_model_limits(spec: str) -> Dict[str, int]:
+    """Parse 'model-a=4,model-b=2' into {'model-a': 4, 'model-b': 2}."""
+    limits = {}
+    for part in spec.split(","):
+        if "=" not in part:
+            continue
+        model, limit = part.rsplit("=", 1)
+        if model.strip() and limit.strip().isdigit():
+            limits[model.strip()] = int(limit)
+    return limits
+
+
+class OpenRouterClient:
+    """Connection-pooled async OpenRouter client with bounded concurrency."""
+
+    def __init__(self, api_key: str, base_url: str = DEFAULT_BASE_URL,
+                 connect_timeout: float = 5.0, read_timeout: float = 120.0,
+                 max_connections: int = 100, max_keepalive: int = 20,
+                 max_concurrency: int = 64, default_model_concurrency: int = 16,
+                 model_concurrency: Optional[Dict[str, int]] = None,
+                 scheduler: Optional[UpstreamScheduler] = None):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_keepalive)
+        self.max_concurrency = max_concurrency
+        self.default_model_concurrency = default_model_concurrency
+        self.model_concurrency = dict(model_concurrency or {})
+        # Per-model concurrency is the ceiling the adaptive limit can grow back to
+        self.scheduler = scheduler or UpstreamScheduler(default_limit=default_model_concurrency,
+                                                        limits=self.model_concurrency)
+        # Created lazily so they bind to the running event loop
+        self._http: Optional[httpx.AsyncClient] = None
+        self._global_slots: Optional[asyncio.Semaphore] = None
+        self.active = 0
+
+    @classmethod
+    def from_env(cls, api_key: str) -> "OpenRouterClient":
+        """Build a client from OPENROUTER_* environment variables."""
+        return cls(
+            api_key=api_key,
+            base_url=os.getenv("OPENROUTER_BASE_URL", DEFAULT_BASE_URL),
+            connect_timeout=float(os.getenv("OPENROUTER_CONNECT_TIMEOUT", "5")),
+            read_timeout=float(os.getenv("OPENROUTER_READ_TIMEOUT", "120")),
+            max_connections=int(os.getenv("OPENROUTER_MAX_CONNECTIONS", "100")),
+            max_concurrency=int(os.getenv("OPENROUTER_MAX_CONCURRENCY", "64")),
+            default_model_concurrency=int(os.getenv("OPENROUTER_MODEL_CONCURRENCY_DEFAULT", "16")),
+            model_concurrency=parse_model_limits(os.getenv("OPENROUTER_MODEL_CONCURRENCY", "")),
+            scheduler=UpstreamScheduler(
+                # Requests per second (0 = unlimited); OPENROUTER_MODEL_RATES="model=rate:burst,..."
+                default_rate=float(os.getenv("OPENROUTER_RATE_DEFAULT", "0")),
+                default_burst=float(os.getenv("OPENROUTER_BURST_DEFAULT", "1")),
+                rates=parse_model_rates(os.getenv("OPENROUTER_MODEL_RATES", "")),
+                default_limit=int(os.getenv("OPENROUTER_MODEL_CONCURRENCY_DEFAULT", "16")),
+                limits=parse_model_limits(os.getenv("OPENROUTER_MODEL_CONCURRENCY", "")),
+                default_backoff=float(os.getenv("OPENROUTER_THROTTLE_BACKOFF", "5")),
+            ),
+        )
+
+    def _client(self) -> httpx.AsyncClient:
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout,
+                                           limits=self.limits)
+        return self._http
+
+    def _slots(self) -> asyncio.Semaphore:
+        if self._global_slots is None:
+            self._global_slots = asyncio.Semaphore(self.max_concurrency)
+        return self._global_slots
+
+    async def chat(self, payload: Dict, api_key: Optional[str] = None,
+                   read_timeout: Optional[float] = None, priority: Optional[str] = None) -> Dict:
+        """
+        POST a chat-completions payload and return the decoded JSON body.
+        Waits for admission on the model's lane (priority defaults to the
+        current_priority context). Raises UpstreamError on 429 and 5xx responses.
+        """
+        headers = {"Authorization": f"Bearer {api_key or self.api_key}",
+                   "Content-Type": "application/json"}
+        timeout = self.timeout if read_timeout is None else httpx.Timeout(
+            read_timeout, connect=self.timeout.connect)
+        model = payload.get("model", "")
+        priority = priority or current_priority.get()
+        lane = self.scheduler.lane(model)
+        waited = await lane.acquire(priority)
+        upstream_queue_wait.observe(waited, model=model, priority=priority)
+        record_span("upstream_queue", waited)
+        started_at = time.monotonic()
+        outcome, retry_after, status = "error", None, "error"
+        try:
+            async with self._slots():
+                self.active += 1
+                try:
+                    response = await self._client().post("/chat/completions", headers=headers,
+                                                         json=payload, timeout=timeout)
+                finally:
+                    self.active -= 1
+            status = str(response.status_code)
+            if response.status_code == 429:
+                outcome = "throttled"
+                retry_after = parse_retry_after(response.headers.get("retry-after"))
+            elif response.status_code < 500:
+                outcome = "ok"
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
+        finally:
+            lane.release(outcome, retry_after, started_at)
+            elapsed = time.monotonic() - started_at
+            upstream_requests.inc(model=model, status=status)
+            upstream_latency.observe(elapsed, model=model)
+            record_span("upstream", elapsed)
+        if response.status_code == 429 or response.status_code >= 500:
+            raise UpstreamError(response.status_code, response.text[:200],
+                                parse_retry_after(response.headers.get("retry-after")))
+        return response.json()
+
+    async def chat_stream(self, payload: Dict, api_key: Optional[str] = None,
+                          read_timeout: Optional[float] = None,
+                          priority: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        chat() with stream: true: yields the reply's content deltas as
+        OpenRouter sends them. Admission, slots and metrics are as for chat().
+        Raises UpstreamError on 429 and 5xx (before any delta), and
+        ValueError on other errors or an error event in the stream.
+        """
+        headers = {"Authorization": f"Bearer {api_key or self.api_key}",
+                   "Content-Type": "application/json", "Accept": "text/event-stream"}
+        timeout = self.timeout if read_timeout is None else httpx.Timeout(
+            read_timeout, connect=self.timeout.connect)
+        model = payload.get("model", "")
+        priority = priority or current_priority.get()
+        lane = self.scheduler.lane(model)
+        waited = await lane.acquire(priority)
+        upstream_queue_wait.observe(waited, model=model, priority=priority)
+        record_span("upstream_queue", waited)
+        started_at = time.monotonic()
+        outcome, retry_after, status = "error", None, "error"
+        try:
+            async with self._slots():
+                self.active += 1
+                try:
+                    async with self._client().stream("POST", "/chat/completions", headers=headers,
+                                                     json={**payload, "stream": True},
+                                                     timeout=timeout) as response:
+                        status = str(response.status_code)
+                        if response.status_code >= 400:
+                            detail = (await response.aread()).decode("utf-8", "replace")[:200]
+                            retry_after = parse_retry_after(response.headers.get("retry-after"))
+                            if response.status_code == 429:
+                                outcome = "throttled"
+                            elif response.status_code < 500:
+                                outcome = "ok"
+                            if response.status_code == 429 or response.status_code >= 500:
+                                raise UpstreamError(response.status_code, detail, retry_after)
+                            raise ValueError(f"OpenRouter returned {response.status_code}: {detail}")
+                        first = True
+                        async for line in response.aiter_lines():
+                            # Blank lines separate events; ": ..." lines are keep-alive comments
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[5:].strip()
+                            if data == "[DONE]":
+                                break
+                            chunk = json.loads(data)
+                            if "error" in chunk:
+                                raise ValueError(f"OpenRouter stream error: {json.dumps(chunk['error'])[:200]}")
+                            choices = chunk.get("choices") or [{}]
+                            delta = (choices[0].get("delta") or {}).get("content")
+                            if delta:
+                                if first:
+                                    first = False
+                                    upstream_first_token.observe(time.monotonic() - started_at, model=model)
+                                yield delta
+                        outcome = "ok"
+                finally:
+                    self.active -= 1
+        except (asyncio.CancelledError, GeneratorExit):
+            status = "cancelled"
+            raise
+        finally:
+            lane.release(outcome, retry_after, started_at)
+            elapsed = time.monotonic() - started_at
+            upstream_requests.inc(model=model, status=status)
+            upstream_latency.observe(elapsed, model=model)
+            record_span("upstream", elapsed)
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    def stats(self) -> Dict:
+        return {
+            "base_url": self.base_url,
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "model_concurrency": {
+                model: self.model_concurrency.get(model, self.default_model_concurrency)
+                for model in self.scheduler.lanes
+            },
+            "scheduler": self.scheduler.stats(),
+        }
@@ -0,0 +1,353 @@
+"""
+Perceptual hashes of uploaded images and a near-duplicate index over them.
+
+Each image gets two 64-bit hashes from a small grayscale copy:
+
+* pHash: signs of the 8x8 lowest DCT frequencies of a 32x32 thumbnail
+  (against their median); robust to resizing, recompression and small edits
+* dHash: signs of horizontal gradients of a 9x8 thumbnail; cheap, and
+  used as a second check so two unrelated images rarely both collide
+
+Hashes are stored in SQLite (one row per content digest) and searched in
+memory with multi-index hashing: the 64-bit pHash is split into four 16-bit
+chunks, each kept as a sorted array. Two hashes within Hamming distance k
+agree to within k // 4 bits in at least one chunk, so a query only probes
+the buckets near its own chunks and verifies those candidates with a
+vectorized popcount, instead of scanning every stored hash. Recent
+additions sit in a small unsorted tail that is scanned directly and merged
+into the sorted arrays once it grows.
+
+Every indexed image also gets a canonical digest: the digest of the first
+indexed image within PHASH_REUSE_DISTANCE (on both hashes), else its own.
+explain results are cached on it, so a resized or recompressed re-upload
+reuses the earlier description. check_ai stays keyed on the exact bytes: an
+edited near-duplicate must not inherit the original's verdict.
+
+Bulk build from an upload folder:  python phash_index.py build ../uploads
+"""
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+CHUNKS = 4  # 16-bit chunks of the 64-bit hash
+CHUNK_BITS = 64 // CHUNKS
+MAX_DISTANCE = 15  # largest k a query may ask for (3 bits per chunk)
+TAIL_MERGE = 2048  # minimum unsorted additions kept before they are merged into the chunk arrays
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".bmp")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS image_hashes (
+    digest TEXT PRIMARY KEY,
+    phash INTEGER NOT NULL,
+    dhash INTEGER NOT NULL,
+    canonical TEXT NOT NULL,
+    filename TEXT,
+    created_at REAL NOT NULL
+);
+"""
+
+
+# --- Hashing ---
+def _bits_to_int(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.astype(np.uint8).ravel()).tobytes(), "big")
+
+
+def dhash(gray: np.ndarray) -> int:
+    """64-bit difference hash: is each pixel of a 9x8 thumbnail brighter than its right neighbour."""
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA).astype(np.int16)
+    return _bits_to_int(small[:, :-1] > small[:, 1:])
+
+
+def phash(gray: np.ndarray) -> int:
+    """64-bit DCT hash: 8x8 lowest frequencies of a 32x32 thumbnail against their median."""
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8]
+    # The DC term is excluded from the median: it only tracks overall brightness
+    return _bits_to_int(low > np.median(low.ravel()[1:]))
+
+
+def image_hashes(raw: bytes) -> Optional[Tuple[int, int]]:
+    """(pHash, dHash) of encoded image bytes, or None if they do not decode."""
+    # A quarter-size decode is plenty for 32x32 thumbnails and several times faster
+    gray = cv2.imdecode(np.frombuffer(raw, np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    if gray is None or gray.size == 0:
+        return None
+    return phash(gray), dhash(gray)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def popcount64(values: np.ndarray) -> np.ndarray:
+    """Set bits of each uint64, as int64."""
+    if hasattr(np, "bitwise_count"):  # numpy >= 2.0
+        return np.bitwise_count(values).astype(np.int64)
+    octets = np.ascontiguousarray(values, dtype=np.uint64).view(np.uint8).reshape(-1, 8)
+    return np.unpackbits(octets, axis=1).sum(axis=1, dtype=np.int64)
+
+
+def _signed(value: int) -> int:
+    """uint64 -> int64, as SQLite stores integers."""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _chunk_neighbours(radius: int) -> np.ndarray:
+    """XOR masks of every 16-bit value within radius bits of zero."""
+    masks = [0]
+    for r in range(1, radius + 1):
+        masks.extend(sum(1 << bit for bit in bits) for bits in combinations(range(CHUNK_BITS), r))
+    return np.array(masks, dtype=np.uint16)
+
+
+_NEIGHBOURS = [_chunk_neighbours(r) for r in range(MAX_DISTANCE // CHUNKS + 1)]
+
+
+class PHashIndex:
+    """Persistent pHash/dHash store with in-memory multi-index Hamming search."""
+
+    def __init__(self, path: str, reuse_distance: int = 4):
+        self.path = path
+        self.reuse_distance = reuse_distance
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False,
+                                     timeout=10.0)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+        self._phash = np.zeros(0, dtype=np.uint64)
+        self._dhash = np.zeros(0, dtype=np.uint64)
+        self._digests: List[str] = []
+        self._canonical: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._size = 0
+        self._sorted = 0  # rows [0, _sorted) are in the chunk arrays, the rest is the tail
+        self._chunk_keys: List[np.ndarray] = []
+        self._chunk_rows: List[np.ndarray] = []
+        self.queries = 0
+        self.reused = 0
+        self.loaded = False
+
+    @classmethod
+    def from_env(cls, data_dir: str) -> "PHashIndex":
+        """Index at PHASH_INDEX_PATH (default <data_dir>/phash.sqlite3)."""
+        return cls(os.getenv("PHASH_INDEX_PATH", os.path.join(data_dir, "phash.sqlite3")),
+                   reuse_distance=int(os.getenv("PHASH_REUSE_DISTANCE", "4")))
+
+    # --- In-memory arrays ---
+    def load(self) -> None:
+        """Read every stored hash into memory (call once at startup)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT digest, phash, dhash, canonical FROM image_hashes ORDER BY rowid").fetchall()
+            self._size = 0
+            self._digests, self._canonical, self._rows = [], [], {}
+            self._phash = np.zeros(max(1024, len(rows)), dtype=np.uint64)
+            self._dhash = np.zeros_like(self._phash)
+            self._append([(digest, p & (2 ** 64 - 1), d & (2 ** 64 - 1), canonical)
+                          for digest, p, d, canonical in rows])
+            self._merge()
+            self.loaded = True
+
+    def _append(self, rows: List[Tuple[str, int, int, str]]) -> None:
+        needed = self._size + len(rows)
+        if needed > len(self._phash):
+            capacity = max(needed, 2 * len(self._phash))
+            for name in ("_phash", "_dhash"):
+                grown = np.zeros(capacity, dtype=np.uint64)
+                grown[:self._size] = getattr(self, name)[:self._size]
+                setattr(self, name, grown)
+        if rows:
+            self._phash[self._size:needed] = np.array([row[1] for row in rows], dtype=np.uint64)
+            self._dhash[self._size:needed] = np.array([row[2] for row in rows], dtype=np.uint64)
+        for i, (digest, _, _, canonical) in enumerate(rows):
+            self._rows[digest] = self._size + i
+            self._digests.append(digest)
+            self._canonical.append(canonical)
+        self._size = needed
+        # The tail may grow with the index, so big indexes are not re-sorted every few inserts
+        if self._size - self._sorted >= max(TAIL_MERGE, self._size // 64):
+            self._merge()
+
+    def _merge(self) -> None:
+        """Rebuild the sorted chunk arrays over every row (the tail becomes empty)."""
+        hashes = self._phash[:self._size]
+        self._chunk_keys, self._chunk_rows = [], []
+        for chunk in range(CHUNKS):
+            keys = ((hashes >> np.uint64(chunk * CHUNK_BITS)) & np.uint64(0xFFFF)).astype(np.uint16)
+            order = np.argsort(keys, kind="stable").astype(np.int64)
+            self._chunk_keys.append(keys[order])
+            self._chunk_rows.append(order)
+        self._sorted = self._size
+
+    def _candidates(self, value: int, k: int) -> np.ndarray:
+        """Rows that may be within k of value: chunk-bucket probes plus the unsorted tail."""
+        neighbours = _NEIGHBOURS[k // CHUNKS]
+        found = [np.arange(self._sorted, self._size)]
+        for chunk, keys in enumerate(self._chunk_keys):
+            probes = np.uint16((value >> (chunk * CHUNK_BITS)) & 0xFFFF) ^ neighbours
+            starts = np.searchsorted(keys, probes, "left")
+            ends = np.searchsorted(keys, probes, "right")
+            lengths = ends - starts
+            # Concatenated [start, end) ranges, gathered without a Python loop over buckets
+            offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+            found.append(self._chunk_rows[chunk][np.arange(lengths.sum()) + offsets])
+        # May repeat rows (found through several chunks); _search dedupes after filtering
+        return np.concatenate(found)
+
+    def _search(self, p: int, d: Optional[int], k: int, limit: int) -> List[Dict[str, Any]]:
+        rows = self._candidates(p, k)
+        if not len(rows):
+            return []
+        distances = popcount64(self._phash[rows] ^ np.uint64(p))
+        keep = distances <= k
+        rows, first = np.unique(rows[keep], return_index=True)
+        distances = distances[keep][first]
+        order = np.lexsort((rows, distances))[:limit]
+        d_distances = popcount64(self._dhash[rows[order]] ^ np.uint64(d)) if d is not None else None
+        return [{"digest": self._digests[rows[i]], "canonical": self._canonical[rows[i]],
+                 "distance": int(distances[i]),
+                 "dhash_distance": None if d_distances is None else int(d_distances[n])}
+                for n, i in enumerate(order)]
+
+    # --- Public API ---
+    def search(self, p: int, k: int = 6, limit: int = 20, d: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Stored images within pHash Hamming distance k of p, nearest first."""
+        if not 0 <= k <= MAX_DISTANCE:
+            raise ValueError(f"k must be between 0 and {MAX_DISTANCE}")
+        with self._lock:
+            self.queries += 1
+            return self._search(p, d, k, limit)
+
+    def get(self, digest: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._rows.get(digest)
+            if row is None:
+                return None
+            return {"digest": digest, "phash": int(self._phash[row]), "dhash": int(self._dhash[row]),
+                    "canonical": self._canonical[row]}
+
+    def canonical(self, raw: bytes, digest: str, filename: Optional[str] = None) -> str:
+        """
+        Index an image (if new) and return its canonical digest: that of the
+        first stored near-duplicate (pHash and dHash both within
+        reuse_distance), else its own. Undecodable images map to themselves.
+        """
+        known = self.get(digest)
+        if known is not None:
+            return known["canonical"]
+        hashes = image_hashes(raw)
+        if hashes is None:
+            return digest
+        return self.add(digest, *hashes, filename=filename)
+
+    def add(self, digest: str, p: int, d: int, filename: Optional[str] = None) -> str:
+        """Index one hashed image; returns its canonical digest."""
+        return self.add_many([(digest, p, d, filename)])[0]
+
+    def add_many(self, items: Iterable[Tuple[str, int, int, Optional[str]]]) -> List[str]:
+        """Index many hashed images in one transaction; returns their canonical digests."""
+        canonicals = []
+        with self._lock:
+            inserts, now = [], time.time()
+            for digest, p, d, filename in items:
+                row = self._rows.get(digest)
+                if row is not None:
+                    canonicals.append(self._canonical[row])
+                    continue
+                canonical = digest
+                if self.reuse_distance >= 0:
+                    for match in self._search(p, d, min(self.reuse_distance, MAX_DISTANCE), 8):
+                        if match["dhash_distance"] <= self.reuse_distance:
+                            canonical = match["canonical"]
+                            self.reused += 1
+                            break
+                self._append([(digest, p, d, canonical)])
+                inserts.append((digest, _signed(p), _signed(d), canonical, filename, now))
+                canonicals.append(canonical)
+            if inserts:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO image_hashes (digest, phash, dhash, canonical, filename, "
+                    "created_at) VALUES (?, ?, ?, ?, ?, ?)", inserts)
+        return canonicals
+
+    def filenames(self, digests: List[str]) -> Dict[str, Optional[str]]:
+        if not digests:
+            return {}
+        with self._lock:
+            placeholders = ",".join("?" * len(digests))
+            return dict(self._conn.execute(
+                f"SELECT digest, filename FROM image_hashes WHERE digest IN ({placeholders})",
+                digests).fetchall())
+
+    def stats(self) -> Dict[str, Any]:
+        return {"images": self._size, "unsorted_tail": self._size - self._sorted,
+                "queries": self.queries, "reused": self.reused,
+                "reuse_distance": self.reuse_distance}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _hash_file(path: str) -> Optional[Tuple[str, int, int, str]]:
+    with open(path, "rb") as f:
+        raw = f.read()
+    hashes = image_hashes(raw)
+    if hashes is None:
+        return None
+    return hashlib.sha256(raw).hexdigest(), hashes[0], hashes[1], os.path.basename(path)
+
+
+def build_from_directory(index: PHashIndex, directory: str, workers: int = 4) -> Dict[str, int]:
+    """Hash every image in a folder (in threads; OpenCV releases the GIL) and index them."""
+    paths = [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+             if name.lower().endswith(IMAGE_EXTENSIONS)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        hashed = [item for item in pool.map(_hash_file, paths) if item is not None]
+    before = index.stats()["images"]
+    index.add_many(hashed)
+    return {"files": len(paths), "hashed": len(hashed), "added": index.stats()["images"] - before}
+
+
+def main(argv: List[str]) -> None:
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Build or query the perceptual-hash index")
+    parser.add_argument("--db", default=os.getenv("PHASH_INDEX_PATH", os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "job_data", "phash.sqlite3")))
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_cmd = sub.add_parser("build", help="index every image in a folder")
+    build_cmd.add_argument("directory")
+    build_cmd.add_argument("--workers", type=int, default=4)
+    query_cmd = sub.add_parser("query", help="list stored near-duplicates of an image")
+    query_cmd.add_argument("path")
+    query_cmd.add_argument("-k", type=int, default=6)
+    args = parser.parse_args(argv)
+
+    index = PHashIndex(args.db)
+    index.load()
+    if args.command == "build":
+        print(json.dumps(build_from_directory(index, args.directory, args.workers)))
+        return
+    with open(args.path, "rb") as f:
+        hashes = image_hashes(f.read())
+    if hashes is None:
+        raise SystemExit(f"{args.path}: not a decodable image")
+    print(json.dumps(index.search(hashes[0], args.k, d=hashes[1]), indent=2))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
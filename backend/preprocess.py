@@ -0,0 +1,180 @@
+"""
+Image normalization before sending uploads to vision models.
+
+Uploads are decoded with EXIF orientation applied, transparent PNG/WebP
+images are flattened onto white, the image is downscaled to the model's max
+long edge, and it is re-encoded as JPEG or WebP at a target quality. The
+original bytes are sent unchanged when re-encoding would neither shrink them
+nor fix their orientation. Normalized variants are cached by content hash and profile.
+"""
+import os
+import struct
+import time
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+from result_cache import ResultCache
+
+DEFAULT_PROFILE = {
+    "max_edge": int(os.getenv("PREPROCESS_MAX_EDGE", "1536")),
+    "format": os.getenv("PREPROCESS_FORMAT", "jpeg"),
+    "quality": int(os.getenv("PREPROCESS_QUALITY", "85")),
+}
+
+# Per-model overrides of DEFAULT_PROFILE
+MODEL_PROFILES: Dict[str, Dict] = {
+    "mistralai/mistral-small-3.2-24b-instruct:free": {"max_edge": 1536},
+}
+
+MIME_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp", "png": "image/png"}
+
+normalized_cache = ResultCache(
+    max_entries=int(os.getenv("NORMALIZED_CACHE_MAX_ENTRIES", "64")),
+    ttl_seconds=float(os.getenv("NORMALIZED_CACHE_TTL", "3600")),
+)
+
+
+def sniff_format(data: bytes) -> Optional[str]:
+    """Identify the container format from magic bytes."""
+    if data[:3] == b"\xff\xd8\xff":
+        return "jpeg"
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def jpeg_orientation(data: bytes) -> int:
+    """EXIF orientation tag (1-8) of a JPEG, or 1 when absent."""
+    start = data.find(b"Exif\x00\x00", 0, 65536)
+    if start < 0:
+        return 1
+    tiff = start + 6
+    endian = "<" if data[tiff:tiff + 2] == b"II" else ">"
+    try:
+        ifd = tiff + struct.unpack(endian + "I", data[tiff + 4:tiff + 8])[0]
+        (count,) = struct.unpack(endian + "H", data[ifd:ifd + 2])
+        for i in range(count):
+            entry = ifd + 2 + 12 * i
+            tag, _, _, value = struct.unpack(endian + "HHIH", data[entry:entry + 10])
+            if tag == 0x0112:
+                return value if 1 <= value <= 8 else 1
+    except struct.error:
+        pass
+    return 1
+
+
+def profile_for(model: str) -> Dict:
+    profile = dict(DEFAULT_PROFILE)
+    profile.update(MODEL_PROFILES.get(model, {}))
+    return profile
+
+
+def profile_tag(profile: Dict) -> str:
+    """Short string identifying a profile, used in cache keys."""
+    return f"{profile['format']}-{profile['max_edge']}-q{profile['quality']}"
+
+
+class NormalizedImage:
+    """Bytes to send upstream plus a report of what preprocessing did."""
+
+    __slots__ = ("data", "mime_type", "width", "height", "original_bytes", "elapsed_ms",
+                 "reencoded", "cached")
+
+    def __init__(self, data: bytes, mime_type: str, width: int, height: int,
+                 original_bytes: int, elapsed_ms: float, reencoded: bool, cached: bool = False):
+        self.data = data
+        self.mime_type = mime_type
+        self.width = width
+        self.height = height
+        self.original_bytes = original_bytes
+        self.elapsed_ms = elapsed_ms
+        self.reencoded = reencoded
+        self.cached = cached
+
+    def report(self) -> Dict:
+        return {
+            "original_bytes": self.original_bytes,
+            "sent_bytes": len(self.data),
+            "bytes_saved": self.original_bytes - len(self.data),
+            "width": self.width,
+            "height": self.height,
+            "mime_type": self.mime_type,
+            "reencoded": self.reencoded,
+            "elapsed_ms": round(self.elapsed_ms, 2),
+            "cached": self.cached,
+        }
+
+
+def _decode(data: bytes, source_format: Optional[str]) -> Optional[np.ndarray]:
+    buf = np.frombuffer(data, dtype=np.uint8)
+    if source_format in ("png", "webp"):
+        # IMREAD_COLOR would drop alpha onto black; flatten transparent pixels onto white instead
+        image = cv2.imdecode(buf, cv2.IMREAD_UNCHANGED)
+        if image is not None and image.dtype == np.uint16:
+            # 16-bit PNG: down to 8 bits first, so colour and alpha are on the 0..255 scale
+            image = cv2.convertScaleAbs(image, alpha=255.0 / np.iinfo(image.dtype).max)
+        if image is not None and image.ndim == 3 and image.shape[2] == 4:
+            alpha = image[:, :, 3:4].astype(np.float32) / 255.0
+            color = image[:, :, :3].astype(np.float32)
+            return (color * alpha + 255.0 * (1.0 - alpha)).astype(np.uint8)
+        if image is not None and image.ndim == 2:
+            return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        if image is not None and image.dtype == np.uint8:
+            return image
+    # IMREAD_COLOR applies the EXIF orientation tag
+    return cv2.imdecode(buf, cv2.IMREAD_COLOR)
+
+
+def normalize_image(data: bytes, profile: Dict) -> NormalizedImage:
+    """Decode, orient, downscale and re-encode one image according to profile."""
+    start = time.perf_counter()
+    source_format = sniff_format(data)
+    image = _decode(data, source_format)
+    if image is None:
+        # Not something OpenCV can read; pass it through untouched
+        return NormalizedImage(data, MIME_TYPES.get(source_format, "image/jpeg"), 0, 0,
+                               len(data), (time.perf_counter() - start) * 1000, False)
+
+    height, width = image.shape[:2]
+    long_edge = max(height, width)
+    if long_edge > profile["max_edge"]:
+        scale = profile["max_edge"] / long_edge
+        width, height = max(1, round(width * scale)), max(1, round(height * scale))
+        image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+
+    target_format = profile["format"]
+    if target_format == "webp":
+        params = [cv2.IMWRITE_WEBP_QUALITY, profile["quality"]]
+    else:
+        target_format = "jpeg"
+        params = [cv2.IMWRITE_JPEG_QUALITY, profile["quality"]]
+    ok, encoded = cv2.imencode(f".{'jpg' if target_format == 'jpeg' else 'webp'}", image, params)
+
+    # Re-encode when it shrinks the payload, when the source format is not one models accept
+    # natively, or when an EXIF rotation has to be baked into the pixels
+    resized = long_edge > profile["max_edge"]
+    rotated = source_format == "jpeg" and jpeg_orientation(data) != 1
+    if ok and (resized or rotated or len(encoded) < len(data)
+               or source_format not in ("jpeg", "webp")):
+        out, mime_type, reencoded = encoded.tobytes(), MIME_TYPES[target_format], True
+    else:
+        out, mime_type, reencoded = data, MIME_TYPES.get(source_format, "image/jpeg"), False
+    return NormalizedImage(out, mime_type, width, height, len(data),
+                           (time.perf_counter() - start) * 1000, reencoded)
+
+
+def normalize_for_model(data: bytes, digest: str, model: str) -> NormalizedImage:
+    """normalize_image() with the model's profile, cached by content hash."""
+    profile = profile_for(model)
+    key = f"{digest}:{profile_tag(profile)}"
+    cached = normalized_cache.get(key)
+    if cached is not None:
+        return NormalizedImage(cached.data, cached.mime_type, cached.width, cached.height,
+                               cached.original_bytes, 0.0, cached.reencoded, cached=True)
+    normalized = normalize_image(data, profile)
+    normalized_cache.set(key, normalized)
+    return normalized
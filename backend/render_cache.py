@@ -0,0 +1,148 @@
+"""
+Deterministic on-disk cache for rendered damage images.
+
+Renders are keyed on a SHA-256 digest of the canonical JSON of everything that
+affects the pixels: components, side, view, render parameters and the renderer
+version. Unlike Python's salted hash(), the same assessment maps to the same
+file in every process. The digest doubles as the HTTP ETag. Entries hold the
+encoded image bytes, named <digest><extension>. Total disk usage is capped,
+and the least recently used renders are evicted first.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+def render_key(**parts: Any) -> str:
+    """Digest of the canonical JSON encoding of the render inputs."""
+    canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def etag_for(key: str) -> str:
+    return f'"{key}"'
+
+
+def etag_matches(if_none_match: Optional[str], key: str) -> bool:
+    """True if an If-None-Match header value covers this render."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    etag = etag_for(key)
+    return etag in tags or f"W/{etag}" in tags
+
+
+CACHE_EXTENSIONS = (".png", ".jpg", ".webp")
+
+
+class RenderCache:
+    """Size-capped LRU cache of encoded renders, one file per entry name."""
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self) -> None:
+        """Index existing files, oldest access first, then enforce the cap."""
+        files = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if ".tmp" in name:
+                    # Left behind by a render that died before commit(); other workers
+                    # may still be writing recent ones
+                    if time.time() - os.path.getmtime(path) > 3600:
+                        os.remove(path)
+                    continue
+                if not name.endswith(CACHE_EXTENSIONS):
+                    continue
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue  # committed, evicted or cleaned up by another worker meanwhile
+            files.append((max(stat.st_atime, stat.st_mtime), name, stat.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self.total_bytes += size
+        with self._lock:
+            self._evict()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def get(self, name: str) -> Optional[bytes]:
+        """Encoded render stored under name (e.g. '<digest>.png'), or None on a miss."""
+        with self._lock:
+            if name not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(name)
+            self.hits += 1
+        path = self.path(name)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # Persist recency so the LRU order survives restarts
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.total_bytes -= self._entries.pop(name, 0)
+                self.hits -= 1
+                self.misses += 1
+            return None
+        return data
+
+    def put(self, name: str, data: bytes) -> None:
+        """Atomically store an encoded render under name, evicting old entries if needed."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self.path(name))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        with self._lock:
+            self.total_bytes += len(data) - self._entries.get(name, 0)
+            self._entries[name] = len(data)
+            self._entries.move_to_end(name)
+            self._evict(keep=name)
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        while self.total_bytes > self.max_bytes and self._entries:
+            name, size = next(iter(self._entries.items()))
+            if name == keep:
+                break
+            del self._entries[name]
+            self.total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self.path(name))
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "total_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
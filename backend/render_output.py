@@ -0,0 +1,116 @@
+"""
+In-memory encoding and output negotiation for rendered damage images.
+
+The format comes from the ?format= query parameter, else from the Accept
+header, else PNG (what clients got before). Quality and max width can be set
+per request, and thumbnail mode gives a small, lossy preview for claim
+lists. Images are encoded with cv2.imencode and never touch a temp file.
+"""
+from typing import Optional
+
+import cv2
+import numpy as np
+from fastapi import HTTPException
+
+FORMATS = {
+    "png": {"media_type": "image/png", "extension": ".png"},
+    "jpeg": {"media_type": "image/jpeg", "extension": ".jpg"},
+    "webp": {"media_type": "image/webp", "extension": ".webp"},
+}
+FORMAT_ALIASES = {"jpg": "jpeg", "image/png": "png", "image/jpeg": "jpeg", "image/webp": "webp"}
+
+DEFAULT_QUALITY = 90
+THUMBNAIL_WIDTH = 320
+THUMBNAIL_QUALITY = 70
+MAX_OUTPUT_WIDTH = 4096
+
+
+def _accepted_format(accept: Optional[str]) -> Optional[str]:
+    """Best image format named in an Accept header, honouring q-values."""
+    if not accept:
+        return None
+    best, best_q = None, 0.0
+    # Prefer smaller formats when the client rates them equally
+    preference = {"webp": 3, "jpeg": 2, "png": 1}
+    for part in accept.split(","):
+        fields = part.strip().split(";")
+        fmt = FORMAT_ALIASES.get(fields[0].strip().lower())
+        if fmt is None:
+            continue
+        q = 1.0
+        for param in fields[1:]:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > best_q or (q == best_q and best and preference[fmt] > preference[best]):
+            best, best_q = fmt, q
+    return best if best_q > 0 else None
+
+
+class OutputSpec:
+    """Resolved output encoding for one render response."""
+
+    __slots__ = ("format", "quality", "max_width")
+
+    def __init__(self, format: str = "png", quality: int = DEFAULT_QUALITY,
+                 max_width: Optional[int] = None):
+        self.format = format
+        self.quality = quality
+        self.max_width = max_width
+
+    @classmethod
+    def negotiate(cls, format: Optional[str] = None, accept: Optional[str] = None,
+                  quality: Optional[int] = None, max_width: Optional[int] = None,
+                  thumbnail: bool = False) -> "OutputSpec":
+        if format:
+            fmt = FORMAT_ALIASES.get(format.lower(), format.lower())
+            if fmt not in FORMATS:
+                raise HTTPException(status_code=400,
+                                    detail=f"Unsupported format '{format}' (use png, jpeg or webp)")
+        else:
+            fmt = _accepted_format(accept) or ("webp" if thumbnail else "png")
+        if quality is not None and not 1 <= quality <= 100:
+            raise HTTPException(status_code=400, detail="quality must be between 1 and 100")
+        if max_width is not None and not 1 <= max_width <= MAX_OUTPUT_WIDTH:
+            raise HTTPException(status_code=400,
+                                detail=f"max_width must be between 1 and {MAX_OUTPUT_WIDTH}")
+        if thumbnail:
+            max_width = min(max_width or THUMBNAIL_WIDTH, THUMBNAIL_WIDTH)
+            quality = quality or THUMBNAIL_QUALITY
+        return cls(fmt, quality or DEFAULT_QUALITY, max_width)
+
+    @property
+    def media_type(self) -> str:
+        return FORMATS[self.format]["media_type"]
+
+    @property
+    def extension(self) -> str:
+        return FORMATS[self.format]["extension"]
+
+    def key_parts(self) -> dict:
+        """Encoding parameters that change the output bytes (for cache keys)."""
+        # PNG is lossless, so quality does not affect it
+        quality = None if self.format == "png" else self.quality
+        return {"format": self.format, "quality": quality, "max_width": self.max_width}
+
+
+def encode_image(image: np.ndarray, spec: OutputSpec) -> bytes:
+    """Resize (if needed) and encode a BGR image entirely in memory."""
+    height, width = image.shape[:2]
+    if spec.max_width and width > spec.max_width:
+        new_height = max(1, round(height * spec.max_width / width))
+        image = cv2.resize(image, (spec.max_width, new_height), interpolation=cv2.INTER_AREA)
+
+    if spec.format == "jpeg":
+        params = [cv2.IMWRITE_JPEG_QUALITY, spec.quality]
+    elif spec.format == "webp":
+        params = [cv2.IMWRITE_WEBP_QUALITY, spec.quality]
+    else:
+        params = []
+    ok, encoded = cv2.imencode(spec.extension, image, params)
+    if not ok:
+        raise HTTPException(status_code=500, detail="Could not encode rendered image")
+    return encoded.tobytes()
@@ -0,0 +1,138 @@
+"""
+Content-addressed cache for model analysis results.
+
+Entries are keyed on SHA-256(image bytes) + model id + prompt version, so the
+same photo analysed with the same model and prompt is only sent upstream once.
+An in-memory LRU tier with TTL sits in front of an optional on-disk tier that
+survives restarts.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+def content_hash(data: bytes) -> str:
+    """Hex SHA-256 digest of raw content bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_key(digest: str, model: str, prompt_version: str) -> str:
+    """Build a cache key from a content digest, model id and prompt version."""
+    return f"{digest}:{model}:{prompt_version}"
+
+
+class ResultCache:
+    """Two-tier (memory LRU + optional disk) cache with TTL and hit/miss counters."""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 86400.0,
+                 disk_dir: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - stored_at > self.ttl_seconds
+
+    def _disk_path(self, key: str) -> str:
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.disk_dir, name[:2], f"{name}.json")
+
+    def _remember(self, key: str, value: Any, stored_at: float) -> None:
+        self._entries[key] = (stored_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if not self._expired(stored_at):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        value = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            stored_at, value = value
+            self._remember(key, value, stored_at)
+            self.hits += 1
+            self.disk_hits += 1
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a JSON-serialisable value under key in both tiers."""
+        stored_at = time.time()
+        with self._lock:
+            self._remember(key, value, stored_at)
+        self._write_disk(key, value, stored_at)
+
+    def _read_disk(self, key: str) -> Optional[tuple]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "r") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if record.get("key") != key or self._expired(record.get("stored_at", 0)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return record["stored_at"], record["value"]
+
+    def _write_disk(self, key: str, value: Any, stored_at: float) -> None:
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file and rename so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"key": key, "stored_at": stored_at, "value": value}, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def clear(self) -> None:
+        """Drop the in-memory tier and reset counters (disk entries are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "disk_enabled": bool(self.disk_dir),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
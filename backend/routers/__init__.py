@@ -0,0 +1,12 @@
+"""
+API routes, one APIRouter per area. api.create_app() includes the ones its
+profile serves; a module's job handlers are registered when it is imported,
+so a process only runs the kinds of jobs its routes create.
+
+vision  /explain, /check_ai, /check_damage, /analyze, /damage/estimate
+render  /admin/*, /render-damage-impact, /render/batch, /heatmaps (OpenCV)
+media   /images/similar, /ingest/keyframes (OpenCV)
+jobs    /jobs
+claims  /claims, /analyses/search
+ops     /cache/stats, /metrics, /health
+"""
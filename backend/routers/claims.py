@@ -0,0 +1,161 @@
+"""Claim routes, and record_analysis() for storing finished analyses with their claim."""
+import asyncio
+import sqlite3
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, Body, HTTPException, Query
+
+from claims_store import ANALYSIS_KINDS, FRAUD_RISKS, MAX_PAGE_SIZE, SORT_KEYS, STATUSES
+from hedging import parse_json_object
+from services import analysis_writer, claims_store
+
+router = APIRouter()
+
+
+def record_analysis(claim_id: Optional[str], kind: str, result: Dict, digest: Optional[str] = None,
+                    filename: Optional[str] = None) -> None:
+    """
+    Queue a finished explain, check_ai or damage result to be stored with
+    its claim (nothing without a claim; failed model calls are not stored).
+    The description, reasoning and AI likelihood come from the model's JSON
+    answer; a damage result's severity is its most damaged component.
+    """
+    if claim_id is None:
+        return
+    row = {"claim_id": claim_id, "kind": kind, "image_digest": digest, "filename": filename,
+           "model": result.get("model"), "result": result}
+    if kind == "damage":
+        row["description"] = result.get("narrative") or result["estimated_damage"]
+        row["severity"] = max((item["percentage_damage"] for item in result["estimate"]["items"]),
+                              default=0.0)
+    else:
+        text = result.get("content", result.get("ai_analysis")) or ""
+        if text.startswith("Error:"):
+            return
+        parsed = parse_json_object(text) or {}
+        if kind == "explain":
+            row["description"] = parsed.get("description") or text
+            row["reasoning"] = parsed.get("confidence_reasoning")
+            likelihood = parsed.get("ai_generated_likelihood")
+        else:
+            row["reasoning"] = parsed.get("reasoning") or text
+            likelihood = parsed.get("confidence_score")
+        if isinstance(likelihood, (int, float)) and not isinstance(likelihood, bool):
+            row["ai_likelihood"] = min(1.0, max(0.0, float(likelihood)))
+    analysis_writer.record(row)
+
+
+async def require_claim(claim_id: str) -> None:
+    if await asyncio.to_thread(claims_store.get, claim_id, False) is None:
+        raise HTTPException(status_code=404, detail=f"Claim '{claim_id}' not found")
+
+
+@router.post("/claims", status_code=201)
+async def create_claims(body: Dict = Body(...)):
+    """
+    Store one claim, or many at once as {"claims": [...]} (one transaction).
+    status, severity, ai_likelihood, fraud_risk, holder_name, holder_email,
+    policy_number, vehicle, license_plate, description, estimated_cost and
+    assessor are columns; any other field is kept in the claim's data.
+    """
+    claims = body["claims"] if isinstance(body.get("claims"), list) else [body]
+    try:
+        ids = await asyncio.to_thread(claims_store.add_claims, claims)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except sqlite3.IntegrityError:
+        raise HTTPException(status_code=409, detail="A claim with that id already exists")
+    return {"ids": ids, "created": len(ids)}
+
+
+@router.get("/claims")
+async def list_claims(sort: str = "created_at", order: str = "desc",
+                      limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None,
+                      status: Optional[str] = None, fraud_risk: Optional[str] = None,
+                      holder_email: Optional[str] = None,
+                      min_severity: Optional[float] = None, max_severity: Optional[float] = None,
+                      min_ai_likelihood: Optional[float] = None,
+                      max_ai_likelihood: Optional[float] = None,
+                      created_after: Optional[float] = None, created_before: Optional[float] = None):
+    """
+    One page of claims, newest first by default (sort= created_at, severity
+    or ai_likelihood; order= asc or desc). Pass the returned next_cursor to
+    get the next page; it is null on the last one. Filters combine with AND.
+    """
+    if sort not in SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(SORT_KEYS)}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be asc or desc")
+    if status is not None and status not in STATUSES:
+        raise HTTPException(status_code=400, detail=f"status must be one of {', '.join(STATUSES)}")
+    if fraud_risk is not None and fraud_risk not in FRAUD_RISKS:
+        raise HTTPException(status_code=400, detail=f"fraud_risk must be one of {', '.join(FRAUD_RISKS)}")
+    try:
+        return await asyncio.to_thread(
+            claims_store.page, sort=sort, descending=order == "desc", limit=limit, cursor=cursor,
+            status=status, fraud_risk=fraud_risk, holder_email=holder_email,
+            min_severity=min_severity, max_severity=max_severity,
+            min_ai_likelihood=min_ai_likelihood, max_ai_likelihood=max_ai_likelihood,
+            created_after=created_after, created_before=created_before)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/claims/stats")
+async def claim_counts():
+    """Claims by status and fraud risk, for the dashboard tiles."""
+    return await asyncio.to_thread(claims_store.counts)
+
+
+@router.get("/claims/{claim_id}")
+async def get_claim(claim_id: str):
+    """The claim with every stored analysis of it, oldest first."""
+    claim = await asyncio.to_thread(claims_store.get, claim_id)
+    if claim is None:
+        raise HTTPException(status_code=404, detail=f"Claim '{claim_id}' not found")
+    return claim
+
+
+@router.patch("/claims/{claim_id}")
+async def update_claim(claim_id: str, changes: Dict = Body(...)):
+    """Change claim fields, e.g. {"status": "Approved", "assessor": "..."}; data keys are merged."""
+    try:
+        claim = await asyncio.to_thread(claims_store.update, claim_id, changes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if claim is None:
+        raise HTTPException(status_code=404, detail=f"Claim '{claim_id}' not found")
+    return claim
+
+
+@router.post("/claims/{claim_id}/analyses", status_code=201)
+async def add_claim_analyses(claim_id: str, analyses: List[Dict] = Body(...)):
+    """
+    Store analysis results computed elsewhere (e.g. by the frontend), in one
+    transaction: [{"kind", "description", "reasoning", "ai_likelihood",
+    "severity", "model", "result"}, ...].
+    """
+    await require_claim(claim_id)
+    for analysis in analyses:
+        if analysis.get("kind") not in ANALYSIS_KINDS:
+            raise HTTPException(status_code=400, detail=f"kind must be one of {', '.join(ANALYSIS_KINDS)}")
+        analysis["claim_id"] = claim_id
+    written = await asyncio.to_thread(claims_store.add_analyses, analyses)
+    return {"claim_id": claim_id, "created": written}
+
+
+@router.get("/analyses/search")
+async def search_analyses(q: str, limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+                          cursor: Optional[str] = None, claim_id: Optional[str] = None,
+                          kind: Optional[str] = None):
+    """
+    Full-text search over the models' descriptions and reasoning, best match
+    first. Every word must match (stemmed, so "dented" finds "dent"), and a
+    trailing * matches a prefix. Results carry a snippet with the matches in
+    [brackets] and are paginated with next_cursor like /claims.
+    """
+    try:
+        return await asyncio.to_thread(claims_store.search, q, limit=limit, cursor=cursor,
+                                       claim_id=claim_id, kind=kind)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,142 @@
+"""Background job routes: queue a job, follow its status and fetch its result."""
+import asyncio
+import json
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from fastapi.responses import Response
+
+from claims_store import ANALYSIS_KINDS
+from jobs import public_job
+from routers.claims import record_analysis, require_claim
+from scheduler import PRIORITIES
+from services import job_blobs, job_queue
+from sse import event_stream_response, sse_event
+
+router = APIRouter()
+
+# Job kind -> coroutine(kind, priority, **options) returning the new job's (payload, input
+# hash), registered next to the kind's handler by the router that serves it
+JobInput = Callable[..., Awaitable[Tuple[Dict, str]]]
+job_inputs: Dict[str, JobInput] = {}
+
+
+def job_input(*kinds: str) -> Callable[[JobInput], JobInput]:
+    def register(fn: JobInput) -> JobInput:
+        for kind in kinds:
+            job_inputs[kind] = fn
+        return fn
+    return register
+
+
+async def enqueue_job(kind: str, priority: str = "bulk", claim_id: Optional[str] = None,
+                      **options) -> Dict:
+    """
+    Validate and enqueue a job; returns the public job with its status URLs.
+    options (file, batch, tasks, damage_data) go to the kind's job input.
+    """
+    if priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"priority must be one of {', '.join(PRIORITIES)}")
+    build = job_inputs.get(kind)
+    if build is None:
+        raise HTTPException(status_code=400,
+                            detail=f"Unknown job kind '{kind}' (use {', '.join(job_inputs)})")
+    if claim_id is not None:
+        if kind not in ANALYSIS_KINDS:
+            raise HTTPException(status_code=400, detail=f"'{kind}' jobs cannot be stored with a claim")
+        await require_claim(claim_id)
+    payload, input_hash = await build(kind, priority, **options)
+
+    if claim_id is not None:
+        payload["claim_id"] = claim_id
+        # Jobs are deduplicated by input hash, and only the job's own claim gets the result
+        # stored, so the same image for another claim needs a job of its own. Its model calls
+        # are still answered by the result cache or coalesced with the other claim's.
+        input_hash = f"{input_hash}|claim={claim_id}"
+    job, created = await job_queue.submit(kind, payload, input_hash)
+    job = await job_queue.get(job["id"])
+    if claim_id is not None and created and job["status"] == "succeeded":
+        # Answered from an earlier job's stored result, so no handler runs to record it
+        record_analysis(claim_id, kind, job["result"], payload.get("digest"), payload.get("filename"))
+    body = public_job(job)
+    body.update({"deduplicated": not created, "status_url": f"/jobs/{job['id']}",
+                 "events_url": f"/jobs/{job['id']}/events"})
+    return body
+
+
+async def submit_job(kind: str, **options) -> Response:
+    """enqueue_job() as a 202 response pointing at the job."""
+    body = await enqueue_job(kind, **options)
+    return Response(content=json.dumps(body), status_code=202, media_type="application/json",
+                    headers={"Location": body["status_url"]})
+
+
+@router.post("/jobs")
+async def create_job(kind: str, file: Optional[UploadFile] = File(None),
+                     batch: Optional[str] = Form(None), assessment: Optional[str] = Form(None),
+                     priority: str = "bulk", claim_id: Optional[str] = None):
+    """
+    Queue an explain, check_ai, damage or render job and return at once (202).
+
+    explain/check_ai take the image as multipart "file"; render takes a
+    /render/batch body as the JSON form field "batch"; damage takes an
+    optional assessment as the JSON form field "assessment" and adds a model
+    narrative to the local estimate. Jobs call upstream models at ?priority=
+    (bulk by default). Poll GET /jobs/{id} or follow GET /jobs/{id}/events
+    until the status is succeeded or failed. explain, check_ai and damage
+    results are stored with ?claim_id= when they complete. Only the kinds of
+    the routes this process serves are accepted.
+    """
+    return await submit_job(kind, file=file, batch=json_form_field("batch", batch),
+                            damage_data=json_form_field("assessment", assessment), priority=priority,
+                            claim_id=claim_id)
+
+
+def json_form_field(name: str, value: Optional[str]) -> Optional[Dict]:
+    if value is None:
+        return None
+    try:
+        parsed = json.loads(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be JSON")
+    if not isinstance(parsed, dict):
+        raise HTTPException(status_code=400, detail=f"{name} must be a JSON object")
+    return parsed
+
+
+async def find_job(job_id: str) -> Dict:
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    return public_job(await find_job(job_id))
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-sent "status" events on every state change, ending with the finished job."""
+    await find_job(job_id)
+
+    async def event_stream():
+        async for job in job_queue.watch(job_id):
+            yield sse_event("status", public_job(job))
+
+    return event_stream_response(event_stream())
+
+
+@router.get("/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    """The job's result: the zip for render jobs, the JSON result otherwise (409 until done)."""
+    job = await find_job(job_id)
+    if job["status"] != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    result = job["result"]
+    if "archive" in result:
+        archive = await asyncio.to_thread(job_blobs.get, result["archive"])
+        return Response(content=archive, media_type=result["media_type"],
+                        headers={"Content-Disposition": f'attachment; filename="damage_renders_{job_id[:12]}.zip"'})
+    return result
@@ -0,0 +1,133 @@
+"""
+Media routes: near-duplicate image search and keyframe ingest of
+walk-around videos and photo sets. Both decode images with OpenCV.
+"""
+import asyncio
+import base64
+import os
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, File, HTTPException, Query, UploadFile
+
+from ingest import ingest_upload
+from keyframes import KeyframeSelector, feed_image, feed_video, is_video
+from metrics import span
+from phash_index import MAX_DISTANCE, image_hashes
+from result_cache import content_hash
+from routers.claims import record_analysis, require_claim
+from services import UPLOAD_DIR, get_phash_index
+from vision import run_check_ai, run_vision_task, vision_image_from_bytes
+
+router = APIRouter()
+
+
+# --- Near-Duplicate Images ---
+@router.post("/images/similar")
+async def similar_images(file: UploadFile = File(...), k: int = Query(6, ge=0, le=MAX_DISTANCE),
+                         limit: int = Query(20, ge=1, le=1000), add: bool = False):
+    """
+    Indexed uploads whose perceptual hash is within Hamming distance k of
+    this image (nearest first), e.g. a photo recycled across claims.
+    With ?add=true the image is indexed too.
+    """
+    with span("upload"):
+        upload = await ingest_upload(file, upload_dir=UPLOAD_DIR, encode_base64=False, keep_raw=True)
+    with span("phash"):
+        hashes = await asyncio.to_thread(image_hashes, upload.raw)
+    if hashes is None:
+        raise HTTPException(status_code=400, detail="Uploaded file is not a decodable image")
+    p, d = hashes
+    phash_index = await asyncio.to_thread(get_phash_index)  # loaded on first use unless preloaded
+    matches = [match for match in phash_index.search(p, k, limit + 1, d=d)
+               if match["digest"] != upload.sha256][:limit]
+    filenames = await asyncio.to_thread(phash_index.filenames, [m["digest"] for m in matches])
+    for match in matches:
+        match["filename"] = filenames.get(match["digest"])
+    canonical = None
+    if add:
+        canonical = await asyncio.to_thread(phash_index.add, upload.sha256, p, d, file.filename)
+    return {"filename": file.filename, "digest": upload.sha256, "phash": f"{p:016x}",
+            "dhash": f"{d:016x}", "k": k, "matches": matches, "canonical": canonical}
+
+
+# --- Keyframe Ingest ---
+# Walk-around videos and photo bursts: only a few keyframes per view go to the vision models
+KEYFRAME_MAX_VIDEO_BYTES = int(float(os.getenv("KEYFRAME_MAX_VIDEO_MB", "200")) * 1024 * 1024)
+KEYFRAME_SAMPLE_FPS = float(os.getenv("KEYFRAME_SAMPLE_FPS", "3"))
+KEYFRAME_MAX_SECONDS = float(os.getenv("KEYFRAME_MAX_SECONDS", "300"))
+
+
+async def analyze_keyframe(entry: Dict, jpeg: bytes, claim_id: Optional[str] = None) -> None:
+    """Run explain and check_ai on one keyframe and attach the results to its entry."""
+    filename = f"{entry['source']}#{entry['frame']}"
+    image = await vision_image_from_bytes(jpeg, entry["digest"], filename=filename)
+    explain, check_ai = await asyncio.gather(run_vision_task(image, "explain"), run_check_ai(image))
+    entry["explain"] = {"content": explain["text"], "model": explain["model"],
+                        "hedged": explain["hedged"], "cached": explain["cached"]}
+    entry["check_ai"] = {"ai_analysis": check_ai["text"], "model": check_ai["model"],
+                         "hedged": check_ai["hedged"], "cached": check_ai["cached"],
+                         "screening": check_ai["screening"], "fallback": check_ai["fallback"]}
+    record_analysis(claim_id, "explain", entry["explain"], entry["digest"], filename)
+    record_analysis(claim_id, "check_ai", entry["check_ai"], entry["digest"], filename)
+
+
+@router.post("/ingest/keyframes")
+async def ingest_keyframes(files: List[UploadFile] = File(...), per_view: int = Query(2, ge=1, le=10),
+                           max_views: int = Query(6, ge=1, le=24), analyze: bool = False,
+                           include_images: bool = False, claim_id: Optional[str] = None):
+    """
+    Keyframes of a walk-around video and/or a photo set: up to per_view sharp,
+    well-exposed, distinct frames for each view of the vehicle, in upload
+    order. With ?analyze=true only these keyframes are sent to the explain
+    and check_ai models, and the results come back with them (and are
+    stored with ?claim_id=).
+    """
+    if claim_id is not None:
+        await require_claim(claim_id)
+    started = time.perf_counter()
+    selector = KeyframeSelector(per_view=per_view, max_views=max_views)
+    with tempfile.TemporaryDirectory(prefix="keyframes-") as scratch:
+        for file in files:
+            if is_video(file.filename, file.content_type):
+                # Videos are streamed to a scratch file (cv2 decodes from a path), never held in memory
+                with span("upload"):
+                    upload = await ingest_upload(file, max_bytes=KEYFRAME_MAX_VIDEO_BYTES, persist=True,
+                                                 upload_dir=scratch, encode_base64=False)
+                with span("keyframes"):
+                    try:
+                        await asyncio.to_thread(feed_video, selector, upload.saved_path, file.filename,
+                                                KEYFRAME_SAMPLE_FPS, KEYFRAME_MAX_SECONDS)
+                    except ValueError as e:
+                        raise HTTPException(status_code=400, detail=f"{file.filename}: {str(e)}")
+                os.remove(upload.saved_path)
+            else:
+                with span("upload"):
+                    upload = await ingest_upload(file, upload_dir=UPLOAD_DIR, encode_base64=False,
+                                                 keep_raw=True)
+                with span("keyframes"):
+                    decoded = await asyncio.to_thread(feed_image, selector, upload.raw, file.filename)
+                if not decoded:
+                    raise HTTPException(status_code=400,
+                                        detail=f"{file.filename}: not a decodable image or video")
+
+    picked = selector.select()
+    keyframes = []
+    for view, candidate in picked:
+        entry = {"view": view, **candidate.describe(), "digest": content_hash(candidate.jpeg)}
+        if include_images:
+            entry["data_url"] = "data:image/jpeg;base64," + base64.b64encode(candidate.jpeg).decode("ascii")
+        keyframes.append(entry)
+    if analyze:
+        await asyncio.gather(*(analyze_keyframe(entry, candidate.jpeg, claim_id)
+                               for entry, (_, candidate) in zip(keyframes, picked)))
+    return {
+        "files": len(files),
+        **selector.report(),
+        "selected": len(keyframes),
+        # explain + check_ai per frame that would otherwise have been sent
+        "model_calls_avoided": 2 * (selector.scored - len(keyframes)),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        "keyframes": keyframes,
+    }
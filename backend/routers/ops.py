@@ -0,0 +1,78 @@
+"""Operational routes: service counters, Prometheus metrics and the health check."""
+import anyio
+from fastapi import APIRouter, Request
+from fastapi.responses import Response
+
+from metrics import CONTENT_TYPE, REGISTRY
+from services import CACHES, SERVICE_STATS, job_queue, openrouter
+
+router = APIRouter()
+
+
+@router.get("/cache/stats")
+def cache_stats():
+    """Counters of every service this process has built (caches, clients, jobs, local models)."""
+    return {name: stats() for name, stats in SERVICE_STATS.items()}
+
+
+# --- Metrics (read from the stats() counters at scrape time) ---
+def _cache_samples():
+    for name, cache in list(CACHES.items()):
+        stats = cache.stats()
+        yield (name, "hit"), stats["hits"] + stats.get("disk_hits", 0)
+        yield (name, "miss"), stats["misses"]
+
+
+def _lane_samples(field: str):
+    def samples():
+        for model, lane in openrouter.scheduler.stats().items():
+            yield (model,), lane[field]
+    return samples
+
+
+def _queue_depth_samples():
+    for model, lane in openrouter.scheduler.stats().items():
+        for priority, depth in lane["queue_depth"].items():
+            yield (model, priority), depth
+
+
+def _threadpool_samples():
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    yield ("borrowed",), limiter.borrowed_tokens
+    yield ("total",), limiter.total_tokens
+
+
+def _ai_screen_samples():
+    # Only once a request has built the screener
+    if "ai_screener" in SERVICE_STATS:
+        for decision, count in SERVICE_STATS["ai_screener"]()["decisions"].items():
+            yield (decision,), count
+
+
+REGISTRY.callback("cache_lookups_total", "Cache lookups by cache and outcome", ("cache", "outcome"),
+                  _cache_samples, kind="counter")
+REGISTRY.callback("upstream_in_flight", "Admitted upstream calls per model", ("model",),
+                  _lane_samples("in_flight"))
+REGISTRY.callback("upstream_concurrency_limit", "Adaptive (AIMD) concurrency limit per model",
+                  ("model",), _lane_samples("limit"))
+REGISTRY.callback("upstream_queue_depth", "Calls waiting for admission", ("model", "priority"),
+                  _queue_depth_samples)
+REGISTRY.callback("jobs", "Jobs by status", ("status",),
+                  lambda: [((status,), count) for status, count in job_queue.store.counts().items()])
+REGISTRY.callback("jobs_running", "Jobs being run by this process", (),
+                  lambda: [((), job_queue.stats()["running"])])
+REGISTRY.callback("ai_screen_decisions_total", "Local AI screen decisions", ("decision",),
+                  _ai_screen_samples, kind="counter")
+REGISTRY.callback("threadpool_tokens", "Threadpool slots for sync endpoints", ("state",),
+                  _threadpool_samples)
+
+
+@router.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus text exposition of the metrics registry."""
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+@router.get("/health")
+def health_check(request: Request):
+    return {"status": "healthy", "message": "API is running", "profile": request.app.state.profile}
@@ -0,0 +1,558 @@
+"""
+Render routes: the admin overlay endpoints, /render-damage-impact,
+/render/batch, editable heat fields (/heatmaps) and the render job kind.
+These draw with OpenCV on base car views decoded at startup, and batches
+render on a process pool.
+"""
+import asyncio
+import json
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, BackgroundTasks, Body, File, Header, HTTPException, Query, UploadFile
+from fastapi.responses import Response
+
+from base_views import VIEWS, BaseViewCache
+from batch_renderer import SIDES, STYLES, BatchRenderer, build_zip, expand_items, marker_side, render_task
+from cost_estimator import assessment_components
+from damage_renderer import RENDERER_VERSION, composite_markers, damage_markers
+from heatfield import HEATFIELD_VERSION, HeatField, HeatFieldStore
+from ingest import ingest_upload
+from metrics import REGISTRY, marker_bucket, record_span, render_latency, span
+from render_cache import RenderCache, etag_for, etag_matches, render_key
+from render_output import OutputSpec, encode_image
+from routers.jobs import job_input, submit_job
+from services import BASE_DIR, CACHES, IMAGES_DIR, PROJECT_ROOT, SERVICE_STATS, UPLOAD_DIR, job_blobs, job_queue
+
+# Base car views for the render endpoints, decoded once (loaded at startup)
+base_views = BaseViewCache(IMAGES_DIR)
+
+# Rendered overlays, keyed on a digest of the render inputs (RENDER_CACHE_MAX_MB caps disk use)
+render_cache = RenderCache(
+    os.getenv("RENDER_CACHE_DIR", os.path.join(PROJECT_ROOT, "temp_damage_output")),
+    max_bytes=int(float(os.getenv("RENDER_CACHE_MAX_MB", "256")) * 1024 * 1024),
+)
+
+# Process pool for /render/batch (RENDER_WORKERS, default one per core)
+batch_renderer = BatchRenderer(IMAGES_DIR)
+RENDER_BATCH_MAX_TASKS = int(os.getenv("RENDER_BATCH_MAX_TASKS", "64"))
+RENDER_JOB_MAX_TASKS = int(os.getenv("RENDER_JOB_MAX_TASKS", "1024"))
+
+# Heat fields being edited, kept in this process's memory (HEATMAP_MAX_FIELDS)
+heat_fields = HeatFieldStore.from_env()
+
+SERVICE_STATS.update({"render_cache": render_cache.stats, "batch_renderer": batch_renderer.stats,
+                      "heat_fields": heat_fields.stats})
+CACHES["render"] = render_cache
+REGISTRY.callback("render_batch_tasks_total", "Batch render tasks by outcome", ("outcome",),
+                  lambda: [(("rendered",), batch_renderer.rendered), (("failed",), batch_renderer.failed)],
+                  kind="counter")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    base_views.reload()
+    yield
+    batch_renderer.shutdown()
+
+
+router = APIRouter(lifespan=lifespan)
+
+
+# --- Utility: Admin Access Verification (Placeholder) ---
+def verify_admin_access():
+    """Simulated admin verification function. Replace with actual logic."""
+    return True
+
+
+# --- Render Output Helpers ---
+def render_image_response(key: str, data: bytes, spec: OutputSpec, filename_stem: str) -> Response:
+    # no-cache: clients keep the image but revalidate with If-None-Match (cheap 304)
+    return Response(content=data, media_type=spec.media_type, headers={
+        "ETag": etag_for(key),
+        "Cache-Control": "no-cache",
+        "Vary": "Accept",
+        "Content-Disposition": f'attachment; filename="{filename_stem}{spec.extension}"',
+    })
+
+
+def cached_render_response(key: str, if_none_match: Optional[str], spec: OutputSpec,
+                           filename_stem: str) -> Optional[Response]:
+    """304 if the client already has this render, the cached bytes if we do, else None."""
+    if etag_matches(if_none_match, key):
+        return Response(status_code=304, headers={"ETag": etag_for(key), "Vary": "Accept"})
+    data = render_cache.get(key + spec.extension)
+    if data is not None:
+        return render_image_response(key, data, spec, filename_stem)
+    return None
+
+
+def render_markers(image, markers) -> None:
+    """composite_markers() timed as the "render" span and by marker count."""
+    start = time.perf_counter()
+    composite_markers(image, markers)
+    seconds = time.perf_counter() - start
+    record_span("render", seconds)
+    render_latency.observe(seconds, markers=marker_bucket(len(markers)))
+
+
+def store_render(key: str, image, spec: OutputSpec, filename_stem: str,
+                 background_tasks: BackgroundTasks) -> Response:
+    """Encode in memory, respond right away and write the cache entry after the response."""
+    with span("encode_image"):
+        data = encode_image(image, spec)
+    background_tasks.add_task(render_cache.put, key + spec.extension, data)
+    return render_image_response(key, data, spec, filename_stem)
+
+
+# --- API Endpoint ---
+@router.post("/admin/render-damage")
+def render_damage_overlay(
+    damage_data: Dict,
+    background_tasks: BackgroundTasks,
+    side: str = "left",  # "left" or "right"
+    output_format: Optional[str] = Query(None, alias="format"),  # png, jpeg or webp
+    quality: Optional[int] = None,
+    max_width: Optional[int] = None,
+    thumbnail: bool = False,
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Admin-only endpoint to render a damage overlay on a car image.
+    
+    Expected damage_data format:
+    {
+        "components": [
+            {
+                "component": "front_left_door",
+                "is_damaged": true,
+                "percentage_damage": 12.5,
+                "bbox": [200, 250, 150, 100]
+            },
+            ...
+        ],
+        "overall_damage_severity": "MEDIUM"
+    }
+
+    The image format is taken from ?format= or the Accept header (PNG by
+    default); ?quality=, ?max_width= and ?thumbnail=true shrink the output.
+    """
+
+    # --- 1. Verify Admin Access ---
+    if not verify_admin_access():
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    spec = OutputSpec.negotiate(output_format, accept, quality, max_width, thumbnail)
+
+    try:
+        # --- 2. Load Base Image (preloaded, read-only) ---
+        try:
+            base_view = base_views.get("side")
+        except KeyError:
+            raise HTTPException(status_code=404, detail="Base car image not found")
+
+        # --- 3. Define Constants ---
+        MIN_RING_RADIUS = 100
+        DAMAGE_SCALING_FACTOR = 10.0
+        GLOBAL_MARKER_COLOR = (0, 0, 255)  # Red
+
+        # --- 4. Extract Components ---
+        if "components" in damage_data:
+            components = damage_data.get("components", [])
+        elif "car_side_damage_assessment" in damage_data:
+            components = damage_data["car_side_damage_assessment"].get("sections_of_interest", [])
+        else:
+            components = []
+
+        # --- 5. Serve From Cache When Possible ---
+        key = render_key(endpoint="admin-render-damage", view="side", side=side,
+                         components=components, base=[base_view.path, base_view.mtime],
+                         renderer=RENDERER_VERSION, output=spec.key_parts())
+        filename_stem = f'damage_overlay_{side}_side'
+        cached_response = cached_render_response(key, if_none_match, spec, filename_stem)
+        if cached_response is not None:
+            return cached_response
+
+        # --- 6. Render Damage Visuals (mirrored variant is precomputed) ---
+        result_image = base_view.pixels(mirrored=(side == "right")).copy()
+        img_width = result_image.shape[1]
+        markers = damage_markers(components, img_width, side, MIN_RING_RADIUS,
+                                 DAMAGE_SCALING_FACTOR, GLOBAL_MARKER_COLOR)
+        render_markers(result_image, markers)
+
+        # --- 7. Encode In Memory and Return Result ---
+        return store_render(key, result_image, spec, filename_stem, background_tasks)
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error rendering damage overlay: {str(e)}")
+
+@router.post("/admin/analyze-damage-components")
+async def analyze_damage_components(file: UploadFile = File(...)):
+    """
+    Admin-only endpoint to analyze uploaded image and extract damage components
+    Returns detailed damage assessment with component-level breakdown
+    """
+    # Verify admin access
+    if not verify_admin_access():
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    # Stream the upload through the size check (and to disk if PERSIST_UPLOADS is set)
+    await ingest_upload(file, upload_dir=UPLOAD_DIR, encode_base64=False)
+
+    try:
+        # Load the predefined damage components from side.json
+        json_path = os.path.join(BASE_DIR, 'side.json')
+        if os.path.exists(json_path):
+            with open(json_path, 'r') as f:
+                predefined_data = json.load(f)
+            
+            # Return the predefined damage assessment
+            return {
+                "filename": file.filename,
+                "damage_assessment": predefined_data,
+                "success": True,
+                "source": "predefined_side_json"
+            }
+        else:
+            # Fallback: Create a basic damage assessment
+            fallback_assessment = {
+                "car_side_damage_assessment": {
+                    "sections_of_interest": [
+                        {
+                            "component": "front_left_door",
+                            "is_damaged": True,
+                            "percentage_damage": 15.0,
+                            "bbox": [200, 250, 150, 100],
+                            "damage_description": "Moderate damage to front left door"
+                        },
+                        {
+                            "component": "front_wheel",
+                            "is_damaged": True,
+                            "percentage_damage": 25.0,
+                            "bbox": [150, 320, 80, 80],
+                            "damage_description": "Significant damage to front wheel"
+                        }
+                    ],
+                    "overall_damage_severity": "MEDIUM"
+                }
+            }
+            
+            return {
+                "filename": file.filename,
+                "damage_assessment": fallback_assessment,
+                "success": True,
+                "source": "fallback_assessment"
+            }
+
+    except Exception as e:
+        return {
+            "filename": file.filename,
+            "error": str(e),
+            "success": False
+        }
+
+
+@router.get("/admin/damage-components")
+def get_damage_components():
+    """
+    Admin-only endpoint to get predefined damage components from side.json
+    """
+    # Verify admin access
+    if not verify_admin_access():
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    try:
+        json_path = os.path.join(BASE_DIR, 'side.json')
+        if not os.path.exists(json_path):
+            raise HTTPException(status_code=404, detail="Damage components file not found")
+            
+        with open(json_path, 'r') as f:
+            data = json.load(f)
+            
+        return {
+            "damage_components": data,
+            "available_sides": ["left", "right"],
+            "component_types": [
+                "front_left_door", "front_right_door",
+                "front_left_window", "front_right_window", 
+                "rear_left_door", "rear_right_door",
+                "rear_left_window", "rear_right_window",
+                "front_wheel", "rear_wheel"
+            ]
+        }
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error loading damage components: {str(e)}")
+
+
+@router.post("/render-damage-impact")
+def render_damage_impact(
+    damage_data: dict,
+    background_tasks: BackgroundTasks,
+    output_format: Optional[str] = Query(None, alias="format"),  # png, jpeg or webp
+    quality: Optional[int] = None,
+    max_width: Optional[int] = None,
+    thumbnail: bool = False,
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Render damage impact visualization using side_impact.py logic
+    Takes damage assessment data and generates impact visualization
+    (output format negotiated as for /admin/render-damage)
+    """
+    spec = OutputSpec.negotiate(output_format, accept, quality, max_width, thumbnail)
+    try:
+        # Extract damage data from the request
+        car_side_damage = damage_data.get("car_side_damage_assessment", {})
+        sections = car_side_damage.get("sections_of_interest", [])
+        
+        if not sections:
+            raise HTTPException(status_code=400, detail="No damage sections provided")
+        
+        # Load the base car image (side view) from the preloaded cache; its outline
+        # mask is computed once at load time
+        try:
+            base_view = base_views.get("side")
+        except KeyError:
+            raise HTTPException(status_code=404, detail="Base car image not found")
+
+        if not base_view.has_outline:
+            raise HTTPException(status_code=500, detail="No car outline found in image")
+        
+        # Configuration (from side_impact.py)
+        MIN_RING_RADIUS = 24
+        DAMAGE_SCALING_FACTOR = 100.0
+        GLOBAL_MARKER_COLOR = (0, 0, 255)  # Red in BGR
+        
+        # Same assessment -> same key in every process, so repeat renders are served from disk
+        key = render_key(endpoint="render-damage-impact", view="side", side="left",
+                         components=sections, base=[base_view.path, base_view.mtime],
+                         renderer=RENDERER_VERSION, output=spec.key_parts())
+        filename_stem = f"damage_impact_{key[:16]}"
+        cached_response = cached_render_response(key, if_none_match, spec, filename_stem)
+        if cached_response is not None:
+            return cached_response
+        
+        # Create result image
+        result_image = base_view.image.copy()
+        
+        # Draw gradient circles for the left-side damage sections
+        markers = damage_markers(sections, result_image.shape[1], "left", MIN_RING_RADIUS,
+                                 DAMAGE_SCALING_FACTOR, GLOBAL_MARKER_COLOR)
+        render_markers(result_image, markers)
+        
+        # Encode in memory and return it; the render cache is filled after the response
+        return store_render(key, result_image, spec, filename_stem, background_tasks)
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating damage impact: {str(e)}")
+
+
+
+def expand_batch(batch: Dict) -> List[Dict]:
+    """Validate a /render/batch body and expand it into render tasks (400 if malformed)."""
+    items = batch.get("items")
+    if not isinstance(items, list) or not items:
+        raise HTTPException(status_code=400, detail="items must be a non-empty list")
+    try:
+        return expand_items(items)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def render_batch_archive(batch: Dict, tasks: List[Dict]) -> Tuple[bytes, List[Dict], Dict[str, bytes]]:
+    """
+    Render a batch and zip it. Returns (zip bytes, manifest, new renders by
+    cache key); storing the new renders in the render cache is up to the caller.
+    """
+    spec = OutputSpec.negotiate(batch.get("format"), None, batch.get("quality"),
+                                batch.get("max_width"), bool(batch.get("thumbnail")))
+
+    # --- 1. Resolve Keys and Serve Cache Hits (same keys as the single-image endpoints) ---
+    manifest, rendered, pending = [], {}, {}
+    for task in tasks:
+        entry = {k: task[k] for k in ("id", "view", "side", "style", "variant")}
+        entry["file"] = task["name"] + spec.extension
+        manifest.append(entry)
+        try:
+            base_view = base_views.get(task["view"], task["variant"])
+        except KeyError:
+            entry["error"] = f"Base image for view '{task['view']}' not found"
+            continue
+        key = render_key(endpoint=STYLES[task["style"]][2], view=task["view"],
+                         side=marker_side(task["view"], task["side"]), components=task["components"],
+                         base=[base_view.path, base_view.mtime], renderer=RENDERER_VERSION,
+                         output=spec.key_parts())
+        entry["etag"] = etag_for(key)
+        if key in rendered or key in pending:
+            continue
+        data = render_cache.get(key + spec.extension)
+        if data is not None:
+            rendered[key] = data
+        else:
+            pending[key] = task
+
+    # --- 2. Render Misses in Parallel on the Process Pool ---
+    loop = asyncio.get_running_loop()
+    pool = batch_renderer.pool() if pending else None
+    with span("render_batch"):
+        results = await asyncio.gather(
+            *(loop.run_in_executor(pool, render_task, task, spec) for task in pending.values()),
+            return_exceptions=True,
+        )
+    errors, new_renders = {}, {}
+    for key, result in zip(pending, results):
+        if isinstance(result, BrokenProcessPool):
+            # A worker died; start a fresh pool on the next batch
+            batch_renderer.shutdown()
+        if isinstance(result, Exception):
+            errors[key] = str(result) or type(result).__name__
+            continue
+        rendered[key] = new_renders[key + spec.extension] = result
+    batch_renderer.batches += 1
+    batch_renderer.rendered += len(pending) - len(errors)
+    batch_renderer.failed += len(errors)
+
+    # --- 3. Package Results ---
+    files = []
+    for entry in manifest:
+        key = entry.get("etag", "").strip('"')
+        if key in errors:
+            entry["error"] = errors[key]
+        if "error" in entry:
+            del entry["file"]
+            continue
+        entry["cached"] = key not in pending
+        files.append((entry["file"], rendered[key]))
+    return build_zip(files, manifest), manifest, new_renders
+
+
+@router.post("/render/batch")
+async def render_batch(batch: Dict, background_tasks: BackgroundTasks):
+    """
+    Render many assessments and views in one call and return them as a zip.
+
+    Expected body:
+    {
+        "items": [
+            {"id": "claim-42", "damage_data": {...}, "views": ["side", "front"],
+             "sides": ["left", "right"], "style": "impact", "variant": "plain"},
+            ...
+        ],
+        "format": "webp", "quality": 80, "max_width": 800, "thumbnail": false
+    }
+
+    The zip holds <id>/<view>[_<side>].<ext> per render plus manifest.json,
+    so ids must be unique (400 otherwise); a render that fails is listed in the manifest with its error. Batches
+    above RENDER_BATCH_MAX_TASKS renders are queued as a render job instead
+    (202 with the job; download the zip from /jobs/{id}/result).
+    """
+    tasks = expand_batch(batch)
+    if len(tasks) > RENDER_BATCH_MAX_TASKS:
+        return await submit_job("render", batch=batch, tasks=tasks)
+
+    archive, _, new_renders = await render_batch_archive(batch, tasks)
+    for name, data in new_renders.items():
+        background_tasks.add_task(render_cache.put, name, data)
+    return Response(content=archive, media_type="application/zip",
+                    headers={"Content-Disposition": 'attachment; filename="damage_renders.zip"'})
+
+# --- Heat Fields ---
+def find_heat_field(field_id: str) -> HeatField:
+    field = heat_fields.get(field_id)
+    if field is None:
+        raise HTTPException(status_code=404, detail="Heat field not found (it may have been evicted)")
+    return field
+
+
+@router.post("/heatmaps", status_code=201)
+def create_heat_field(damage_data: Dict, view: str = "side", side: str = "left"):
+    """
+    Build the damage heat field of an assessment (the render endpoints' body)
+    over the filled base image of a view, for editing. Change components with
+    PATCH /heatmaps/{id} and fetch the image from image_url after each change.
+    """
+    if view not in VIEWS:
+        raise HTTPException(status_code=400, detail=f"view must be one of {', '.join(VIEWS)}")
+    if side not in SIDES:
+        raise HTTPException(status_code=400, detail=f"side must be one of {', '.join(SIDES)}")
+    try:
+        base_view = base_views.get(view, "filled")
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Filled base image for view '{view}' not found")
+    side = marker_side(view, side)
+    with span("heatfield"):
+        field = HeatField(base_view.pixels(mirrored=(side == "right")), assessment_components(damage_data),
+                          side)
+    field_id = heat_fields.add(field)
+    return {"id": field_id, "view": view, "side": side, "width": field.width, "height": field.height,
+            **field.stats(), "image_url": f"/heatmaps/{field_id}/image"}
+
+
+@router.patch("/heatmaps/{field_id}")
+def update_heat_field(field_id: str, changes: List[Dict] = Body(...)):
+    """
+    Edit components of a heat field: [{"component": "front_wheel",
+    "percentage_damage": 35}, ...] (bbox can change too; a new name adds a
+    component). Only the kernels' regions are recomputed; dirty lists the
+    redrawn [x0, y0, x1, y1] rectangles.
+    """
+    field = find_heat_field(field_id)
+    for change in changes:
+        if not isinstance(change.get("component"), str):
+            raise HTTPException(status_code=400, detail="every change needs a component name")
+    with span("heatfield"):
+        dirty = field.update(changes)
+    return {"id": field_id, "revision": field.revision, "dirty": [list(rect) for rect in dirty]}
+
+
+@router.get("/heatmaps/{field_id}/image")
+def heat_field_image(
+    field_id: str,
+    output_format: Optional[str] = Query(None, alias="format"),  # png, jpeg or webp
+    quality: Optional[int] = None,
+    max_width: Optional[int] = None,
+    thumbnail: bool = False,
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None)
+):
+    """The heat field blended over its view (output format negotiated as for /admin/render-damage)."""
+    spec = OutputSpec.negotiate(output_format, accept, quality, max_width, thumbnail)
+    field = find_heat_field(field_id)
+    with field.lock:
+        key = render_key(endpoint="heatmap", field=field_id, revision=field.revision,
+                         heatfield=HEATFIELD_VERSION, output=spec.key_parts())
+        if etag_matches(if_none_match, key):
+            return Response(status_code=304, headers={"ETag": etag_for(key), "Vary": "Accept"})
+        with span("encode_image"):
+            data = encode_image(field.image, spec)
+    return render_image_response(key, data, spec, f"heatmap_{field_id[:12]}")
+
+# --- Jobs ---
+@job_input("render")
+async def render_job_input(kind: str, priority: str, batch: Optional[Dict] = None,
+                           tasks: Optional[List[Dict]] = None, **_) -> Tuple[Dict, str]:
+    if batch is None:
+        raise HTTPException(status_code=400, detail="'render' jobs need a batch body")
+    tasks = tasks if tasks is not None else expand_batch(batch)
+    if len(tasks) > RENDER_JOB_MAX_TASKS:
+        raise HTTPException(status_code=413,
+                            detail=f"Batch expands to {len(tasks)} renders (max {RENDER_JOB_MAX_TASKS})")
+    return {"batch": batch}, render_key(endpoint="render-batch", batch=batch, renderer=RENDERER_VERSION)
+
+
+@job_queue.handler("render")
+async def render_job(payload: Dict) -> Dict:
+    batch = payload["batch"]
+    archive, manifest, new_renders = await render_batch_archive(batch, expand_batch(batch))
+    for name, data in new_renders.items():
+        await asyncio.to_thread(render_cache.put, name, data)
+    digest = await asyncio.to_thread(job_blobs.put, archive)
+    return {"manifest": manifest, "archive": digest, "media_type": "application/zip",
+            "size": len(archive)}
+
@@ -0,0 +1,223 @@
+"""
+Vision and damage routes: /explain, /check_ai, /check_damage, /analyze and
+/damage/estimate, and the explain, check_ai and damage job kinds.
+"""
+import asyncio
+from typing import Dict, Optional, Tuple
+
+from fastapi import APIRouter, Body, File, HTTPException, UploadFile
+
+from ingest import ingest_upload
+from jobs import RetryableError
+from routers.claims import record_analysis, require_claim
+from routers.jobs import enqueue_job, job_input
+from scheduler import priority_scope
+from services import UPLOAD_DIR, job_blobs, job_queue
+from sse import event_stream_response, sse_event
+from vision import (VISION_TASKS, damage_cache_key, damage_event_stream, damage_prompt, estimate_damage,
+                    prepare_vision_image, run_check_ai, run_damage_narrative, run_vision_task,
+                    stream_check_ai, stream_vision_task, vision_cache_key, vision_event_stream,
+                    vision_image_from_bytes, vision_variant)
+
+router = APIRouter()
+
+# The last description /explain or /analyze produced
+description_text = ""
+
+
+
+@router.post("/explain")
+async def explain_image(file: UploadFile = File(...), stream: bool = False):
+    image = await prepare_vision_image(file)
+
+    def respond(result: Dict) -> Dict:
+        global description_text
+        description_text = result["text"]
+        return {"filename": file.filename, "content": description_text, "model": result["model"],
+                "hedged": result["hedged"], "cached": result["cached"],
+                "preprocessing": image["preprocessing"]}
+
+    if stream:
+        return vision_event_stream(stream_vision_task(image, "explain"), respond)
+    return respond(await run_vision_task(image, "explain"))
+
+
+@router.get("/check_damage")
+async def check_damage(narrative: bool = False, stream: bool = False):
+    """
+    Local estimate of the default assessment; ?narrative=true also asks the
+    model for a summary, and ?stream=true streams that summary.
+    """
+    result = estimate_damage()
+    if stream:
+        return damage_event_stream(result)
+    if narrative:
+        result["narrative"] = await run_damage_narrative(result["estimate"])
+    return result
+
+
+@router.post("/check_damage")
+async def check_damage_assessment(damage_data: Dict, narrative: bool = False, stream: bool = False):
+    """Local estimate of a posted assessment (same shapes as the render endpoints take)."""
+    result = estimate_damage(damage_data)
+    if stream:
+        return damage_event_stream(result)
+    if narrative:
+        result["narrative"] = await run_damage_narrative(result["estimate"])
+    return result
+
+
+@router.post("/check_ai")
+async def check_ai_generation(file: UploadFile = File(...), stream: bool = False):
+    """
+    Analyzes an uploaded image to determine if it was generated by AI.
+    """
+    image = await prepare_vision_image(file)
+
+    def respond(result: Dict) -> Dict:
+        return {"filename": file.filename, "ai_analysis": result["text"], "model": result["model"],
+                "hedged": result["hedged"], "cached": result["cached"],
+                "screening": result["screening"], "fallback": result["fallback"],
+                "preprocessing": image["preprocessing"]}
+
+    if stream:
+        return vision_event_stream(stream_check_ai(image), respond)
+    return respond(await run_check_ai(image))
+
+
+@router.post("/analyze")
+async def analyze_image(file: UploadFile = File(...), stream: bool = False,
+                        claim_id: Optional[str] = None):
+    """
+    Single-upload analysis: runs the description, AI-detection and damage
+    estimate concurrently on one encoded copy of the image.
+
+    Each sub-result has the same shape as the /explain, /check_ai and
+    /check_damage responses. With ?stream=true the results are sent as
+    server-sent events (one event per sub-task as it finishes, then a final
+    "complete" event with the merged result). With ?claim_id= each result is
+    also stored with that claim.
+    """
+    if claim_id is not None:
+        await require_claim(claim_id)
+    image = await prepare_vision_image(file)
+
+    async def explain():
+        result = await run_vision_task(image, "explain")
+        return "explain", {"content": result["text"], "model": result["model"],
+                           "hedged": result["hedged"], "cached": result["cached"]}
+
+    async def check_ai():
+        result = await run_check_ai(image)
+        return "check_ai", {"ai_analysis": result["text"], "model": result["model"],
+                            "hedged": result["hedged"], "cached": result["cached"],
+                            "screening": result["screening"], "fallback": result["fallback"]}
+
+    async def check_damage_task():
+        return "check_damage", estimate_damage()
+
+    async def results_as_completed():
+        merged = {"filename": file.filename, "preprocessing": image["preprocessing"]}
+        for next_done in asyncio.as_completed([explain(), check_ai(), check_damage_task()]):
+            name, result = await next_done
+            if name == "explain":
+                global description_text
+                description_text = result["content"]
+            merged[name] = result
+            record_analysis(claim_id, "damage" if name == "check_damage" else name, result,
+                            image["digest"], file.filename)
+            yield name, result, merged
+
+    if not stream:
+        merged = {}
+        async for _, _, merged in results_as_completed():
+            pass
+        return merged
+
+    async def event_stream():
+        merged = {}
+        async for name, result, merged in results_as_completed():
+            yield sse_event(name, result)
+        yield sse_event("complete", merged)
+
+    return event_stream_response(event_stream())
+
+
+@router.post("/damage/estimate")
+async def damage_estimate(damage_data: Optional[Dict] = Body(None), narrative: bool = False,
+                          priority: str = "bulk"):
+    """
+    Itemized repair-cost estimate computed locally from an assessment (the
+    render endpoints' body; the default assessment when omitted). With
+    ?narrative=true a damage job is queued to add a model-written summary,
+    and narrative_job points at it; the estimate itself never waits on a model.
+    """
+    result = estimate_damage(damage_data)
+    if narrative:
+        result["narrative_job"] = await enqueue_job("damage", damage_data=damage_data,
+                                                    priority=priority)
+    return result
+
+
+# --- Jobs ---
+# Vision job kind -> result field (same shape as the matching endpoint)
+VISION_JOBS = {"explain": "content", "check_ai": "ai_analysis"}
+
+
+@job_input(*VISION_JOBS)
+async def vision_job_input(kind: str, priority: str, file: Optional[UploadFile] = None,
+                           **_) -> Tuple[Dict, str]:
+    if file is None:
+        raise HTTPException(status_code=400, detail=f"'{kind}' jobs need an image file")
+    upload = await ingest_upload(file, upload_dir=UPLOAD_DIR, encode_base64=False, keep_raw=True)
+    await asyncio.to_thread(job_blobs.put, upload.raw, upload.sha256)
+    payload = {"digest": upload.sha256, "filename": file.filename,
+               "mime_type": file.content_type or "image/jpeg", "priority": priority}
+    return payload, vision_cache_key(upload.sha256, vision_variant(), VISION_TASKS[kind])
+
+
+@job_input("damage")
+async def damage_job_input(kind: str, priority: str, damage_data: Optional[Dict] = None,
+                           **_) -> Tuple[Dict, str]:
+    payload = {"priority": priority, "damage_data": damage_data}
+    return payload, damage_cache_key(damage_prompt(estimate_damage(damage_data)["estimate"]))
+
+
+async def run_vision_job(kind: str, payload: Dict) -> Dict:
+    raw = await asyncio.to_thread(job_blobs.get, payload["digest"])
+    image = await vision_image_from_bytes(raw, payload["digest"], payload["mime_type"],
+                                          filename=payload["filename"])
+    with priority_scope(payload.get("priority", "bulk")):
+        if kind == "check_ai":
+            result = await run_check_ai(image, raise_errors=True)
+        else:
+            result = await run_vision_task(image, kind, raise_errors=True)
+    if not result["valid"]:
+        # Store only answers that conform; a later attempt may get one (or the job fails)
+        raise RetryableError(f"{result['model']} returned a reply that does not match the "
+                             f"{kind} schema: {result['text'][:200]}")
+    extra = {"screening": result["screening"]} if kind == "check_ai" else {}
+    result = {"filename": payload["filename"], VISION_JOBS[kind]: result["text"],
+              "model": result["model"], "hedged": result["hedged"], **extra,
+              "preprocessing": image["preprocessing"]}
+    record_analysis(payload.get("claim_id"), kind, result, payload["digest"], payload["filename"])
+    return result
+
+
+@job_queue.handler("explain")
+async def explain_job(payload: Dict) -> Dict:
+    return await run_vision_job("explain", payload)
+
+
+@job_queue.handler("check_ai")
+async def check_ai_job(payload: Dict) -> Dict:
+    return await run_vision_job("check_ai", payload)
+
+
+@job_queue.handler("damage")
+async def damage_job(payload: Dict) -> Dict:
+    result = estimate_damage(payload.get("damage_data"))
+    with priority_scope(payload.get("priority", "bulk")):
+        result["narrative"] = await run_damage_narrative(result["estimate"], raise_errors=True)
+    record_analysis(payload.get("claim_id"), "damage", result)
+    return result
@@ -0,0 +1,202 @@
+"""
+Per-model admission control for upstream (OpenRouter) calls.
+
+The free-tier models have strict rate limits, so calls are not fired as soon
+as they arrive. Each model has a lane with three controls:
+
+* a token bucket that caps the request rate (rate/s with a burst allowance),
+* an adaptive concurrency limit (AIMD). It grows by about one slot per
+  window of successful calls, halves on a 429, and pauses the lane for as
+  long as Retry-After asks,
+* a priority queue, so interactive work (an assessor opening a claim) is
+  admitted ahead of bulk work (batch uploads, background jobs).
+
+Priority comes from the caller or, by default, from the current_priority
+context variable, which the API sets per request from the X-Priority header.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+PRIORITIES = {"interactive": 0, "default": 1, "bulk": 2}
+
+current_priority: contextvars.ContextVar = contextvars.ContextVar("upstream_priority",
+                                                                 default="default")
+
+
+@contextmanager
+def priority_scope(priority: str):
+    """Run a block with a given upstream priority class."""
+    token = current_priority.set(priority)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+def parse_model_rates(spec: str) -> Dict[str, Tuple[float, float]]:
+    """Parse 'model-a=0.5:4,model-b=2' into {model: (rate per second, burst)}."""
+    rates = {}
+    for part in spec.split(","):
+        if "=" not in part:
+            continue
+        model, value = part.rsplit("=", 1)
+        rate, _, burst = value.partition(":")
+        try:
+            rate_value = float(rate)
+            rates[model.strip()] = (rate_value, float(burst) if burst else max(1.0, rate_value))
+        except ValueError:
+            continue
+    return rates
+
+
+class ModelLane:
+    """Token bucket + AIMD concurrency limit + priority queue for one model."""
+
+    def __init__(self, model: str, rate: float, burst: float, max_limit: int,
+                 initial_limit: Optional[int] = None, min_limit: int = 1,
+                 default_backoff: float = 5.0):
+        self.model = model
+        self.rate = rate
+        self.burst = burst
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(initial_limit or max_limit)
+        self.default_backoff = default_backoff
+        self.tokens = burst
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._last_refill = time.monotonic()
+        self._last_decrease = 0.0
+        self._queue: List[Tuple[int, int, float, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Counters
+        self.admitted = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _refill(self, now: float) -> None:
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def _schedule(self, delay: float) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(delay, self._pump)
+
+    def _pump(self) -> None:
+        """Admit queued callers, best priority first, while limits allow."""
+        self._timer = None
+        now = time.monotonic()
+        self._refill(now)
+        while self._queue:
+            if self._queue[0][3].done():  # cancelled while waiting
+                heapq.heappop(self._queue)
+                continue
+            if now < self.paused_until:
+                self._schedule(self.paused_until - now)
+                return
+            if self.in_flight >= int(self.limit):
+                return  # the next release() pumps again
+            if self.rate > 0 and self.tokens < 1:
+                self._schedule((1 - self.tokens) / self.rate)
+                return
+            _, _, enqueued, future = heapq.heappop(self._queue)
+            if self.rate > 0:
+                self.tokens -= 1
+            self.in_flight += 1
+            wait = now - enqueued
+            self.admitted += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            future.set_result(wait)
+
+    async def acquire(self, priority: str = "default") -> float:
+        """Wait for admission; returns the seconds spent queued."""
+        future = asyncio.get_running_loop().create_future()
+        entry = (PRIORITIES.get(priority, PRIORITIES["default"]), next(self._seq),
+                 time.monotonic(), future)
+        heapq.heappush(self._queue, entry)
+        self._pump()
+        try:
+            return await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted just as the caller went away: give the slot back
+                self.release("cancelled")
+            raise
+
+    def release(self, outcome: str, retry_after: Optional[float] = None,
+                started_at: float = 0.0) -> None:
+        """
+        Return a slot and adapt the limit. outcome is "ok" (additive increase),
+        "throttled" (a 429: multiplicative decrease and a pause), or anything
+        else (no change).
+        """
+        self.in_flight -= 1
+        now = time.monotonic()
+        if outcome == "ok":
+            self.limit = min(float(self.max_limit), self.limit + 1.0 / max(self.limit, 1.0))
+        elif outcome == "throttled":
+            self.throttled += 1
+            # Calls already in flight when we backed off say nothing new; halve once per window
+            if started_at >= self._last_decrease:
+                self.limit = max(float(self.min_limit), self.limit / 2)
+                self._last_decrease = now
+            pause = retry_after if retry_after is not None else self.default_backoff
+            self.paused_until = max(self.paused_until, now + pause)
+        self._pump()
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        waiting = [entry for entry in self._queue if not entry[3].done()]
+        depth = {name: 0 for name in PRIORITIES}
+        names = {rank: name for name, rank in PRIORITIES.items()}
+        for rank, _, _, _ in waiting:
+            depth[names[rank]] += 1
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queue_depth": depth,
+            "oldest_wait_seconds": round(max((now - e[2] for e in waiting), default=0.0), 3),
+            "paused_for_seconds": round(max(0.0, self.paused_until - now), 3),
+            "tokens": round(self.tokens, 2),
+            "rate_per_second": self.rate,
+            "admitted": self.admitted,
+            "throttled": self.throttled,
+            "mean_wait_seconds": round(self.total_wait / self.admitted, 4) if self.admitted else 0.0,
+            "max_wait_seconds": round(self.max_wait, 4),
+        }
+
+
+class UpstreamScheduler:
+    """Creates one ModelLane per model on first use."""
+
+    def __init__(self, default_rate: float = 0.0, default_burst: float = 1.0,
+                 default_limit: int = 16, rates: Optional[Dict[str, Tuple[float, float]]] = None,
+                 limits: Optional[Dict[str, int]] = None, default_backoff: float = 5.0):
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        self.default_limit = default_limit
+        self.rates = dict(rates or {})
+        self.limits = dict(limits or {})
+        self.default_backoff = default_backoff
+        self.lanes: Dict[str, ModelLane] = {}
+
+    def lane(self, model: str) -> ModelLane:
+        if model not in self.lanes:
+            rate, burst = self.rates.get(model, (self.default_rate, self.default_burst))
+            self.lanes[model] = ModelLane(model, rate, burst,
+                                          self.limits.get(model, self.default_limit),
+                                          default_backoff=self.default_backoff)
+        return self.lanes[model]
+
+    def stats(self) -> Dict:
+        return {model: lane.stats() for model, lane in self.lanes.items()}
@@ -0,0 +1,147 @@
+"""
+Shared services of an API process, built from the environment.
+
+API_PROFILE decides what a process serves (see api.py). The light services
+every profile needs (OpenRouter client, result cache, job queue, claims
+store) are created on import. The ones that need OpenCV or numpy (image
+preprocessing, the local AI screener, the perceptual-hash index, the cost
+estimator) are built on first use by the get_*() functions below, so a
+gateway process that never calls them never imports those libraries.
+preload() builds them up front, for profiles that should pay that cost at
+startup rather than on the first request.
+"""
+import os
+from functools import lru_cache
+from typing import Any, Callable, Dict
+
+from claims_store import AnalysisWriter, ClaimsStore
+from jobs import BlobStore, JobQueue
+from openrouter_client import OpenRouterClient
+from result_cache import ResultCache
+from singleflight import SingleFlight
+
+PROFILES = ("all", "gateway", "renderer")
+PROFILE = os.getenv("API_PROFILE", "all")
+
+
+def env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    return default if value is None else value.lower() not in ("0", "false", "no")
+
+
+# Local image work needs OpenCV, so the gateway leaves it off unless it is turned on explicitly:
+# uploads go to the model as sent, every check_ai goes to the model, no perceptual dedupe
+LOCAL_IMAGE_WORK = PROFILE != "gateway"
+PREPROCESS_ENABLED = env_flag("PREPROCESS_ENABLED", LOCAL_IMAGE_WORK)
+# Local first-pass AI screen: only uncertain uploads go to the check_ai model
+# (AI_SCREEN_LOW/HIGH set the band that escalates)
+AI_SCREEN_ENABLED = env_flag("AI_SCREEN_ENABLED", LOCAL_IMAGE_WORK)
+# Perceptual-hash index of uploads: near-duplicate search, and resized or recompressed
+# re-uploads share the vision cache entries of the first copy
+PHASH_ENABLED = env_flag("PHASH_ENABLED", LOCAL_IMAGE_WORK)
+# Server-Timing response header with per-phase timings
+SERVER_TIMING = env_flag("SERVER_TIMING", True)
+
+# Paths relative to backend directory
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BASE_DIR)
+UPLOAD_DIR = os.path.join(PROJECT_ROOT, "uploads")
+IMAGES_DIR = os.path.join(PROJECT_ROOT, "imgsss")
+JOB_DATA_DIR = os.getenv("JOB_DATA_DIR", os.path.join(PROJECT_ROOT, "job_data"))
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+# API_KEY = "sk-or-v1-xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx"
+# API_KEY =  "sk-or-v1-xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx"
+# API_KEY =  "sk-or-v1-xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx"
+# key2="sk-or-v1-xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx"
+
+#API_KEY="sk-or-v1-xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx"
+
+API_KEY="sk-or-v1-xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx"
+key2=API_KEY
+
+# name -> stats() of each service this process has built, as reported by /cache/stats
+SERVICE_STATS: Dict[str, Callable[[], Dict]] = {}
+# name -> cache with hits/misses counters, for the cache_lookups_total metric
+CACHES: Dict[str, Any] = {}
+
+# Shared pooled client for all model endpoints (see OPENROUTER_* env vars)
+openrouter = OpenRouterClient.from_env(API_KEY)
+
+# Identical upstream calls that overlap in time share a single request
+upstream_flight = SingleFlight()
+
+# Analysis result cache (disk tier is enabled by setting RESULT_CACHE_DIR)
+result_cache = ResultCache(
+    max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "1024")),
+    ttl_seconds=float(os.getenv("RESULT_CACHE_TTL", "86400")),
+    disk_dir=os.getenv("RESULT_CACHE_DIR") or None,
+)
+CACHES["result"] = result_cache
+
+# Long-running analyses and large render batches survive dropped connections and restarts
+job_blobs = BlobStore(os.path.join(JOB_DATA_DIR, "blobs"))
+job_queue = JobQueue.from_env(JOB_DATA_DIR)
+
+# Claims and the analyses stored with them (CLAIMS_DB_PATH)
+claims_store = ClaimsStore.from_env(JOB_DATA_DIR)
+analysis_writer = AnalysisWriter.from_env(claims_store)
+
+SERVICE_STATS.update({
+    "result_cache": result_cache.stats,
+    "upstream_flight": upstream_flight.stats,
+    "openrouter": openrouter.stats,
+    "jobs": job_queue.stats,
+    "claims": analysis_writer.stats,
+})
+
+
+# --- Services built on first use (OpenCV / numpy) ---
+@lru_cache(maxsize=None)
+def get_preprocess():
+    """The preprocess module (image normalization before model calls)."""
+    import preprocess
+
+    CACHES["normalized"] = preprocess.normalized_cache
+    return preprocess
+
+
+@lru_cache(maxsize=None)
+def get_ai_screener():
+    from ai_screener import AIScreener
+
+    screener = AIScreener.from_env()
+    SERVICE_STATS["ai_screener"] = screener.stats
+    return screener
+
+
+@lru_cache(maxsize=None)
+def get_phash_index():
+    """The perceptual-hash index with every stored hash loaded into memory."""
+    from phash_index import PHashIndex
+
+    index = PHashIndex.from_env(JOB_DATA_DIR)
+    index.load()
+    SERVICE_STATS["phash_index"] = index.stats
+    return index
+
+
+@lru_cache(maxsize=None)
+def get_cost_estimator():
+    """Local repair-cost engine (COST_TABLE_PATH points at a price table JSON to override the defaults)."""
+    from cost_estimator import CostEstimator
+
+    estimator = CostEstimator.from_env()
+    SERVICE_STATS["cost_estimator"] = estimator.stats
+    return estimator
+
+
+def preload() -> None:
+    """Build the enabled OpenCV/numpy services now instead of on the first request."""
+    if PREPROCESS_ENABLED:
+        get_preprocess()
+    if AI_SCREEN_ENABLED:
+        get_ai_screener()
+    if PHASH_ENABLED:
+        get_phash_index()
+    get_cost_estimator()
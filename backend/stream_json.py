@@ -0,0 +1,131 @@
+"""
+Incremental parser for the JSON object in a streamed model reply.
+
+Models wrap their JSON in code fences, prefix it with prose and sometimes
+quote with single quotes. Waiting for the whole reply and then calling
+json.loads makes the client wait for the full generation. This parser is
+fed the reply chunk by chunk and returns each top-level field as soon as
+its value is complete:
+
+* strings, objects and arrays complete at their closing quote or bracket
+* numbers, true/false/null (and Python's True/False/None) complete at the
+  next comma, closing brace or whitespace
+
+Everything before the first "{" (a ```json fence, prose) and after the
+matching "}" is ignored.
+"""
+import ast
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+_LITERALS = {"true": True, "false": False, "null": None, "True": True, "False": False, "None": None}
+
+
+def decode_value(text: str) -> Any:
+    """A JSON value, tolerating single quotes and Python literals; the raw text if neither parses."""
+    text = text.strip()
+    if text in _LITERALS:
+        return _LITERALS[text]
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return text
+
+
+class IncrementalJSONParser:
+    """Feed reply text as it streams in; completed top-level fields come back at once."""
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self.done = False
+        self._state = "seek"  # seek, key_or_end, key, colon, value, after_value, done
+        self._buffer: List[str] = []
+        self._key: Optional[str] = None
+        self._quote: Optional[str] = None  # open string delimiter inside a key or value
+        self._escape = False
+        self._depth = 0  # brackets open inside the current value
+
+    def _complete(self, completed: List[Tuple[str, Any]]) -> None:
+        value = decode_value("".join(self._buffer))
+        self.fields[self._key] = value
+        completed.append((self._key, value))
+        self._buffer = []
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        """Consume a chunk; returns the (key, value) pairs it completed, in order."""
+        completed: List[Tuple[str, Any]] = []
+        for ch in text:
+            state = self._state
+            if state == "done":
+                break
+            if state == "seek":
+                if ch == "{":
+                    self._state = "key_or_end"
+            elif state == "key_or_end":
+                if ch in "\"'":
+                    self._quote, self._buffer, self._state = ch, [ch], "key"
+                elif ch == "}":
+                    self._state, self.done = "done", True
+            elif state == "key":
+                self._buffer.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == self._quote:
+                    self._key = str(decode_value("".join(self._buffer)))
+                    self._quote, self._buffer, self._state = None, [], "colon"
+            elif state == "colon":
+                if ch == ":":
+                    self._state, self._depth = "value", 0
+            elif state == "value":
+                self._feed_value(ch, completed)
+            elif state == "after_value":
+                if ch == ",":
+                    self._state = "key_or_end"
+                elif ch == "}":
+                    self._state, self.done = "done", True
+        return completed
+
+    def _feed_value(self, ch: str, completed: List[Tuple[str, Any]]) -> None:
+        if self._quote is not None:  # inside a string
+            self._buffer.append(ch)
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == self._quote:
+                self._quote = None
+                if self._depth == 0:
+                    self._complete(completed)
+                    self._state = "after_value"
+        elif ch in "\"'":
+            self._quote = ch
+            self._buffer.append(ch)
+        elif ch in "{[":
+            self._depth += 1
+            self._buffer.append(ch)
+        elif ch in "}]":
+            if self._depth == 0:  # the object closes straight after a scalar
+                if "".join(self._buffer).strip():
+                    self._complete(completed)
+                self._state, self.done = "done", True
+                return
+            self._depth -= 1
+            self._buffer.append(ch)
+            if self._depth == 0:
+                self._complete(completed)
+                self._state = "after_value"
+        elif self._depth == 0 and ch == ",":
+            self._complete(completed)
+            self._state = "key_or_end"
+        elif self._depth == 0 and ch.isspace():
+            if self._buffer:  # whitespace ends a scalar; leading whitespace is skipped
+                self._complete(completed)
+                self._state = "after_value"
+        else:
+            self._buffer.append(ch)
@@ -0,0 +1,54 @@
+"""
+Decoding of 16-bit PNGs before they are normalized for the vision model.
+
+Run from backend/:  python -m pytest tests
+"""
+import cv2
+import numpy as np
+
+from preprocess import DEFAULT_PROFILE, normalize_image
+
+
+def png(pixels: np.ndarray) -> bytes:
+    ok, encoded = cv2.imencode(".png", pixels)
+    assert ok
+    return encoded.tobytes()
+
+
+def normalized_pixels(pixels: np.ndarray) -> np.ndarray:
+    normalized = normalize_image(png(pixels), dict(DEFAULT_PROFILE))
+    assert normalized.reencoded
+    image = cv2.imdecode(np.frombuffer(normalized.data, np.uint8), cv2.IMREAD_COLOR)
+    assert image is not None and image.dtype == np.uint8
+    return image.astype(np.int16)
+
+
+def test_opaque_white_16bit_rgba_stays_white():
+    image = normalized_pixels(np.full((32, 32, 4), 65535, np.uint16))
+    assert image.min() >= 250
+
+
+def test_transparent_16bit_rgba_flattens_onto_white():
+    pixels = np.zeros((32, 32, 4), np.uint16)  # black, fully transparent
+    assert normalized_pixels(pixels).min() >= 250
+
+
+def test_half_transparent_16bit_rgba_blends_like_8bit():
+    wide = np.zeros((32, 32, 4), np.uint16)
+    wide[:, :, 3] = 32768
+    narrow = np.zeros((32, 32, 4), np.uint8)
+    narrow[:, :, 3] = 128
+    assert np.abs(normalized_pixels(wide) - normalized_pixels(narrow)).max() <= 2
+
+
+def test_16bit_grayscale_is_scaled_to_8bit():
+    image = normalized_pixels(np.full((32, 32), 40000, np.uint16))
+    # 40000 / 65535 * 255 = 155.6
+    assert np.abs(image - 156).max() <= 3
+
+
+def test_16bit_bgr_is_scaled_to_8bit():
+    pixels = np.zeros((32, 32, 3), np.uint16)
+    pixels[:, :, 2] = 65535  # red
+    image = normalized_pixels(pixels)
+    assert image[:, :, 2].min() >= 250 and image[:, :, :2].max() <= 5
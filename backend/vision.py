@@ -0,0 +1,497 @@
+"""
+Model calls behind the vision and damage endpoints, shared by their routes,
+the background jobs and keyframe analysis.
+
+Vision tasks (explain, check_ai) send one prepared copy of an upload to a
+hedged model chain through the result cache; check_ai goes through the
+local AI screen first. Damage estimates are computed locally and a model
+only writes the optional narrative. Each has a streamed variant that
+yields events for the SSE endpoints.
+
+Nothing here imports OpenCV or numpy at load time: preprocessing,
+screening, perceptual hashing and the cost estimator come from the
+services.get_*() functions, called only when the feature is in use.
+"""
+import asyncio
+import base64
+import json
+import os
+import re
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
+
+from hedging import Hedger, conforms, parse_json_object
+from ingest import ingest_upload
+from metrics import span
+from result_cache import content_hash, make_key
+from services import (AI_SCREEN_ENABLED, API_KEY, BASE_DIR, PHASH_ENABLED, PREPROCESS_ENABLED,
+                      SERVICE_STATS, UPLOAD_DIR, get_ai_screener, get_cost_estimator, get_phash_index,
+                      get_preprocess, key2, openrouter, result_cache, upstream_flight)
+from sse import event_stream_response, sse_event
+from stream_json import IncrementalJSONParser
+
+VISION_MODEL = "mistralai/mistral-small-3.2-24b-instruct:free"
+VISION_FALLBACK_MODEL = "google/gemma-3-27b-it:free"
+DAMAGE_MODEL = "openai/gpt-oss-20b:free"
+
+
+def model_chain(env_name: str, default: List[str]) -> List[str]:
+    """Comma-separated model chain from the environment; the first model is the primary."""
+    models = [m.strip() for m in os.getenv(env_name, "").split(",") if m.strip()]
+    return models or default
+
+
+# Vision tasks hedge to the next model when the current one is slower than its p90
+EXPLAIN_MODEL_CHAIN = model_chain("EXPLAIN_MODEL_CHAIN", [VISION_MODEL, VISION_FALLBACK_MODEL])
+CHECK_AI_MODEL_CHAIN = model_chain("CHECK_AI_MODEL_CHAIN", [VISION_MODEL, VISION_FALLBACK_MODEL])
+hedger = Hedger(
+    percentile=float(os.getenv("HEDGE_PERCENTILE", "0.9")),
+    min_samples=int(os.getenv("HEDGE_MIN_SAMPLES", "20")),
+    default_delay=float(os.getenv("HEDGE_DEFAULT_DELAY", "20")),
+    min_delay=float(os.getenv("HEDGE_MIN_DELAY", "2")),
+    max_delay=float(os.getenv("HEDGE_MAX_DELAY", "60")),
+)
+# Bump these whenever the matching prompt text changes so stale results are not served
+EXPLAIN_PROMPT_VERSION = "explain-v1"
+CHECK_AI_PROMPT_VERSION = "check-ai-v1"
+CHECK_DAMAGE_PROMPT_VERSION = "check-damage-v2"
+
+SERVICE_STATS["hedging"] = hedger.stats
+
+# The assessment /admin/analyze-damage-components returns for every upload, used when a
+# request carries none of its own
+DEFAULT_ASSESSMENT_PATH = os.path.join(BASE_DIR, "side.json")
+
+
+def encode_image_to_base64(image_path: str) -> str:
+    with open(image_path, "rb") as image_file:
+        return base64.b64encode(image_file.read()).decode("utf-8")
+
+
+def clean_content(raw: str) -> str:
+    """
+    Remove code blocks or triple backticks from OpenRouter responses.
+    """
+    cleaned = re.sub(r"```(?:json)?\n(.*?)```", r"\1", raw, flags=re.DOTALL)
+    return cleaned.strip()
+
+
+async def call_openrouter(cache_key: str, payload: Dict, api_key: str = API_KEY) -> Dict:
+    """
+    POST a chat-completions payload to OpenRouter and return the decoded JSON.
+    Concurrent calls with the same cache_key are coalesced into one request.
+    """
+    return await upstream_flight.do(cache_key, openrouter.chat, payload, api_key=api_key)
+
+
+EXPLAIN_PROMPT = (
+    "Describe this image in detail. Provide JSON keys: "
+    "{ 'description': '...', 'ai_generated_likelihood': 0-1, "
+    "'confidence_reasoning': '...' }"
+)
+
+# ** The key change is this prompt **
+CHECK_AI_PROMPT = (
+    "Analyze this image for signs of AI generation. Look for common artifacts like "
+    "unnatural textures, incorrect lighting, strange details (e.g., on hands or text), "
+    "or a 'too perfect' appearance. Provide your response in a strict JSON format with the following keys: "
+    "{ \"is_ai_generated\": boolean, \"confidence_score\": float (0.0 to 1.0), "
+    "\"reasoning\": \"A detailed explanation of the visual cues you used for your analysis.\" }"
+)
+
+
+# Per vision task: prompt, prompt version (cache keys), model chain, the JSON keys/types
+# an answer needs before it is accepted, and whether a near-duplicate's cached answer
+# (same perceptual-hash canonical digest) may be reused. check_ai never reuses one: an
+# edited copy of a photo (inpainting, spliced damage) is exactly what it has to catch.
+VISION_TASKS = {
+    "explain": {
+        "prompt": EXPLAIN_PROMPT,
+        "version": EXPLAIN_PROMPT_VERSION,
+        "chain": EXPLAIN_MODEL_CHAIN,
+        "schema": {"description": (str,), "ai_generated_likelihood": (int, float)},
+        "near_duplicates": True,
+    },
+    "check_ai": {
+        "prompt": CHECK_AI_PROMPT,
+        "version": CHECK_AI_PROMPT_VERSION,
+        "chain": CHECK_AI_MODEL_CHAIN,
+        "schema": {"is_ai_generated": (bool,), "confidence_score": (int, float), "reasoning": (str,)},
+        "near_duplicates": False,
+    },
+}
+
+
+def extract_content(response: Dict) -> str:
+    """Safely get the message text out of an OpenRouter response."""
+    if "choices" in response:
+        return response["choices"][0]["message"]["content"]
+    elif "content" in response:
+        return response["content"]
+    return str(response)
+
+
+async def prepare_vision_image(file: UploadFile, model: str = VISION_MODEL) -> Dict:
+    """
+    Ingest an upload and normalize it for the vision model.
+    Returns the content digest, the data URL to send, a cache variant tag,
+    the preprocessing report (None when preprocessing is disabled) and the
+    original bytes (for the local AI screen; None when nothing decodes them).
+    """
+    if not PREPROCESS_ENABLED:
+        with span("upload"):
+            upload = await ingest_upload(file, upload_dir=UPLOAD_DIR,
+                                         keep_raw=AI_SCREEN_ENABLED or PHASH_ENABLED,
+                                         mime_type=file.content_type or "image/jpeg")
+        return {"digest": upload.sha256, "data_url": upload.data_url(),
+                "variant": "original", "preprocessing": None, "raw": upload.raw,
+                "cache_digest": await perceptual_digest(upload.raw, upload.sha256, file.filename)}
+
+    with span("upload"):
+        upload = await ingest_upload(file, upload_dir=UPLOAD_DIR, encode_base64=False, keep_raw=True)
+    return await vision_image_from_bytes(upload.raw, upload.sha256, model=model,
+                                         filename=file.filename)
+
+
+def vision_variant(model: str = VISION_MODEL) -> str:
+    """Cache variant tag of the image the vision model is sent."""
+    if not PREPROCESS_ENABLED:
+        return "original"
+    preprocess = get_preprocess()
+    return preprocess.profile_tag(preprocess.profile_for(model))
+
+
+async def perceptual_digest(raw: Optional[bytes], digest: str, filename: Optional[str] = None) -> str:
+    """
+    Index the image by perceptual hash and return the digest that tasks reusing
+    near-duplicates (explain) cache under: an earlier near-duplicate's, else its own.
+    """
+    if not PHASH_ENABLED:
+        return digest
+    with span("phash"):
+        return await asyncio.to_thread(lambda: get_phash_index().canonical(raw, digest, filename))
+
+
+async def vision_image_from_bytes(raw: bytes, digest: str, mime_type: str = "image/jpeg",
+                                  model: str = VISION_MODEL, filename: Optional[str] = None) -> Dict:
+    """prepare_vision_image() for bytes already in hand (e.g. a stored job input)."""
+    cache_digest = await perceptual_digest(raw, digest, filename)
+    if not PREPROCESS_ENABLED:
+        with span("encode"):
+            base64_image = base64.b64encode(raw).decode("utf-8")
+        return {"digest": digest, "data_url": f"data:{mime_type};base64,{base64_image}",
+                "variant": "original", "preprocessing": None, "raw": raw,
+                "cache_digest": cache_digest}
+
+    # OpenCV releases the GIL, so decoding/resizing off the event loop keeps other requests moving
+    with span("preprocess"):
+        normalized = await asyncio.to_thread(get_preprocess().normalize_for_model, raw, digest, model)
+    with span("encode"):
+        base64_image = base64.b64encode(normalized.data).decode("utf-8")
+    return {
+        "digest": digest,
+        "data_url": f"data:{normalized.mime_type};base64,{base64_image}",
+        "variant": vision_variant(model),
+        "preprocessing": normalized.report(),
+        "raw": raw,
+        "cache_digest": cache_digest,
+    }
+
+
+def vision_cache_key(digest: str, variant: str, spec: Dict) -> str:
+    """Result cache key of an image for a task: its configured model chain is part of it."""
+    return make_key(digest, ",".join(spec["chain"]), f"{spec['version']}:{variant}")
+
+
+def task_cache_key(image: Dict, spec: Dict) -> str:
+    """Result cache key of a prepared image for a task (see "near_duplicates" in VISION_TASKS)."""
+    digest = image.get("cache_digest", image["digest"]) if spec["near_duplicates"] else image["digest"]
+    return vision_cache_key(digest, image["variant"], spec)
+
+
+def vision_messages(spec: Dict, image: Dict) -> List[Dict]:
+    return [
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": spec["prompt"]},
+                {"type": "image_url", "image_url": {"url": image["data_url"]}},
+            ],
+        }
+    ]
+
+
+async def run_vision_task(image: Dict, task: str, raise_errors: bool = False) -> Dict:
+    """
+    Ask the task's vision model chain about a prepared image, going through
+    the result cache. The primary model is hedged to the next one when it is
+    slow, and the first schema-conforming answer wins.
+    Returns {"text", "model", "hedged", "cached", "valid"}, valid being
+    whether the text conforms to the task's schema. Errors come back as the
+    text unless raise_errors is set (background jobs need them to retry).
+    """
+    spec = VISION_TASKS[task]
+    cache_key = task_cache_key(image, spec)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        if not isinstance(cached, dict):  # entries written before model chains held just the text
+            cached = {"text": cached, "model": spec["chain"][0]}
+        return {**cached, "hedged": False, "cached": True, "valid": True}
+
+    messages = vision_messages(spec, image)
+
+    async def ask(model: str) -> str:
+        response = await openrouter.chat({"model": model, "messages": messages})
+        # Clean markdown/codeblocks
+        text = clean_content(extract_content(response))
+        if "choices" not in response:
+            raise ValueError(f"Unexpected OpenRouter response: {text[:200]}")
+        return text
+
+    try:
+        # Concurrent identical requests share one hedged run; losing model calls are cancelled
+        answer = await upstream_flight.do(cache_key, hedger.run, spec["chain"], ask,
+                                          lambda text: conforms(text, spec["schema"]))
+    except Exception as e:
+        if raise_errors:
+            raise
+        return {"text": f"Error: {str(e)}", "model": None, "hedged": False, "cached": False,
+                "valid": False}
+
+    if answer["valid"]:
+        result_cache.set(cache_key, {"text": answer["value"], "model": answer["model"]})
+    return {"text": answer["value"], "model": answer["model"], "hedged": answer["hedged"],
+            "cached": False, "valid": answer["valid"]}
+
+
+# --- Streaming ---
+# With ?stream=true, /explain, /check_ai and /check_damage answer with server-sent events:
+# "delta" per model token, "field" as each top-level JSON field of the reply completes,
+# then "complete" with the same body the non-streaming request returns
+def field_events(text: str) -> List[Tuple[str, Dict]]:
+    """"field" events for every top-level field of a finished reply (cached or local answers)."""
+    return [("field", {"name": name, "value": value})
+            for name, value in (parse_json_object(text) or {}).items()]
+
+
+async def stream_vision_task(image: Dict, task: str) -> AsyncIterator[Tuple[str, Dict]]:
+    """
+    run_vision_task() with the reply streamed: yields ("delta", {"text"}) per
+    token and ("field", {"name", "value"}) per completed JSON field, then
+    ("result", ...) with run_vision_task's fields. A cached answer comes back
+    as fields at once. The chain's models are tried in turn until one starts
+    streaming; streamed calls are not hedged or coalesced.
+    """
+    spec = VISION_TASKS[task]
+    cache_key = task_cache_key(image, spec)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        if not isinstance(cached, dict):
+            cached = {"text": cached, "model": spec["chain"][0]}
+        for event in field_events(cached["text"]):
+            yield event
+        yield "result", {**cached, "hedged": False, "cached": True, "valid": True}
+        return
+
+    messages = vision_messages(spec, image)
+    error: Optional[Exception] = None
+    for model in spec["chain"]:
+        parser, parts = IncrementalJSONParser(), []
+        try:
+            async for delta in openrouter.chat_stream({"model": model, "messages": messages}):
+                parts.append(delta)
+                yield "delta", {"text": delta}
+                for name, value in parser.feed(delta):
+                    yield "field", {"name": name, "value": value}
+        except Exception as e:
+            error = e
+            if parts:  # part of this reply was already relayed; another model cannot take over
+                break
+            continue
+        text = clean_content("".join(parts))
+        valid = conforms(text, spec["schema"])
+        if valid:
+            result_cache.set(cache_key, {"text": text, "model": model})
+        yield "result", {"text": text, "model": model, "hedged": False, "cached": False, "valid": valid}
+        return
+    yield "result", {"text": f"Error: {str(error)}", "model": None, "hedged": False, "cached": False,
+                     "valid": False}
+
+
+# --- Local AI Screen ---
+LOCAL_SCREEN_MODEL = "local-screener"
+
+
+async def screen_upload(image: Dict) -> Optional[Dict]:
+    """Local AI screening of a prepared image (None when screening is off)."""
+    if not AI_SCREEN_ENABLED or image.get("raw") is None:
+        return None
+    with span("ai_screen"):
+        return await asyncio.to_thread(lambda: get_ai_screener().screen(image["raw"]))
+
+
+def local_check_ai(screening: Optional[Dict]) -> Optional[Dict]:
+    """The local check_ai result for a confident screening, else None (ask the model)."""
+    if screening is None or screening["decision"] == "escalate":
+        return None
+    from ai_screener import local_verdict  # loaded with the screener that produced screening
+
+    text = local_verdict(screening, "Decided by local screening without a model call.")
+    return {"text": text, "model": LOCAL_SCREEN_MODEL, "hedged": False, "cached": False,
+            "valid": True, "screening": screening, "fallback": False}
+
+
+def with_screening(result: Dict, screening: Optional[Dict]) -> Dict:
+    """A model check_ai result with its screening; the local score answers if the call failed."""
+    if result["model"] is None and screening is not None and screening["score"] is not None:
+        from ai_screener import local_verdict
+
+        text = local_verdict(screening, "The vision model was unavailable.")
+        return {**result, "text": text, "model": LOCAL_SCREEN_MODEL, "valid": True,
+                "screening": screening, "fallback": True}
+    return {**result, "screening": screening, "fallback": False}
+
+
+async def run_check_ai(image: Dict, raise_errors: bool = False) -> Dict:
+    """
+    run_vision_task(image, "check_ai") behind the local screen. Confident
+    screens are answered locally; uncertain ones go to the model, and when
+    the model fails the local score is the answer (fallback: True).
+    Returns run_vision_task's fields plus "screening" and "fallback".
+    """
+    screening = await screen_upload(image)
+    local = local_check_ai(screening)
+    if local is not None:
+        return local
+    return with_screening(await run_vision_task(image, "check_ai", raise_errors), screening)
+
+
+async def stream_check_ai(image: Dict) -> AsyncIterator[Tuple[str, Dict]]:
+    """run_check_ai() streamed: a "screening" event, then as stream_vision_task()."""
+    screening = await screen_upload(image)
+    if screening is not None:
+        yield "screening", screening
+    local = local_check_ai(screening)
+    if local is not None:
+        for event in field_events(local["text"]):
+            yield event
+        yield "result", local
+        return
+    async for name, data in stream_vision_task(image, "check_ai"):
+        if name == "result":
+            data = with_screening(data, screening)
+            if data["fallback"]:
+                for event in field_events(data["text"]):
+                    yield event
+        yield name, data
+
+
+def vision_event_stream(events: AsyncIterator[Tuple[str, Dict]],
+                        respond: Callable[[Dict], Dict]) -> StreamingResponse:
+    """SSE relay of a streamed vision task; respond() turns its result into the "complete" body."""
+    async def event_stream():
+        async for name, data in events:
+            yield sse_event("complete" if name == "result" else name,
+                            respond(data) if name == "result" else data)
+
+    return event_stream_response(event_stream())
+
+
+# --- Damage ---
+def default_assessment() -> Dict:
+    with open(DEFAULT_ASSESSMENT_PATH) as f:
+        return json.load(f)
+
+
+def estimate_damage(damage_data: Optional[Dict] = None) -> Dict:
+    """
+    Itemized local estimate for an assessment (the default one if None).
+    estimated_damage is the plain-text summary the frontend shows.
+    """
+    estimator = get_cost_estimator()
+    from cost_estimator import assessment_components, format_estimate
+
+    try:
+        components = assessment_components(damage_data if damage_data is not None else default_assessment())
+        estimate = estimator.estimate(components)
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid damage assessment: {str(e)}")
+    return {"estimated_damage": format_estimate(estimate), "estimate": estimate}
+
+
+def damage_prompt(estimate: Dict) -> str:
+    return (
+        "Write a short, plain-language damage summary for an insurance claim based on this "
+        "itemized repair estimate. Explain what is repaired or replaced and why. Do not change "
+        f"any figures or add costs.\n{json.dumps(estimate)}"
+    )
+
+
+def damage_cache_key(prompt: str) -> str:
+    return make_key(content_hash(prompt.encode("utf-8")), DAMAGE_MODEL, CHECK_DAMAGE_PROMPT_VERSION)
+
+
+def damage_payload(prompt: str) -> Dict:
+    return {
+        "model": DAMAGE_MODEL,
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": prompt,
+                    }
+                ],
+            }
+        ],
+    }
+
+
+async def run_damage_narrative(estimate: Dict, raise_errors: bool = False) -> str:
+    """Optional model-written narrative around a finished local estimate."""
+    prompt = damage_prompt(estimate)
+    payload = damage_payload(prompt)
+    cache_key = damage_cache_key(prompt)
+
+    try:
+        res = await call_openrouter(cache_key, payload, api_key=key2)
+        # DeepSeek response can be 'choices' or 'content'
+        damage_text = clean_content(extract_content(res))
+        if raise_errors and "choices" not in res and "content" not in res:
+            raise ValueError(f"Unexpected OpenRouter response: {damage_text[:200]}")
+
+    except Exception as e:
+        if raise_errors:
+            raise
+        damage_text = str(e)
+
+    return damage_text
+
+
+async def stream_damage_narrative(estimate: Dict) -> AsyncIterator[Tuple[str, Dict]]:
+    """run_damage_narrative() streamed: ("delta", {"text"}) per token, then ("result", {"narrative"})."""
+    parts: List[str] = []
+    try:
+        async for delta in openrouter.chat_stream(damage_payload(damage_prompt(estimate)), api_key=key2):
+            parts.append(delta)
+            yield "delta", {"text": delta}
+        narrative = clean_content("".join(parts))
+    except Exception as e:
+        narrative = str(e)
+    yield "result", {"narrative": narrative}
+
+
+def damage_event_stream(result: Dict) -> StreamingResponse:
+    """The local estimate as an "estimate" event at once, then the narrative as it streams."""
+    async def event_stream():
+        yield sse_event("estimate", result)
+        async for name, data in stream_damage_narrative(result["estimate"]):
+            if name == "result":
+                yield sse_event("complete", {**result, **data})
+            else:
+                yield sse_event(name, data)
+
+    return event_stream_response(event_stream())
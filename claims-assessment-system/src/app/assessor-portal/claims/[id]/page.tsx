@@ -25,6 +25,10 @@ import {
   X
 } from 'lucide-react'
 
+// Damage renders already fetched this session, keyed by request body, so re-opening a
+// claim can revalidate with If-None-Match and get a 304 instead of the full image
+const damageRenderCache = new Map<string, { etag: string; blob: Blob }>()
+
 // Helper function to format currency with "k" for thousands (without rupee sign)
 const formatCurrency = (amount: number | string) => {
   const num = typeof amount === 'string' ? parseFloat(amount) : amount
@@ -373,17 +377,24 @@ END OF ASSESSMENT REPORT
         }
       }
 
-      // Call the new damage impact API endpoint
+      // Call the new damage impact API endpoint, revalidating any render we already have
+      const body = JSON.stringify(damageData)
+      const previousRender = damageRenderCache.get(body)
       const response = await fetch(`http://localhost:8000/render-damage-impact`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          ...(previousRender ? { 'If-None-Match': previousRender.etag } : {}),
         },
-        body: JSON.stringify(damageData),
+        body,
       })
 
-      if (response.ok) {
-        const blob = await response.blob()
+      if (response.ok || (response.status === 304 && previousRender)) {
+        const blob = response.status === 304 && previousRender ? previousRender.blob : await response.blob()
+        const etag = response.headers.get('ETag')
+        if (etag) {
+          damageRenderCache.set(body, { etag, blob })
+        }
         const url = URL.createObjectURL(blob)
         setDamageOverlayUrl(url)
         
@@ -2,7 +2,7 @@
 
 import { useState } from 'react'
 import { Upload, Brain, DollarSign, AlertCircle, CheckCircle, Loader2, Image as ImageIcon, Zap, RefreshCw, FileText } from 'lucide-react'
-import { apiService, getRiskLevel, formatDamageEstimate, type AIAnalysisResult, type DamageEstimate } from '@/lib/apiService'
+import { apiService, getRiskLevel, formatDamageEstimate, type AIAnalysisResult, type DamageEstimate, type ServerTimingEntry } from '@/lib/apiService'
 
 export default function AIDebugPanel() {
   const [selectedFile, setSelectedFile] = useState<File | null>(null)
@@ -12,6 +12,7 @@ export default function AIDebugPanel() {
   const [analysisResult, setAnalysisResult] = useState<AIAnalysisResult | null>(null)
   const [damageEstimate, setDamageEstimate] = useState<DamageEstimate | null>(null)
   const [error, setError] = useState<string | null>(null)
+  const [timings, setTimings] = useState<ServerTimingEntry[]>([])
 
   const [isComprehensiveAnalysis, setIsComprehensiveAnalysis] = useState(false)
 
@@ -33,6 +34,7 @@ export default function AIDebugPanel() {
     setError(null)
 
     const result = await apiService.analyzeImage(selectedFile)
+    setTimings(result.timings ?? [])
     
     if (result.success && result.data) {
       setAnalysisResult(result.data)
@@ -65,6 +67,7 @@ export default function AIDebugPanel() {
     setError(null)
 
     const result = await apiService.getComprehensiveAnalysis(selectedFile)
+    setTimings(result.timings ?? [])
     
     if (result.success && result.data) {
       setAnalysisResult(result.data.analysis)
@@ -257,6 +260,32 @@ export default function AIDebugPanel() {
         </div>
       )}
 
+      {/* Server-Timing Breakdown */}
+      {timings.length > 0 && (
+        <div className="mt-6 p-4 bg-gray-50 border border-gray-200 rounded-lg">
+          <h4 className="font-semibold text-gray-900 mb-3">Server Timing</h4>
+          <div className="space-y-2">
+            {timings.map(entry => {
+              const total = timings.find(t => t.name === 'total')?.duration || 1
+              return (
+                <div key={entry.name} className="text-xs text-black">
+                  <div className="flex justify-between mb-1">
+                    <span className="font-medium">{entry.name}{entry.description ? ` (${entry.description})` : ''}</span>
+                    <span>{entry.duration.toFixed(1)} ms</span>
+                  </div>
+                  <div className="h-1.5 bg-gray-200 rounded">
+                    <div
+                      className="h-1.5 bg-purple-500 rounded"
+                      style={{ width: `${Math.min(100, (entry.duration / total) * 100)}%` }}
+                    />
+                  </div>
+                </div>
+              )
+            })}
+          </div>
+        </div>
+      )}
+
       {/* Server Status */}
       <div className="mt-6 pt-4 border-t border-gray-200">
         <div className="flex items-center justify-between">
@@ -59,7 +59,8 @@ export default function ClaimantImageAnalysis({ onAnalysisComplete }: ClaimantIm
     setResult(null)
 
     try {
-      const comprehensiveResult = await apiService.getComprehensiveAnalysis(file)
+      // Claimant uploads yield to assessors reviewing claims
+      const comprehensiveResult = await apiService.getComprehensiveAnalysis(file, 'bulk')
       
       if (comprehensiveResult.success && comprehensiveResult.data) {
         const { analysis, damage } = comprehensiveResult.data
@@ -6,9 +6,24 @@ export interface AIAnalysisResult {
   confidence_reasoning: string
 }
 
+// Backend's local first-pass AI screen (decision path and per-signal timings)
+export interface AIScreening {
+  decision: 'authentic' | 'ai_generated' | 'escalate'
+  score: number | null // probability the image is generated
+  thresholds: [number, number]
+  path: string[]
+  metadata: Record<string, string | number | null>
+  signals: Record<string, number>
+  timings_ms: Record<string, number>
+  total_ms: number
+}
+
 export interface AIDetectionResult {
   filename: string
   ai_analysis: string
+  model?: string | null
+  screening?: AIScreening | null
+  fallback?: boolean // model unavailable; answered from the local screen
   parsed_analysis?: {
     is_ai_generated: boolean
     confidence_score: number
@@ -16,14 +31,260 @@ export interface AIDetectionResult {
   }
 }
 
+export interface CostLineItem {
+  component: string
+  part_type: string
+  percentage_damage: number
+  action: 'repair' | 'replace'
+  labour_hours: number
+  paint_hours: number
+  parts: number
+  labour: number
+  paint: number
+  total: number
+}
+
+// Itemized estimate computed by the backend's local cost engine
+export interface CostEstimate {
+  currency: string
+  items: CostLineItem[]
+  totals: {
+    parts: number
+    labour: number
+    paint: number
+    total: number
+    labour_hours: number
+    replaced: number
+    repaired: number
+  }
+  price_table: string
+}
+
 export interface DamageEstimate {
   estimated_damage: string
+  estimate?: CostEstimate
+  narrative?: string
+}
+
+// Earlier uploads that look like the same photo (perceptual-hash near-duplicates)
+export interface SimilarImage {
+  digest: string
+  canonical: string
+  filename: string | null
+  distance: number // pHash Hamming distance, 0-64
+  dhash_distance: number | null
+}
+
+export interface SimilarImagesResult {
+  filename: string
+  digest: string
+  phash: string
+  dhash: string
+  k: number
+  matches: SimilarImage[]
+  canonical: string | null
+}
+
+// A frame picked by /ingest/keyframes, with its model results when analyze=true
+export interface Keyframe {
+  view: number
+  source: string
+  frame: number
+  timestamp: number | null
+  sharpness: number
+  exposure: number
+  quality: number
+  digest: string
+  data_url?: string
+  explain?: { content: string; model: string | null; hedged: boolean; cached: boolean }
+  check_ai?: { ai_analysis: string; model: string | null; hedged: boolean; cached: boolean
+    screening: AIScreening | null; fallback: boolean }
+}
+
+export interface KeyframeIngestResult {
+  files: number
+  frames_scored: number
+  near_duplicates: number
+  views: number
+  selected: number
+  model_calls_avoided: number
+  keyframes: Keyframe[]
+}
+
+// A claim row from the backend claims store (GET /claims); extra claim fields live in data
+export type ClaimStatus = 'Pending Review' | 'Under Assessment' | 'AI Review' | 'Approved' | 'Flagged' | 'Rejected'
+
+export interface StoredClaim {
+  id: string
+  reference: string | null
+  status: ClaimStatus
+  severity: number | null // 0-100, highest over the claim's analyses
+  ai_likelihood: number | null // 0-1, highest over the claim's analyses
+  fraud_risk: 'Low' | 'Medium' | 'High' | null
+  holder_name: string | null
+  holder_email: string | null
+  policy_number: string | null
+  vehicle: string | null
+  license_plate: string | null
+  description: string | null
+  estimated_cost: number | null
+  assessor: string | null
+  data?: Record<string, unknown>
+  created_at: number // unix seconds
+  updated_at: number
+}
+
+export interface StoredAnalysis {
+  id: number
+  claim_id: string
+  kind: 'explain' | 'check_ai' | 'damage'
+  filename: string | null
+  model: string | null
+  description: string | null
+  reasoning: string | null
+  severity: number | null
+  ai_likelihood: number | null
+  result: Record<string, unknown>
+  created_at: number
+}
+
+export interface ClaimFilters {
+  sort?: 'created_at' | 'severity' | 'ai_likelihood'
+  order?: 'asc' | 'desc'
+  limit?: number
+  status?: ClaimStatus
+  fraud_risk?: 'Low' | 'Medium' | 'High'
+  holder_email?: string
+  min_severity?: number
+  max_severity?: number
+  min_ai_likelihood?: number
+  max_ai_likelihood?: number
+}
+
+// One keyset page: pass next_cursor back to get the following page (null on the last one)
+export interface ClaimsPage {
+  claims: StoredClaim[]
+  next_cursor: string | null
+}
+
+export interface AnalysisSearchResult {
+  id: number
+  claim_id: string
+  kind: StoredAnalysis['kind']
+  filename: string | null
+  snippet: string // matched words in [brackets]
+  ai_likelihood: number | null
+  severity: number | null
+  status: ClaimStatus | null
+  holder_name: string | null
+}
+
+export type VehicleView = 'front' | 'rear' | 'side' | 'top'
+
+export interface HeatField {
+  id: string
+  view: VehicleView
+  side: 'left' | 'right' | 'both'
+  width: number
+  height: number
+  revision: number
+  components: number
+  kernels: number // components drawn on this view
+  image_url: string
+}
+
+export interface HeatFieldChange {
+  component: string
+  percentage_damage?: number
+  bbox?: [number, number, number, number]
+}
+
+export interface HeatFieldUpdate {
+  id: string
+  revision: number
+  dirty: [number, number, number, number][] // redrawn [x0, y0, x1, y1] rectangles
+}
+
+export interface JobStatus<T> {
+  id: string
+  kind: string
+  status: 'queued' | 'running' | 'succeeded' | 'failed'
+  attempts: number
+  max_attempts: number
+  error: string | null
+  result: T | null
+  status_url?: string
+}
+
+// Upstream model priority: assessor-facing work is admitted ahead of bulk uploads
+export type RequestPriority = 'interactive' | 'default' | 'bulk'
+
+// One phase from the backend's Server-Timing header (upload, preprocess, upstream, render, ...)
+export interface ServerTimingEntry {
+  name: string
+  duration: number // milliseconds
+  description?: string
 }
 
 export interface ApiResponse<T> {
   success: boolean
   data?: T
   error?: string
+  timings?: ServerTimingEntry[]
+}
+
+export function parseServerTiming(header: string | null): ServerTimingEntry[] {
+  if (!header) return []
+  return header.split(',').map(metric => {
+    const [name, ...params] = metric.trim().split(';')
+    const entry: ServerTimingEntry = { name: name.trim(), duration: 0 }
+    for (const param of params) {
+      const [key, value = ''] = param.trim().split('=')
+      if (key === 'dur') entry.duration = parseFloat(value) || 0
+      if (key === 'desc') entry.description = value.replace(/^"|"$/g, '')
+    }
+    return entry
+  }).filter(entry => entry.name)
+}
+
+// Events of a streamed /explain, /check_ai or /check_damage request (?stream=true)
+export type StreamEvent =
+  | { event: 'delta'; data: { text: string } }
+  | { event: 'field'; data: { name: string; value: unknown } }
+  | { event: 'screening'; data: AIScreening }
+  | { event: 'estimate'; data: DamageEstimate }
+  | { event: 'complete'; data: Record<string, unknown> }
+
+// Read a server-sent event stream, calling onEvent per event; resolves with the "complete" data
+async function readEventStream(response: Response, onEvent: (event: StreamEvent) => void): Promise<Record<string, unknown>> {
+  if (!response.body) throw new Error('Response has no body to stream')
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  let complete: Record<string, unknown> | null = null
+  for (;;) {
+    const { done, value } = await reader.read()
+    buffer += decoder.decode(value, { stream: !done })
+    let boundary = buffer.indexOf('\n\n')
+    while (boundary >= 0) {
+      const block = buffer.slice(0, boundary)
+      buffer = buffer.slice(boundary + 2)
+      boundary = buffer.indexOf('\n\n')
+      let name = 'message'
+      let data = ''
+      for (const line of block.split('\n')) {
+        if (line.startsWith('event:')) name = line.slice(6).trim()
+        else if (line.startsWith('data:')) data += line.slice(5).trim()
+      }
+      if (!data) continue
+      const event = { event: name, data: JSON.parse(data) } as StreamEvent
+      if (event.event === 'complete') complete = event.data
+      onEvent(event)
+    }
+    if (done) break
+  }
+  if (!complete) throw new Error('Stream ended before the complete event')
+  return complete
 }
 
 class ApiService {
@@ -73,6 +334,28 @@ class ApiService {
     }
   }
 
+  // Parse the /check_ai model output, falling back to regex extraction from free text
+  private parseAIAnalysis(aiAnalysis: string): NonNullable<AIDetectionResult['parsed_analysis']> {
+    try {
+      const parsedAnalysis = JSON.parse(aiAnalysis)
+      console.log('Parsed AI analysis:', parsedAnalysis)
+      return parsedAnalysis
+    } catch (parseError) {
+      console.log('JSON parsing failed, extracting from text:', parseError)
+      // If parsing fails, extract info from text
+      const confidenceMatch = aiAnalysis.match(/confidence[_\s]*score['":\s]*([0-9.]+)/i)
+      const isAIMatch = aiAnalysis.match(/is[_\s]*ai[_\s]*generated['":\s]*(true|false)/i)
+
+      const parsedAnalysis = {
+        is_ai_generated: isAIMatch ? isAIMatch[1].toLowerCase() === 'true' : false,
+        confidence_score: confidenceMatch ? parseFloat(confidenceMatch[1]) : 0,
+        reasoning: aiAnalysis
+      }
+      console.log('Extracted analysis:', parsedAnalysis)
+      return parsedAnalysis
+    }
+  }
+
   // Check AI generation
   async checkAIGeneration(file: File): Promise<ApiResponse<AIDetectionResult>> {
     try {
@@ -99,24 +382,7 @@ class ApiService {
       const result = await response.json()
       console.log('Raw AI detection result:', result)
       
-      // Try to parse the AI analysis JSON
-      let parsedAnalysis
-      try {
-        parsedAnalysis = JSON.parse(result.ai_analysis)
-        console.log('Parsed AI analysis:', parsedAnalysis)
-      } catch (parseError) {
-        console.log('JSON parsing failed, extracting from text:', parseError)
-        // If parsing fails, extract info from text
-        const confidenceMatch = result.ai_analysis.match(/confidence[_\s]*score['":\s]*([0-9.]+)/i)
-        const isAIMatch = result.ai_analysis.match(/is[_\s]*ai[_\s]*generated['":\s]*(true|false)/i)
-        
-        parsedAnalysis = {
-          is_ai_generated: isAIMatch ? isAIMatch[1].toLowerCase() === 'true' : false,
-          confidence_score: confidenceMatch ? parseFloat(confidenceMatch[1]) : 0,
-          reasoning: result.ai_analysis
-        }
-        console.log('Extracted analysis:', parsedAnalysis)
-      }
+      const parsedAnalysis = this.parseAIAnalysis(result.ai_analysis)
 
       return {
         success: true,
@@ -188,7 +454,8 @@ class ApiService {
 
       return {
         success: true,
-        data: combinedResult
+        data: combinedResult,
+        timings: explainResult.status === 'fulfilled' ? explainResult.value.timings : undefined
       }
     } catch (error) {
       console.error('Image analysis failed with error:', error)
@@ -219,7 +486,8 @@ class ApiService {
       
       return {
         success: true,
-        data: { description: result.content || 'Analysis completed' }
+        data: { description: result.content || 'Analysis completed' },
+        timings: parseServerTiming(response.headers.get('Server-Timing'))
       }
     } catch (error) {
       return {
@@ -230,19 +498,52 @@ class ApiService {
   }
 
   // Get damage estimation
-  async estimateDamage(): Promise<ApiResponse<DamageEstimate>> {
+  // Poll a background job until it finishes. Each poll is a short request, so a
+  // dropped connection or backend restart does not lose the work.
+  private async waitForJob<T>(job: JobStatus<T>, timeoutMs: number = 300000): Promise<T> {
+    const deadline = Date.now() + timeoutMs
+    const statusUrl = `${this.baseUrl}${job.status_url ?? `/jobs/${job.id}`}`
+    let current = job
+
+    while (current.status !== 'succeeded') {
+      if (current.status === 'failed') {
+        throw new Error(current.error || 'Job failed')
+      }
+      if (Date.now() > deadline) {
+        throw new Error('Timed out waiting for job')
+      }
+      await new Promise(resolve => setTimeout(resolve, 2000))
+      try {
+        const response = await fetch(statusUrl, { signal: AbortSignal.timeout(10000) })
+        if (!response.ok) {
+          throw new Error(`HTTP ${response.status}: ${response.statusText}`)
+        }
+        current = await response.json()
+      } catch (error) {
+        // Transient network errors: keep polling until the deadline
+        console.warn('Job status poll failed:', error)
+      }
+    }
+    return current.result as T
+  }
+
+  // The estimate is computed locally by the backend and returns at once. Pass the
+  // component assessment when there is one; the backend's default is used otherwise.
+  async estimateDamage(assessment?: object): Promise<ApiResponse<DamageEstimate>> {
     try {
-      const response = await fetch(`${this.baseUrl}/check_damage`, {
-        method: 'GET',
-        signal: AbortSignal.timeout(300000) // 5 minute timeout for damage estimation
+      const response = await fetch(`${this.baseUrl}/damage/estimate`, {
+        method: 'POST',
+        headers: assessment ? { 'Content-Type': 'application/json' } : undefined,
+        body: assessment ? JSON.stringify(assessment) : undefined,
+        signal: AbortSignal.timeout(10000)
       })
 
       if (!response.ok) {
         throw new Error(`HTTP ${response.status}: ${response.statusText}`)
       }
 
-      const result = await response.json()
-      
+      const result: DamageEstimate = await response.json()
+
       return {
         success: true,
         data: result
@@ -256,37 +557,140 @@ class ApiService {
     }
   }
 
-  // Batch analyze multiple images
-  async analyzeMultipleImages(files: File[]): Promise<ApiResponse<AIAnalysisResult[]>> {
+  // Stream /explain or /check_ai: fields (description, confidence_score, ...) arrive through
+  // onEvent as soon as the model has written them; resolves with the full response
+  async streamImageTask(task: 'explain' | 'check_ai', file: File,
+                        onEvent: (event: StreamEvent) => void): Promise<ApiResponse<Record<string, unknown>>> {
     try {
-      const results = await Promise.allSettled(
-        files.map(file => this.analyzeImage(file))
-      )
-
-      const successfulResults: AIAnalysisResult[] = []
-      const errors: string[] = []
-
-      results.forEach((result, index) => {
-        if (result.status === 'fulfilled' && result.value.success && result.value.data) {
-          successfulResults.push(result.value.data)
-        } else {
-          const error = result.status === 'rejected' 
-            ? result.reason 
-            : (result.value as ApiResponse<AIAnalysisResult>).error
-          errors.push(`File ${index + 1}: ${error}`)
+      const formData = new FormData()
+      formData.append('file', file)
+
+      const response = await fetch(`${this.baseUrl}/${task}?stream=true`, {
+        method: 'POST',
+        body: formData,
+        signal: AbortSignal.timeout(300000)
+      })
+
+      if (!response.ok) {
+        throw new Error(`HTTP ${response.status}: ${response.statusText}`)
+      }
+
+      return {
+        success: true,
+        data: await readEventStream(response, onEvent)
+      }
+    } catch (error) {
+      console.error(`Streaming ${task} failed:`, error)
+      return {
+        success: false,
+        error: error instanceof Error ? error.message : 'Unknown error occurred'
+      }
+    }
+  }
+
+  // Find earlier uploads within Hamming distance k of this image; add=true also indexes it
+  async findSimilarImages(file: File, k = 6, add = false): Promise<ApiResponse<SimilarImagesResult>> {
+    try {
+      const formData = new FormData()
+      formData.append('file', file)
+
+      const response = await fetch(`${this.baseUrl}/images/similar?k=${k}&add=${add}`, {
+        method: 'POST',
+        body: formData,
+        signal: AbortSignal.timeout(30000)
+      })
+
+      if (!response.ok) {
+        throw new Error(`HTTP ${response.status}: ${response.statusText}`)
+      }
+
+      const result: SimilarImagesResult = await response.json()
+
+      return {
+        success: true,
+        data: result
+      }
+    } catch (error) {
+      console.error('Similar image search failed:', error)
+      return {
+        success: false,
+        error: error instanceof Error ? error.message : 'Unknown error occurred'
+      }
+    }
+  }
+
+  // Optional model-written narrative around the local estimate. It runs as a background
+  // job and is polled, so it never holds up the estimate itself.
+  async getDamageNarrative(assessment?: object): Promise<ApiResponse<DamageEstimate>> {
+    try {
+      const formData = new FormData()
+      if (assessment) formData.append('assessment', JSON.stringify(assessment))
+
+      const response = await fetch(`${this.baseUrl}/jobs?kind=damage`, {
+        method: 'POST',
+        body: formData,
+        signal: AbortSignal.timeout(10000)
+      })
+
+      if (!response.ok) {
+        throw new Error(`HTTP ${response.status}: ${response.statusText}`)
+      }
+
+      const job: JobStatus<DamageEstimate> = await response.json()
+      const result = await this.waitForJob(job, 300000) // 5 minute limit for the narrative
+
+      return {
+        success: true,
+        data: result
+      }
+    } catch (error) {
+      console.error('Damage narrative failed:', error)
+      return {
+        success: false,
+        error: error instanceof Error ? error.message : 'Unknown error occurred'
+      }
+    }
+  }
+
+  // Analyze a walk-around video and/or a burst of photos. The backend keeps only the best
+  // distinct frames per view of the vehicle, so a handful of model calls replace one per file.
+  async analyzeMultipleImages(files: File[], perView = 2): Promise<ApiResponse<AIAnalysisResult[]>> {
+    try {
+      const formData = new FormData()
+      files.forEach(file => formData.append('files', file))
+
+      const response = await fetch(`${this.baseUrl}/ingest/keyframes?analyze=true&per_view=${perView}`, {
+        method: 'POST',
+        body: formData,
+        signal: AbortSignal.timeout(600000)
+      })
+
+      if (!response.ok) {
+        throw new Error(`HTTP ${response.status}: ${response.statusText}`)
+      }
+
+      const result: KeyframeIngestResult = await response.json()
+      const analyses = result.keyframes.map((keyframe): AIAnalysisResult => {
+        const aiAnalysis = keyframe.check_ai?.ai_analysis
+        const parsed = aiAnalysis && !aiAnalysis.startsWith('Error:') ? this.parseAIAnalysis(aiAnalysis) : null
+        return {
+          description: keyframe.explain?.content || 'Image description unavailable',
+          ai_generated_likelihood: parsed ? parsed.confidence_score || 0 : 0.1,
+          confidence_reasoning: parsed?.reasoning || 'AI detection service unavailable - defaulting to low risk'
         }
       })
 
-      if (successfulResults.length === 0) {
+      if (analyses.length === 0) {
         return {
           success: false,
-          error: `All analyses failed: ${errors.join(', ')}`
+          error: 'No usable frames in the uploaded files'
         }
       }
 
       return {
         success: true,
-        data: successfulResults
+        data: analyses,
+        timings: parseServerTiming(response.headers.get('Server-Timing'))
       }
     } catch (error) {
       return {
@@ -297,48 +701,60 @@ class ApiService {
   }
 
   // Get comprehensive claim analysis (combines image analysis + damage estimation)
-  async getComprehensiveAnalysis(file: File): Promise<ApiResponse<{
+  // Uses the single-upload /analyze endpoint, which runs all three model calls server-side
+  async getComprehensiveAnalysis(file: File, priority: RequestPriority = 'default'): Promise<ApiResponse<{
     analysis: AIAnalysisResult
     damage: DamageEstimate
     ai_detection: AIDetectionResult | null
   }>> {
     try {
-      // Run all three endpoints simultaneously for faster processing
-      const [analysisResult, damageResult, aiDetectionResult] = await Promise.allSettled([
-        this.analyzeImage(file), // This now includes AI detection internally
-        this.estimateDamage(),
-        this.checkAIGeneration(file) // Get raw AI detection for additional info
-      ])
+      const formData = new FormData()
+      formData.append('file', file)
 
-      // Check image analysis result
-      if (analysisResult.status === 'rejected' || !analysisResult.value.success || !analysisResult.value.data) {
-        return {
-          success: false,
-          error: `Image analysis failed: ${analysisResult.status === 'rejected' ? analysisResult.reason : analysisResult.value.error}`
-        }
-      }
+      const response = await fetch(`${this.baseUrl}/analyze`, {
+        method: 'POST',
+        body: formData,
+        headers: { 'X-Priority': priority },
+        signal: AbortSignal.timeout(300000) // 5 minute timeout for the combined analysis
+      })
 
-      // Check damage estimation result
-      if (damageResult.status === 'rejected' || !damageResult.value.success || !damageResult.value.data) {
-        return {
-          success: false,
-          error: `Damage estimation failed: ${damageResult.status === 'rejected' ? damageResult.reason : damageResult.value.error}`
-        }
+      if (!response.ok) {
+        throw new Error(`HTTP ${response.status}: ${response.statusText}`)
       }
 
+      const result = await response.json()
+
       // AI detection is optional - don't fail if it doesn't work
-      let aiDetection = null
-      if (aiDetectionResult.status === 'fulfilled' && aiDetectionResult.value.success && aiDetectionResult.value.data) {
-        aiDetection = aiDetectionResult.value.data
+      let aiDetection: AIDetectionResult | null = null
+      let aiLikelihood = 0.1
+      let reasoning = 'AI detection service unavailable - defaulting to low risk'
+      const aiAnalysis: string | undefined = result.check_ai?.ai_analysis
+      if (aiAnalysis && !aiAnalysis.startsWith('Error:')) {
+        const parsedAnalysis = this.parseAIAnalysis(aiAnalysis)
+        aiDetection = {
+          filename: result.filename,
+          ai_analysis: aiAnalysis,
+          model: result.check_ai.model,
+          screening: result.check_ai.screening,
+          fallback: result.check_ai.fallback,
+          parsed_analysis: parsedAnalysis
+        }
+        aiLikelihood = parsedAnalysis.confidence_score || 0
+        reasoning = parsedAnalysis.reasoning || 'AI analysis completed'
       }
 
       return {
         success: true,
         data: {
-          analysis: analysisResult.value.data,
-          damage: damageResult.value.data,
+          analysis: {
+            description: result.explain?.content || 'Image description unavailable',
+            ai_generated_likelihood: aiLikelihood,
+            confidence_reasoning: reasoning
+          },
+          damage: { estimated_damage: result.check_damage?.estimated_damage ?? '' },
           ai_detection: aiDetection
-        }
+        },
+        timings: parseServerTiming(response.headers.get('Server-Timing'))
       }
     } catch (error) {
       return {
@@ -347,6 +763,84 @@ class ApiService {
       }
     }
   }
+
+  private async requestJson<T>(path: string, init: RequestInit = {}): Promise<ApiResponse<T>> {
+    try {
+      const response = await fetch(`${this.baseUrl}${path}`, {
+        ...init,
+        headers: init.body ? { 'Content-Type': 'application/json', ...init.headers } : init.headers,
+        signal: AbortSignal.timeout(10000)
+      })
+
+      if (!response.ok) {
+        const body = await response.json().catch(() => null)
+        throw new Error(body?.detail || `HTTP ${response.status}: ${response.statusText}`)
+      }
+
+      return {
+        success: true,
+        data: await response.json(),
+        timings: parseServerTiming(response.headers.get('Server-Timing'))
+      }
+    } catch (error) {
+      return {
+        success: false,
+        error: error instanceof Error ? error.message : 'Unknown error occurred'
+      }
+    }
+  }
+
+  // A page of claims from the backend store, filtered and sorted server-side
+  async listClaims(filters: ClaimFilters = {}, cursor?: string | null): Promise<ApiResponse<ClaimsPage>> {
+    const params = new URLSearchParams()
+    Object.entries(filters).forEach(([key, value]) => {
+      if (value !== undefined && value !== null && value !== '') params.set(key, String(value))
+    })
+    if (cursor) params.set('cursor', cursor)
+    return this.requestJson<ClaimsPage>(`/claims?${params}`)
+  }
+
+  async getClaim(claimId: string): Promise<ApiResponse<StoredClaim & { analyses: StoredAnalysis[] }>> {
+    return this.requestJson(`/claims/${encodeURIComponent(claimId)}`)
+  }
+
+  // Store one or many claims (many go in a single transaction)
+  async createClaims(claims: Partial<StoredClaim>[]): Promise<ApiResponse<{ ids: string[]; created: number }>> {
+    return this.requestJson('/claims', { method: 'POST', body: JSON.stringify({ claims }) })
+  }
+
+  async updateClaim(claimId: string, changes: Partial<StoredClaim>): Promise<ApiResponse<StoredClaim>> {
+    return this.requestJson(`/claims/${encodeURIComponent(claimId)}`, {
+      method: 'PATCH',
+      body: JSON.stringify(changes)
+    })
+  }
+
+  async getClaimCounts(): Promise<ApiResponse<{ total: number; status: Record<string, number>; fraud_risk: Record<string, number> }>> {
+    return this.requestJson('/claims/stats')
+  }
+
+  // Full-text search over what the models said about claims (descriptions and reasoning)
+  async searchAnalyses(query: string, cursor?: string | null, limit = 20): Promise<ApiResponse<{ results: AnalysisSearchResult[]; next_cursor: string | null }>> {
+    const params = new URLSearchParams({ q: query, limit: String(limit) })
+    if (cursor) params.set('cursor', cursor)
+    return this.requestJson(`/analyses/search?${params}`)
+  }
+
+  // Damage heat field of an assessment over one view, kept on the server for editing
+  async createHeatField(assessment: object, view: VehicleView = 'side', side: 'left' | 'right' = 'left'): Promise<ApiResponse<HeatField>> {
+    return this.requestJson(`/heatmaps?view=${view}&side=${side}`, { method: 'POST', body: JSON.stringify(assessment) })
+  }
+
+  // Only the edited components' regions are redrawn; reload heatFieldImageUrl() afterwards
+  async updateHeatField(id: string, changes: HeatFieldChange[]): Promise<ApiResponse<HeatFieldUpdate>> {
+    return this.requestJson(`/heatmaps/${id}`, { method: 'PATCH', body: JSON.stringify(changes) })
+  }
+
+  heatFieldImageUrl(field: HeatField | HeatFieldUpdate, format: 'png' | 'jpeg' | 'webp' = 'webp'): string {
+    // The revision makes every edit a new URL, so an <img> refetches it
+    return `${this.baseUrl}/heatmaps/${field.id}/image?format=${format}&rev=${field.revision}`
+  }
 }
 
 // Export singleton instance